@@ -0,0 +1,130 @@
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from fastapi import HTTPException, Request
+from jose import JWTError, jwt
+
+from bmanager_common.access_log import redact_access_tokens
+
+# Настройки JWT — те же, что в сервисе пользователей
+SECRET_KEY = os.getenv("JWT_SECRET_KEY", "your-super-secret-jwt-key-2024")
+ALGORITHM = "HS256"
+
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+
+# Токен для URL (EventSource): короткий и годится только для потоков, поэтому
+# попавший в журналы или историю браузера адрес быстро становится бесполезным
+STREAM_TOKEN_SCOPE = "stream"
+STREAM_TOKEN_EXPIRE_SECONDS = int(os.getenv("STREAM_TOKEN_EXPIRE_SECONDS", "60"))
+
+# Доверенный заголовок с личностью пользователя для микросервисов: "<user_id>;<email>"
+IDENTITY_HEADER = "x-user-identity"
+
+
+class TokenCache:
+    """LRU-кеш проверенных токенов по SHA-256; запись живёт до exp токена"""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[bytes, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: bytes) -> Optional[dict]:
+        entry = self._data.get(key)
+        if entry is None or entry[0] <= time.time():
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: bytes, claims: dict, expires_at: float):
+        if self.maxsize <= 0:
+            return
+        self._data[key] = (expires_at, claims)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+token_cache = TokenCache(TOKEN_CACHE_SIZE)
+
+
+def _unauthorized(detail: str) -> HTTPException:
+    return HTTPException(status_code=401, detail=detail, headers={"WWW-Authenticate": "Bearer"})
+
+
+def verify_token(token: str) -> dict:
+    """Верификация JWT токена с кешированием результата"""
+    key = hashlib.sha256(token.encode()).digest()
+    claims = token_cache.get(key)
+    if claims is not None:
+        return claims
+    try:
+        claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        raise _unauthorized("Invalid token")
+    if not claims.get("user_id") or not claims.get("sub") or "exp" not in claims:
+        raise _unauthorized("Invalid token")
+    token_cache.set(key, claims, float(claims["exp"]))
+    return claims
+
+
+def authenticate(request: Request) -> dict:
+    """Проверка Bearer-токена запроса на шлюзе"""
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        raise _unauthorized("Not authenticated")
+    claims = verify_token(token)
+    if claims.get("scope") is not None:
+        raise _unauthorized("Invalid token")
+    return claims
+
+
+def authenticate_stream(request: Request) -> dict:
+    """Проверка токена потока событий: EventSource в браузере не передаёт
+    заголовки, поэтому в параметре access_token принимается токен потока"""
+    if "authorization" in request.headers:
+        return authenticate(request)
+    token = request.query_params.get("access_token")
+    if not token:
+        raise _unauthorized("Not authenticated")
+    claims = verify_token(token)
+    if claims.get("scope") != STREAM_TOKEN_SCOPE:
+        raise _unauthorized("Invalid token")
+    return claims
+
+
+def create_stream_token(claims: dict) -> str:
+    """Токен потока для того же пользователя, что и проверенный токен claims"""
+    return jwt.encode(
+        {
+            "sub": claims["sub"],
+            "user_id": claims["user_id"],
+            "scope": STREAM_TOKEN_SCOPE,
+            "exp": int(time.time()) + STREAM_TOKEN_EXPIRE_SECONDS,
+        },
+        SECRET_KEY,
+        algorithm=ALGORITHM,
+    )
+
+
+def identity_header(claims: dict) -> str:
+    return f"{claims['user_id']};{claims['sub']}"
+
+
+redact_access_tokens()
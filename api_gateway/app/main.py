@@ -1,13 +1,58 @@
-from fastapi import FastAPI, Request, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-import httpx
+from fastapi.responses import ORJSONResponse
+from contextlib import asynccontextmanager
+from typing import Optional
+import asyncio
 import logging
+import math
+import os
+
+from bmanager_common.metrics import REGISTRY, MetricsMiddleware, metrics_response
+
+from .auth import STREAM_TOKEN_EXPIRE_SECONDS, authenticate, authenticate_stream, create_stream_token, identity_header, token_cache
+from .proxy import PROXY_METHODS, fetch_json, proxy_event_stream, proxy_request
+from .ratelimit import AdmissionMiddleware, RateLimited, admission, rate_limiter
+from .resilience import UpstreamUnavailable, resilient
+from .singleflight import single_flight
+from .upstream import upstreams
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="API Gateway", version="1.0.0")
+# Шлюз готов, только если готовы все микросервисы (false — проверяется лишь сам шлюз)
+READY_REQUIRE_UPSTREAMS = os.getenv("READY_REQUIRE_UPSTREAMS", "true").lower() in ("1", "true", "yes")
+
+# Сводка для дашборда: предельное время каждой ветви, секунд, и число записей в списках
+DASHBOARD_BRANCH_TIMEOUT = float(os.getenv("DASHBOARD_BRANCH_TIMEOUT", "2"))
+DASHBOARD_LIMIT = int(os.getenv("DASHBOARD_LIMIT", "10"))
+# У backend свои пользователи и токены; токен backend клиент передаёт этим заголовком
+BACKEND_TOKEN_HEADER = "x-backend-token"
+
+DASHBOARD_BRANCHES = REGISTRY.counter(
+    "dashboard_branches_total", "Dashboard fan-out branches by outcome", ("branch", "outcome")
+)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Общие пулы соединений к микросервисам живут всё время работы шлюза"""
+    await upstreams.startup()
+    # Первые соединения открываются до приёма трафика; недоступность не мешает старту
+    checks = await upstreams.probe("/health")
+    for name, result in checks.items():
+        if result != "ok":
+            logger.warning(f"Upstream {name} is not reachable at startup: {result}")
+    try:
+        yield
+    finally:
+        await upstreams.shutdown()
+
+app = FastAPI(title="API Gateway", version="1.0.0", lifespan=lifespan, default_response_class=ORJSONResponse)
+
+# У шлюза нет своей БД — учитываются только запросы
+# Допуск к микросервисам внутри метрик, чтобы отказы 503 тоже учитывались
+app.add_middleware(AdmissionMiddleware, control=admission)
+app.add_middleware(MetricsMiddleware)
 
 # CORS настройки для фронтенда
 app.add_middleware(
@@ -16,60 +61,169 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Retry-After", "RateLimit-Limit", "RateLimit-Remaining", "RateLimit-Reset"],
 )
 
-# URLs микросервисов
-USERS_SERVICE_URL = "http://service_users:8001"
-ORDERS_SERVICE_URL = "http://service_orders:8002"
-
 @app.get("/")
 async def root():
     return {"message": "API Gateway is running", "status": "healthy"}
 
-@app.post("/v1/auth/{path:path}")
+@app.get("/health")
+async def health_check():
+    return {"status": "healthy", "service": "gateway"}
+
+@app.get("/ready")
+async def readiness_check():
+    """Готовность шлюза: микросервисы отвечают 200 на /ready"""
+    checks = await upstreams.probe("/ready")
+    ready = all(result == "ok" for result in checks.values())
+    content = {"status": "ready" if ready else "degraded", "service": "gateway", "upstreams": checks}
+    if not ready and READY_REQUIRE_UPSTREAMS:
+        return ORJSONResponse(status_code=503, content=content)
+    return content
+
+@app.get("/stats/upstreams")
+async def upstream_stats():
+    """Статистика пулов соединений к микросервисам"""
+    return upstreams.stats()
+
+@app.get("/stats/token-cache")
+async def token_cache_stats():
+    """Статистика кеша проверенных токенов"""
+    return token_cache.stats()
+
+@app.get("/stats/breakers")
+async def breaker_stats():
+    """Состояние автоматов защиты и бюджетов повторов по микросервисам"""
+    return resilient.stats()
+
+@app.get("/stats/single-flight")
+async def single_flight_stats():
+    """Счётчики объединения одинаковых одновременных GET-запросов"""
+    return single_flight.stats()
+
+@app.get("/stats/rate-limits")
+async def rate_limit_stats():
+    """Счётчики ограничения частоты и допуска запросов"""
+    return {"rate_limits": rate_limiter.stats(), "admission": admission.stats()}
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Метрики в текстовом формате Prometheus"""
+    return metrics_response()
+
+@app.exception_handler(UpstreamUnavailable)
+async def upstream_unavailable_handler(request: Request, exc: UpstreamUnavailable):
+    """Быстрый отказ, когда микросервис недоступен: 503 и Retry-After вместо ожидания таймаутов"""
+    logger.error(f"Proxy error: {exc}")
+    return ORJSONResponse(
+        status_code=503,
+        content={"detail": "Service unavailable"},
+        headers={"Retry-After": str(math.ceil(exc.retry_after))},
+    )
+
+@app.exception_handler(RateLimited)
+async def rate_limited_handler(request: Request, exc: RateLimited):
+    """429 с заголовками RateLimit-* и Retry-After"""
+    return ORJSONResponse(status_code=429, content={"detail": "Too many requests"}, headers=exc.headers())
+
+async def dashboard_branch(name: str, call) -> tuple:
+    """Результат одной ветви сводки: (тело JSON, None) или (None, причина отказа)"""
+    try:
+        response = await asyncio.wait_for(call, DASHBOARD_BRANCH_TIMEOUT)
+    except asyncio.TimeoutError:
+        error = "timeout"
+    except UpstreamUnavailable:
+        error = "unavailable"
+    else:
+        error = None if response.status_code == 200 else f"HTTP {response.status_code}"
+    DASHBOARD_BRANCHES.inc((name, error or "ok"))
+    if error is not None:
+        logger.warning(f"Dashboard branch {name} failed: {error}")
+        return None, error
+    return response.json(), None
+
+async def skipped_branch(reason: str) -> tuple:
+    return None, reason
+
+@app.get("/v1/dashboard")
+async def dashboard(request: Request, limit: int = Query(DASHBOARD_LIMIT, ge=1, le=50)):
+    """Данные для первого экрана дашборда одним запросом.
+
+    Профиль, последние заказы и задачи запрашиваются одновременно, каждая
+    ветвь — со своим таймаутом, поэтому ответ ждёт самую медленную ветвь,
+    а не сумму всех. Отказавшая ветвь даёт null в data и причину в errors;
+    503 — только если не ответила ни одна.
+    """
+    claims = authenticate(request)
+    rate_limiter.check(request, "orders", claims["user_id"])
+    identity = identity_header(claims)
+    backend_token: Optional[str] = request.headers.get(BACKEND_TOKEN_HEADER)
+    if "backend" not in upstreams.services:
+        tasks = skipped_branch("not configured")
+    elif not backend_token:
+        tasks = skipped_branch(f"no {BACKEND_TOKEN_HEADER} header")
+    else:
+        tasks = dashboard_branch("tasks", fetch_json(
+            "backend", "/tasks/", params={"limit": limit}, headers={"Authorization": f"Bearer {backend_token}"}
+        ))
+    (user, user_error), (orders, orders_error), (task_list, tasks_error) = await asyncio.gather(
+        dashboard_branch("user", fetch_json("users", "/v1/users/me", identity)),
+        dashboard_branch("orders", fetch_json("orders", "/v1/orders", identity, params={"limit": limit})),
+        tasks,
+    )
+    errors = {
+        name: error
+        for name, error in (("user", user_error), ("orders", orders_error), ("tasks", tasks_error))
+        if error is not None
+    }
+    content = {
+        "success": not errors,
+        "data": {
+            "user": user["data"] if user else None,
+            "orders": orders["data"] if orders else None,
+            "orders_next_cursor": orders["next_cursor"] if orders else None,
+            "tasks": task_list,
+        },
+        "errors": errors,
+    }
+    if user is None and orders is None and task_list is None:
+        return ORJSONResponse(status_code=503, content=content, headers={"Retry-After": "1"})
+    return content
+
+@app.post("/v1/auth/stream-token")
+async def issue_stream_token(request: Request):
+    """Короткий токен для параметра access_token потока событий (EventSource не передаёт заголовки)"""
+    claims = authenticate(request)
+    rate_limiter.check(request, "orders", claims["user_id"])
+    return {"success": True, "data": {"stream_token": create_stream_token(claims), "expires_in": STREAM_TOKEN_EXPIRE_SECONDS}}
+
+@app.api_route("/v1/auth/{path:path}", methods=PROXY_METHODS)
 async def auth_proxy(path: str, request: Request):
     """Проксирование запросов аутентификации в сервис пользователей"""
-    try:
-        async with httpx.AsyncClient() as client:
-            body = await request.json()
-            response = await client.post(
-                f"{USERS_SERVICE_URL}/v1/auth/{path}",
-                json=body,
-                headers=dict(request.headers)
-            )
-            return JSONResponse(
-                content=response.json(),
-                status_code=response.status_code
-            )
-    except Exception as e:
-        logger.error(f"Auth proxy error: {e}")
-        raise HTTPException(status_code=500, detail="Service unavailable")
-
-@app.get("/v1/orders")
-@app.post("/v1/orders")
-async def orders_proxy(request: Request):
+    # Каждый вход — проверка bcrypt, поэтому бюджет по IP отдельный и строгий
+    rate_limiter.check(request, "auth")
+    return await proxy_request(request, "users", f"/v1/auth/{path}")
+
+@app.get("/v1/orders/events")
+async def order_events_proxy(request: Request):
+    """Поток событий о заказах пользователя (Server-Sent Events)"""
+    claims = authenticate_stream(request)
+    # Бюджет тратится только на подключение, а не на каждое событие
+    rate_limiter.check(request, "orders", claims["user_id"])
+    return await proxy_event_stream(request, "orders", "/v1/orders/events", identity_header(claims))
+
+# Один маршрут покрывает /v1/orders, /v1/orders/{order_id} и /v1/orders:batch
+@app.api_route("/v1/orders{path:path}", methods=PROXY_METHODS)
+async def orders_proxy(path: str, request: Request):
     """Проксирование запросов заказов в сервис заказов"""
-    try:
-        async with httpx.AsyncClient() as client:
-            if request.method == "GET":
-                response = await client.get(
-                    f"{ORDERS_SERVICE_URL}/v1/orders",
-                    headers=dict(request.headers)
-                )
-            else:
-                body = await request.json()
-                response = await client.post(
-                    f"{ORDERS_SERVICE_URL}/v1/orders",
-                    json=body,
-                    headers=dict(request.headers)
-                )
-            return JSONResponse(
-                content=response.json(),
-                status_code=response.status_code
-            )
-    except Exception as e:
-        logger.error(f"Orders proxy error: {e}")
-        raise HTTPException(status_code=500, detail="Service unavailable")
+    # Шаблон совпадает и с чужими путями вроде /v1/orders_foo — их не проксируем
+    if path and path[0] not in "/:":
+        raise HTTPException(status_code=404, detail="Not Found")
+    # Токен проверяется до любого обращения к сервису заказов
+    claims = authenticate(request)
+    rate_limiter.check(request, "orders", claims["user_id"])
+    return await proxy_request(request, "orders", f"/v1/orders{path}", identity_header(claims))
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,178 @@
+from typing import List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode
+
+import httpx
+from fastapi import Request
+from fastapi.responses import Response, StreamingResponse
+from starlette.background import BackgroundTask
+
+from .auth import IDENTITY_HEADER
+from .resilience import IDEMPOTENT_METHODS, resilient
+from .singleflight import SharedResponse, request_key, single_flight
+from .upstream import UPSTREAM_CONNECT_TIMEOUT, UPSTREAM_POOL_TIMEOUT, UPSTREAM_READ_TIMEOUT, upstreams
+
+# Hop-by-hop заголовки (RFC 7230, раздел 6.1) не передаются через прокси
+HOP_BY_HOP_HEADERS = frozenset({
+    b"connection",
+    b"keep-alive",
+    b"proxy-authenticate",
+    b"proxy-authorization",
+    b"te",
+    b"trailer",
+    b"trailers",
+    b"transfer-encoding",
+    b"upgrade",
+})
+
+# Эти заголовки ответа uvicorn выставляет сам
+SERVER_RESPONSE_HEADERS = (b"date", b"server")
+
+PROXY_METHODS = ["GET", "POST", "PUT", "PATCH", "DELETE", "HEAD", "OPTIONS"]
+
+# Поток событий может молчать дольше таймаута чтения обычных ответов
+EVENT_STREAM_TIMEOUT = httpx.Timeout(
+    connect=UPSTREAM_CONNECT_TIMEOUT, read=None, write=UPSTREAM_READ_TIMEOUT, pool=UPSTREAM_POOL_TIMEOUT
+)
+
+
+def filter_headers(raw_headers: List[Tuple[bytes, bytes]], extra_exclude=()) -> List[Tuple[bytes, bytes]]:
+    """Копия заголовков без hop-by-hop и перечисленных в Connection"""
+    excluded = set(HOP_BY_HOP_HEADERS)
+    excluded.update(extra_exclude)
+    for name, value in raw_headers:
+        if name.lower() == b"connection":
+            excluded.update(token.strip().lower() for token in value.split(b","))
+    return [
+        (name, value)
+        for name, value in raw_headers
+        if name.lower() not in excluded
+    ]
+
+
+def _has_body(request: Request) -> bool:
+    return "content-length" in request.headers or "transfer-encoding" in request.headers
+
+
+async def send_upstream(
+    request: Request,
+    upstream: str,
+    path: str,
+    identity: Optional[str] = None,
+    query: Optional[bytes] = None,
+    timeout: Optional[httpx.Timeout] = None,
+) -> httpx.Response:
+    """Отправка запроса клиента в микросервис; ответ открыт в режиме stream.
+
+    Заголовок личности от клиента всегда отбрасывается и ставится только
+    шлюзом. query и timeout заменяют строку запроса клиента и таймауты
+    пула. Недоступность микросервиса — UpstreamUnavailable.
+    """
+    client = upstreams.get(upstream)
+    headers = filter_headers(request.headers.raw, (b"host", IDENTITY_HEADER.encode()))
+    if identity is not None:
+        headers.append((IDENTITY_HEADER.encode(), identity.encode()))
+    has_body = _has_body(request)
+    if query is None:
+        query = request.scope["query_string"]
+    extra = {"timeout": timeout} if timeout is not None else {}
+
+    def build_request() -> httpx.Request:
+        return client.build_request(
+            request.method,
+            httpx.URL(path, query=query or None),
+            headers=headers,
+            content=request.stream() if has_body else None,
+            **extra,
+        )
+
+    retryable = request.method in IDEMPOTENT_METHODS and not has_body
+    return await resilient.send(upstream, client, build_request, retryable)
+
+
+async def fetch_json(
+    upstream: str,
+    path: str,
+    identity: Optional[str] = None,
+    params: Optional[dict] = None,
+    headers: Optional[dict] = None,
+) -> httpx.Response:
+    """GET в микросервис от имени шлюза; тело ответа прочитано целиком.
+
+    В отличие от проксирования заголовки клиента не передаются: только
+    личность пользователя и явно указанные headers. Запрос идёт через
+    автомат защиты с повторами; недоступность — UpstreamUnavailable.
+    """
+    client = upstreams.get(upstream)
+    request_headers = {"accept": "application/json", **(headers or {})}
+    if identity is not None:
+        request_headers[IDENTITY_HEADER] = identity
+
+    def build_request() -> httpx.Request:
+        return client.build_request("GET", path, params=params, headers=request_headers)
+
+    response = await resilient.send(upstream, client, build_request, True)
+    try:
+        await response.aread()
+    finally:
+        await response.aclose()
+    return response
+
+
+def response_headers(upstream_response: httpx.Response) -> List[Tuple[bytes, bytes]]:
+    return filter_headers(upstream_response.headers.raw, SERVER_RESPONSE_HEADERS)
+
+
+def stream_response(upstream_response: httpx.Response) -> StreamingResponse:
+    """Потоковая передача ответа микросервиса клиенту"""
+    response = StreamingResponse(
+        upstream_response.aiter_raw(),
+        status_code=upstream_response.status_code,
+        background=BackgroundTask(upstream_response.aclose),
+    )
+    response.raw_headers = response_headers(upstream_response)
+    return response
+
+
+async def proxy_request(
+    request: Request,
+    upstream: str,
+    path: str,
+    identity: Optional[str] = None,
+) -> Response:
+    """Проксирование запроса в микросервис.
+
+    Тело запроса и ответа передаётся байтами без разбора, статус и
+    заголовки (включая Content-Encoding) — как есть. Одинаковые
+    одновременные GET объединяются в один запрос к микросервису.
+    """
+    if single_flight.enabled and request.method == "GET" and not _has_body(request):
+        return await _coalesced_request(request, upstream, path, identity)
+    return stream_response(await send_upstream(request, upstream, path, identity))
+
+
+async def proxy_event_stream(request: Request, upstream: str, path: str, identity: str) -> Response:
+    """Проксирование потока Server-Sent Events.
+
+    Без объединения запросов и без таймаута чтения; Last-Event-ID
+    передаётся как есть, токен из строки запроса в микросервис не уходит.
+    """
+    query = urlencode([
+        (name, value)
+        for name, value in parse_qsl(request.scope["query_string"].decode("latin-1"), keep_blank_values=True)
+        if name != "access_token"
+    ]).encode()
+    return stream_response(await send_upstream(request, upstream, path, identity, query, EVENT_STREAM_TIMEOUT))
+
+
+async def _coalesced_request(request: Request, upstream: str, path: str, identity: Optional[str]) -> Response:
+    async def lead() -> Tuple[Optional[SharedResponse], Response]:
+        upstream_response = await send_upstream(request, upstream, path, identity)
+        if not single_flight.shareable(upstream_response):
+            return None, stream_response(upstream_response)
+        shared = await single_flight.buffer(upstream_response, response_headers(upstream_response))
+        return shared, shared.to_response()
+
+    async def fallback() -> Response:
+        return stream_response(await send_upstream(request, upstream, path, identity))
+
+    return await single_flight.do(request_key(request, upstream, path, identity), lead, fallback)
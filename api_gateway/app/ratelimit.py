@@ -0,0 +1,264 @@
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from fastapi import Request
+from fastapi.responses import ORJSONResponse
+
+from bmanager_common.metrics import REGISTRY
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() in ("1", "true", "yes")
+# Брать адрес клиента из X-Forwarded-For (только за доверенным балансировщиком)
+RATE_LIMIT_TRUST_FORWARDED = os.getenv("RATE_LIMIT_TRUST_FORWARDED", "false").lower() in ("1", "true", "yes")
+# Сколько ключей (IP, пользователей) хранится в каждой группе; старые вытесняются
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+
+# Бюджеты по группам маршрутов: скорость пополнения (запросов в секунду) и ёмкость корзины.
+# Вход дорогой (bcrypt), поэтому /v1/auth ограничен строже; 0 — без ограничения
+RATE_LIMITS = {
+    "auth": {
+        "ip": (float(os.getenv("RATE_LIMIT_AUTH_IP_RATE", "2")), int(os.getenv("RATE_LIMIT_AUTH_IP_BURST", "20"))),
+    },
+    "orders": {
+        "ip": (float(os.getenv("RATE_LIMIT_ORDERS_IP_RATE", "50")), int(os.getenv("RATE_LIMIT_ORDERS_IP_BURST", "100"))),
+        "user": (float(os.getenv("RATE_LIMIT_ORDERS_USER_RATE", "20")), int(os.getenv("RATE_LIMIT_ORDERS_USER_BURST", "50"))),
+    },
+}
+
+# Допуск запросов к микросервисам: одновременно обрабатывается не больше
+# ADMISSION_MAX_CONCURRENCY, ещё ADMISSION_MAX_QUEUE ждут не дольше ADMISSION_QUEUE_TIMEOUT
+ADMISSION_MAX_CONCURRENCY = int(os.getenv("ADMISSION_MAX_CONCURRENCY", "200"))
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "400"))
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "2"))
+ADMISSION_PATH_PREFIX = "/v1/"
+# Потоки событий открыты часами и заняли бы все слоты; их нагрузка — только пульс и события
+ADMISSION_EXCLUDED_PATHS = frozenset({"/v1/orders/events"})
+
+RATE_LIMITED = REGISTRY.counter(
+    "gateway_rate_limited_total", "Requests rejected with 429 by route group and key kind", ("group", "kind")
+)
+ADMISSION_IN_FLIGHT = REGISTRY.gauge("gateway_admission_in_flight", "Requests holding an admission slot")
+ADMISSION_QUEUED = REGISTRY.gauge("gateway_admission_queued", "Requests waiting for an admission slot")
+ADMISSION_REJECTED = REGISTRY.counter(
+    "gateway_admission_rejected_total", "Requests shed by admission control", ("reason",)
+)
+
+
+class RateLimited(Exception):
+    """Бюджет запросов исчерпан"""
+
+    def __init__(self, limit: int, remaining: float, reset: float, retry_after: float):
+        super().__init__("Rate limit exceeded")
+        self.limit = limit
+        self.remaining = remaining
+        self.reset = reset
+        self.retry_after = retry_after
+
+    def headers(self) -> Dict[str, str]:
+        return {
+            "RateLimit-Limit": str(self.limit),
+            "RateLimit-Remaining": str(int(self.remaining)),
+            "RateLimit-Reset": str(math.ceil(self.reset)),
+            "Retry-After": str(max(1, math.ceil(self.retry_after))),
+        }
+
+
+class TokenBuckets:
+    """Корзины маркеров по ключу: ``rate`` маркеров в секунду, не больше ``burst``"""
+
+    def __init__(self, rate: float, burst: int, max_keys: int):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    def take(self, key: str) -> Tuple[bool, float]:
+        """Списание маркера; возвращает (разрешено, осталось маркеров)"""
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(key, (float(self.burst), now))
+        tokens = min(float(self.burst), tokens + (now - updated) * self.rate)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return allowed, tokens
+
+    def rejection(self, tokens: float) -> RateLimited:
+        return RateLimited(
+            limit=self.burst,
+            remaining=tokens,
+            reset=(self.burst - tokens) / self.rate,
+            retry_after=(1 - tokens) / self.rate,
+        )
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class RateLimiter:
+    """Ограничение частоты запросов по IP и по пользователю для групп маршрутов"""
+
+    def __init__(self, limits: Dict[str, Dict[str, Tuple[float, int]]], max_keys: int, enabled: bool):
+        self.enabled = enabled
+        self._buckets = {
+            group: {
+                kind: TokenBuckets(rate, burst, max_keys)
+                for kind, (rate, burst) in kinds.items()
+                if rate > 0
+            }
+            for group, kinds in limits.items()
+        }
+        self._allowed: Dict[str, int] = {group: 0 for group in limits}
+        self._limited: Dict[str, int] = {group: 0 for group in limits}
+
+    def check(self, request: Request, group: str, user_id: Optional[str] = None):
+        """RateLimited, если у клиента или пользователя исчерпан бюджет группы"""
+        if not self.enabled:
+            return
+        keys = {"ip": client_ip(request), "user": user_id}
+        for kind, buckets in self._buckets[group].items():
+            key = keys[kind]
+            if key is None:
+                continue
+            allowed, tokens = buckets.take(key)
+            if not allowed:
+                self._limited[group] += 1
+                RATE_LIMITED.inc((group, kind))
+                raise buckets.rejection(tokens)
+        self._allowed[group] += 1
+
+    def stats(self) -> dict:
+        return {
+            group: {
+                "allowed": self._allowed[group],
+                "limited": self._limited[group],
+                **{
+                    kind: {"rate": buckets.rate, "burst": buckets.burst, "keys": len(buckets)}
+                    for kind, buckets in kinds.items()
+                },
+            }
+            for group, kinds in self._buckets.items()
+        }
+
+
+def client_ip(request: Request) -> str:
+    if RATE_LIMIT_TRUST_FORWARDED:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+class Overloaded(Exception):
+    """Нет свободного слота допуска"""
+
+
+class AdmissionControl:
+    """Глобальное ограничение одновременных запросов к микросервисам.
+
+    Сверх ``max_concurrency`` запросы ждут в очереди длиной не больше
+    ``max_queue`` и не дольше ``queue_timeout``; остальные сразу
+    отклоняются, чтобы перегрузка не растягивала задержку всем.
+    """
+
+    def __init__(self, max_concurrency: int, max_queue: int, queue_timeout: float):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._queued = 0
+        self._in_flight = 0
+        self._admitted = 0
+        self._rejected = {"queue_full": 0, "queue_timeout": 0}
+
+    def _reject(self, reason: str) -> Overloaded:
+        self._rejected[reason] += 1
+        ADMISSION_REJECTED.inc((reason,))
+        return Overloaded(reason)
+
+    async def acquire(self):
+        if self._semaphore.locked():
+            if self._queued >= self.max_queue:
+                raise self._reject("queue_full")
+            self._queued += 1
+            ADMISSION_QUEUED.inc()
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                raise self._reject("queue_timeout")
+            finally:
+                self._queued -= 1
+                ADMISSION_QUEUED.dec()
+        else:
+            await self._semaphore.acquire()
+        self._in_flight += 1
+        self._admitted += 1
+        ADMISSION_IN_FLIGHT.inc()
+
+    def release(self):
+        self._in_flight -= 1
+        ADMISSION_IN_FLIGHT.dec()
+        self._semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "in_flight": self._in_flight,
+            "queued": self._queued,
+            "admitted": self._admitted,
+            "rejected": dict(self._rejected),
+        }
+
+
+class AdmissionMiddleware:
+    """ASGI-middleware допуска для запросов к микросервисам (пути /v1/).
+
+    Слот держится до конца отправки ответа, включая потоковое тело;
+    при перегрузке — 503 с Retry-After. Пути из excluded_paths
+    (долгие потоки событий) проходят без слота.
+    """
+
+    def __init__(
+        self,
+        app,
+        control: "AdmissionControl",
+        path_prefix: str = ADMISSION_PATH_PREFIX,
+        excluded_paths: frozenset = ADMISSION_EXCLUDED_PATHS,
+    ):
+        self.app = app
+        self.control = control
+        self.path_prefix = path_prefix
+        self.excluded_paths = excluded_paths
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or scope["method"] == "OPTIONS"
+            or not scope["path"].startswith(self.path_prefix)
+            or scope["path"] in self.excluded_paths
+        ):
+            await self.app(scope, receive, send)
+            return
+        try:
+            await self.control.acquire()
+        except Overloaded:
+            response = ORJSONResponse(
+                {"detail": "Gateway is overloaded, try again later"}, status_code=503, headers={"Retry-After": "1"}
+            )
+            await response(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.control.release()
+
+
+rate_limiter = RateLimiter(RATE_LIMITS, RATE_LIMIT_MAX_KEYS, RATE_LIMIT_ENABLED)
+admission = AdmissionControl(ADMISSION_MAX_CONCURRENCY, ADMISSION_MAX_QUEUE, ADMISSION_QUEUE_TIMEOUT)
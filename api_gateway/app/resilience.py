@@ -0,0 +1,283 @@
+import asyncio
+import logging
+import os
+import random
+import time
+from typing import Callable, Dict, Optional
+
+import httpx
+
+from bmanager_common.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# Автомат защиты: сколько подряд неудач открывает цепь и сколько она остаётся открытой
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_TIMEOUT = float(os.getenv("BREAKER_RESET_TIMEOUT", "10"))
+BREAKER_HALF_OPEN_PROBES = int(os.getenv("BREAKER_HALF_OPEN_PROBES", "1"))
+
+# Повторы идемпотентных запросов: число попыток сверх первой и экспоненциальная пауза с jitter
+RETRY_ATTEMPTS = int(os.getenv("RETRY_ATTEMPTS", "2"))
+RETRY_BACKOFF_BASE = float(os.getenv("RETRY_BACKOFF_BASE", "0.05"))
+RETRY_BACKOFF_MAX = float(os.getenv("RETRY_BACKOFF_MAX", "0.5"))
+
+# Бюджет повторов: не больше RETRY_BUDGET_RATIO повторов на запрос плюс небольшой запас
+RETRY_BUDGET_RATIO = float(os.getenv("RETRY_BUDGET_RATIO", "0.2"))
+RETRY_BUDGET_MIN = float(os.getenv("RETRY_BUDGET_MIN", "10"))
+
+# Дублирующий запрос, если ответ не пришёл за HEDGE_DELAY секунд (0 — отключено)
+HEDGE_DELAY = float(os.getenv("HEDGE_DELAY", "0"))
+
+# Предельное время до заголовков ответа одной попытки
+UPSTREAM_RESPONSE_TIMEOUT = float(os.getenv("UPSTREAM_RESPONSE_TIMEOUT", "10"))
+
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+RETRYABLE_STATUSES = frozenset({502, 503, 504})
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+BREAKER_STATE = REGISTRY.gauge(
+    "upstream_breaker_state", "Circuit breaker state (0 closed, 1 half-open, 2 open)", ("upstream",)
+)
+UPSTREAM_ERRORS = REGISTRY.counter(
+    "upstream_errors_total", "Upstream requests failed without a response", ("upstream", "error")
+)
+UPSTREAM_RETRIES = REGISTRY.counter("upstream_retries_total", "Retried upstream attempts", ("upstream",))
+UPSTREAM_HEDGES = REGISTRY.counter("upstream_hedges_total", "Hedged upstream attempts", ("upstream",))
+UPSTREAM_REJECTED = REGISTRY.counter(
+    "upstream_rejected_total", "Requests failed fast by an open circuit breaker", ("upstream",)
+)
+
+
+class UpstreamUnavailable(Exception):
+    """Микросервис недоступен: цепь разомкнута или исчерпаны попытки"""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"Upstream '{name}' is unavailable")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Автомат защиты для одного микросервиса.
+
+    closed — запросы идут как обычно; после ``failure_threshold`` неудач
+    подряд цепь размыкается (open) и запросы сразу отклоняются. Через
+    ``reset_timeout`` пропускается ограниченное число пробных запросов
+    (half_open): успех замыкает цепь, неудача снова её размыкает.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float, half_open_probes: int):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_probes = half_open_probes
+        self.state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        self._opened_total = 0
+        BREAKER_STATE.inc((name,), 0)
+
+    def _set_state(self, state: str):
+        if state == self.state:
+            return
+        logger.warning(f"Circuit breaker '{self.name}': {self.state} -> {state}")
+        BREAKER_STATE.inc((self.name,), STATE_VALUES[state] - STATE_VALUES[self.state])
+        self.state = state
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+            self._opened_total += 1
+            self._probes = 0
+        elif state == CLOSED:
+            self._failures = 0
+
+    def acquire(self) -> bool:
+        """Разрешение на попытку; каждую разрешённую попытку нужно завершить release()"""
+        if self.state == OPEN:
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                return False
+            self._set_state(HALF_OPEN)
+        if self.state == HALF_OPEN:
+            if self._probes >= self.half_open_probes:
+                return False
+            self._probes += 1
+        return True
+
+    def release(self, success: Optional[bool]):
+        """Итог попытки; None — попытка отменена и ничего не говорит о микросервисе"""
+        if self.state == HALF_OPEN:
+            self._probes = max(0, self._probes - 1)
+        if success is None:
+            return
+        if success:
+            self._failures = 0
+            self._set_state(CLOSED)
+        elif self.state == HALF_OPEN:
+            self._set_state(OPEN)
+        else:
+            self._failures += 1
+            if self._failures >= self.failure_threshold:
+                self._set_state(OPEN)
+
+    def retry_after(self) -> float:
+        """Сколько секунд осталось до пробных запросов"""
+        if self.state != OPEN:
+            return 1.0
+        return max(1.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self._failures,
+            "opened_total": self._opened_total,
+            "retry_after": round(self.retry_after(), 3) if self.state == OPEN else 0,
+        }
+
+
+class RetryBudget:
+    """Бюджет повторов: каждый запрос добавляет ``ratio`` токена, повтор тратит один.
+
+    Так при массовых ошибках повторы не умножают нагрузку на упавший
+    сервис больше чем в (1 + ratio) раз.
+    """
+
+    def __init__(self, ratio: float, minimum: float):
+        self.ratio = ratio
+        self.minimum = minimum
+        self._tokens = minimum
+        self._exhausted = 0
+
+    def deposit(self):
+        self._tokens = min(self._tokens + self.ratio, self.minimum + 1000 * self.ratio)
+
+    def withdraw(self) -> bool:
+        if self._tokens < 1:
+            self._exhausted += 1
+            return False
+        self._tokens -= 1
+        return True
+
+    def stats(self) -> dict:
+        return {"tokens": round(self._tokens, 2), "exhausted": self._exhausted}
+
+
+def backoff_delay(retry: int) -> float:
+    """Экспоненциальная пауза с полным jitter"""
+    return random.uniform(0, min(RETRY_BACKOFF_MAX, RETRY_BACKOFF_BASE * (2 ** (retry - 1))))
+
+
+class ResilientSender:
+    """Отправка запросов в микросервисы с автоматом защиты, повторами и хеджированием"""
+
+    def __init__(self):
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._budgets: Dict[str, RetryBudget] = {}
+
+    def breaker(self, name: str) -> CircuitBreaker:
+        if name not in self._breakers:
+            self._breakers[name] = CircuitBreaker(
+                name, BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_TIMEOUT, BREAKER_HALF_OPEN_PROBES
+            )
+            self._budgets[name] = RetryBudget(RETRY_BUDGET_RATIO, RETRY_BUDGET_MIN)
+        return self._breakers[name]
+
+    async def _attempt(self, name: str, client: httpx.AsyncClient, build_request: Callable[[], httpx.Request]) -> httpx.Response:
+        """Одна попытка с учётом в автомате защиты; неудачный ответ возвращается как есть"""
+        breaker = self.breaker(name)
+        if not breaker.acquire():
+            UPSTREAM_REJECTED.inc((name,))
+            raise UpstreamUnavailable(name, breaker.retry_after())
+        outcome = None
+        try:
+            response = await asyncio.wait_for(
+                client.send(build_request(), stream=True), UPSTREAM_RESPONSE_TIMEOUT
+            )
+        except (httpx.TransportError, asyncio.TimeoutError) as e:
+            outcome = False
+            UPSTREAM_ERRORS.inc((name, type(e).__name__))
+            raise
+        else:
+            outcome = response.status_code not in RETRYABLE_STATUSES
+            return response
+        finally:
+            breaker.release(outcome)
+
+    async def _hedged_attempt(self, name: str, client: httpx.AsyncClient, build_request: Callable[[], httpx.Request]) -> httpx.Response:
+        """Попытка с дублирующим запросом, если первый не ответил за HEDGE_DELAY"""
+        first = asyncio.ensure_future(self._attempt(name, client, build_request))
+        done, _ = await asyncio.wait({first}, timeout=HEDGE_DELAY)
+        if done or not self._budgets[name].withdraw():
+            return await first
+        UPSTREAM_HEDGES.inc((name,))
+        pending = {first, asyncio.ensure_future(self._attempt(name, client, build_request))}
+        result: Optional[httpx.Response] = None
+        error: Optional[BaseException] = None
+        try:
+            while pending and result is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        error = error or task.exception()
+                    elif result is None and task.result().status_code not in RETRYABLE_STATUSES:
+                        result = task.result()
+                    elif result is None and not pending:
+                        result = task.result()
+                    else:
+                        await task.result().aclose()
+        finally:
+            # Проигравший запрос отменяется, а уже полученный ответ закрывается
+            for task in pending:
+                task.cancel()
+                task.add_done_callback(_close_response)
+        if result is None:
+            raise error
+        return result
+
+    async def send(self, name: str, client: httpx.AsyncClient, build_request: Callable[[], httpx.Request], retryable: bool) -> httpx.Response:
+        """Ответ микросервиса (stream=True) или UpstreamUnavailable.
+
+        Повторяются и хеджируются только запросы с ``retryable`` —
+        идемпотентные и без тела: тело остальных читается из клиента
+        потоком и не может быть отправлено второй раз.
+        """
+        breaker = self.breaker(name)
+        budget = self._budgets[name]
+        budget.deposit()
+        attempts = 1 + (RETRY_ATTEMPTS if retryable else 0)
+        hedge = retryable and HEDGE_DELAY > 0
+        for attempt in range(attempts):
+            last = attempt == attempts - 1
+            if attempt:
+                if not budget.withdraw():
+                    break
+                UPSTREAM_RETRIES.inc((name,))
+                await asyncio.sleep(backoff_delay(attempt))
+            try:
+                if hedge:
+                    response = await self._hedged_attempt(name, client, build_request)
+                else:
+                    response = await self._attempt(name, client, build_request)
+            except (httpx.TransportError, asyncio.TimeoutError) as e:
+                logger.warning(f"Upstream '{name}' attempt {attempt + 1} failed: {type(e).__name__}: {e}")
+                continue
+            if response.status_code in RETRYABLE_STATUSES and not last:
+                await response.aclose()
+                continue
+            return response
+        raise UpstreamUnavailable(name, breaker.retry_after())
+
+    def stats(self) -> Dict[str, dict]:
+        return {
+            name: {**breaker.stats(), "retry_budget": self._budgets[name].stats()}
+            for name, breaker in self._breakers.items()
+        }
+
+
+def _close_response(task: asyncio.Task):
+    if not task.cancelled() and task.exception() is None:
+        asyncio.ensure_future(task.result().aclose())
+
+
+resilient = ResilientSender()
@@ -0,0 +1,139 @@
+import asyncio
+import os
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import httpx
+from fastapi import Request
+from fastapi.responses import Response
+
+from bmanager_common.metrics import REGISTRY
+
+# Объединение одинаковых одновременных GET в один запрос к микросервису
+SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT_ENABLED", "true").lower() in ("1", "true", "yes")
+# Ответы больше этого размера не буферизуются и не разделяются, байт
+SINGLE_FLIGHT_MAX_BODY = int(os.getenv("SINGLE_FLIGHT_MAX_BODY", str(1024 * 1024)))
+
+# Заголовки запроса, от которых зависит ответ микросервиса
+VARY_HEADERS = ("accept", "accept-encoding", "if-none-match")
+
+COALESCED_REQUESTS = REGISTRY.counter(
+    "gateway_single_flight_requests_total",
+    "GET requests by single-flight role (leader, follower, fallback)",
+    ("upstream", "role"),
+)
+
+
+class SharedResponse(NamedTuple):
+    """Буферизованный ответ микросервиса, который отдаётся всем ожидающим"""
+
+    status_code: int
+    headers: List[Tuple[bytes, bytes]]
+    body: bytes
+
+    def to_response(self) -> Response:
+        response = Response(self.body, status_code=self.status_code)
+        response.raw_headers = list(self.headers)
+        return response
+
+
+def request_key(request: Request, upstream: str, path: str, identity: Optional[str]) -> tuple:
+    """Ключ объединения: путь, строка запроса, личность и влияющие на ответ заголовки"""
+    headers = request.headers
+    # Без личности шлюза (маршруты /v1/auth) ответ может зависеть от переданного токена
+    auth = identity if identity is not None else headers.get("authorization")
+    return (upstream, path, request.scope["query_string"], auth) + tuple(headers.get(name) for name in VARY_HEADERS)
+
+
+class SingleFlight:
+    """Одновременные одинаковые запросы разделяют один ответ микросервиса.
+
+    Первый запрос (лидер) идёт в микросервис, остальные с тем же ключом
+    ждут его результата. Разделяется только ответ, полученный, пока они
+    ждали, — после завершения лидера ключ удаляется, так что устаревшие
+    данные не отдаются. Потоковые ответы без Content-Length и слишком
+    большие тела не разделяются: ожидающие повторяют запрос сами.
+    """
+
+    def __init__(self, enabled: bool, max_body: int):
+        self.enabled = enabled
+        self.max_body = max_body
+        self._inflight: Dict[tuple, asyncio.Future] = {}
+        self._leaders = 0
+        self._followers = 0
+        self._fallbacks = 0
+        self._max_followers = 0
+        self._waiting: Dict[tuple, int] = {}
+
+    def shareable(self, upstream_response: httpx.Response) -> bool:
+        length = upstream_response.headers.get("content-length")
+        return length is not None and length.isdigit() and int(length) <= self.max_body
+
+    async def buffer(self, upstream_response: httpx.Response, headers: List[Tuple[bytes, bytes]]) -> SharedResponse:
+        """Чтение тела как есть (без декодирования Content-Encoding) и закрытие ответа"""
+        try:
+            body = b"".join([chunk async for chunk in upstream_response.aiter_raw()])
+        finally:
+            await upstream_response.aclose()
+        return SharedResponse(upstream_response.status_code, headers, body)
+
+    async def do(
+        self,
+        key: tuple,
+        lead: Callable[[], Awaitable[Tuple[Optional[SharedResponse], Response]]],
+        fallback: Callable[[], Awaitable[Response]],
+    ) -> Response:
+        """Выполнение lead() лидером или ожидание его результата.
+
+        lead возвращает ответ лидеру и разделяемую копию (или None, если
+        ответ нельзя разделить — тогда ожидающие вызывают fallback).
+        """
+        upstream = key[0]
+        future = self._inflight.get(key)
+        if future is not None:
+            self._waiting[key] += 1
+            self._max_followers = max(self._max_followers, self._waiting[key])
+            shared = await asyncio.shield(future)
+            if shared is not None:
+                self._followers += 1
+                COALESCED_REQUESTS.inc((upstream, "follower"))
+                return shared.to_response()
+            self._fallbacks += 1
+            COALESCED_REQUESTS.inc((upstream, "fallback"))
+            return await fallback()
+
+        future = asyncio.get_running_loop().create_future()
+        # Исключение лидера без ожидающих не должно попадать в лог как «never retrieved»
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._inflight[key] = future
+        self._waiting[key] = 0
+        self._leaders += 1
+        COALESCED_REQUESTS.inc((upstream, "leader"))
+        try:
+            shared, response = await lead()
+        except asyncio.CancelledError:
+            # Клиент лидера отключился — ожидающие повторяют запрос сами
+            future.set_result(None)
+            raise
+        except Exception as e:
+            # Ошибка микросервиса (например, UpstreamUnavailable) одна на всех
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(shared)
+            return response
+        finally:
+            del self._inflight[key]
+            del self._waiting[key]
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "in_flight": len(self._inflight),
+            "leaders": self._leaders,
+            "followers": self._followers,
+            "fallbacks": self._fallbacks,
+            "max_followers": self._max_followers,
+        }
+
+
+single_flight = SingleFlight(SINGLE_FLIGHT_ENABLED, SINGLE_FLIGHT_MAX_BODY)
@@ -0,0 +1,136 @@
+import asyncio
+import os
+import logging
+import time
+from typing import Dict, Optional
+
+import httpx
+
+from bmanager_common.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# URLs микросервисов
+USERS_SERVICE_URL = os.getenv("USERS_SERVICE_URL", "http://service_users:8001")
+ORDERS_SERVICE_URL = os.getenv("ORDERS_SERVICE_URL", "http://service_orders:8002")
+# Backend (проекты и задачи) подключается, только если задан адрес
+BACKEND_SERVICE_URL = os.getenv("BACKEND_SERVICE_URL", "")
+
+# Настройки пулов соединений к микросервисам
+UPSTREAM_MAX_CONNECTIONS = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "100"))
+UPSTREAM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("UPSTREAM_MAX_KEEPALIVE_CONNECTIONS", "20"))
+UPSTREAM_KEEPALIVE_EXPIRY = float(os.getenv("UPSTREAM_KEEPALIVE_EXPIRY", "30"))
+UPSTREAM_CONNECT_TIMEOUT = float(os.getenv("UPSTREAM_CONNECT_TIMEOUT", "2"))
+UPSTREAM_READ_TIMEOUT = float(os.getenv("UPSTREAM_READ_TIMEOUT", "30"))
+UPSTREAM_POOL_TIMEOUT = float(os.getenv("UPSTREAM_POOL_TIMEOUT", "5"))
+UPSTREAM_HTTP2 = os.getenv("UPSTREAM_HTTP2", "false").lower() in ("1", "true", "yes")
+# Таймаут проверки готовности микросервиса, секунд
+UPSTREAM_READY_TIMEOUT = float(os.getenv("UPSTREAM_READY_TIMEOUT", "2"))
+
+UPSTREAM_REQUEST_DURATION = REGISTRY.histogram(
+    "upstream_request_duration_seconds",
+    "Time until upstream response headers are received",
+    ("upstream", "method", "status"),
+)
+
+
+class UpstreamClients:
+    """Общие HTTP-клиенты шлюза: один пул соединений на каждый микросервис"""
+
+    def __init__(self, services: Dict[str, str]):
+        self.services = services
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._requests: Dict[str, int] = {}
+
+    def _build_client(self, name: str, base_url: str) -> httpx.AsyncClient:
+        async def count_request(request: httpx.Request):
+            self._requests[name] += 1
+            request.extensions["start_time"] = time.perf_counter()
+
+        async def observe_response(response: httpx.Response):
+            request = response.request
+            elapsed = time.perf_counter() - request.extensions["start_time"]
+            UPSTREAM_REQUEST_DURATION.observe((name, request.method, str(response.status_code)), elapsed)
+
+        return httpx.AsyncClient(
+            base_url=base_url,
+            http2=UPSTREAM_HTTP2,
+            limits=httpx.Limits(
+                max_connections=UPSTREAM_MAX_CONNECTIONS,
+                max_keepalive_connections=UPSTREAM_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=UPSTREAM_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(
+                connect=UPSTREAM_CONNECT_TIMEOUT,
+                read=UPSTREAM_READ_TIMEOUT,
+                write=UPSTREAM_READ_TIMEOUT,
+                pool=UPSTREAM_POOL_TIMEOUT,
+            ),
+            event_hooks={"request": [count_request], "response": [observe_response]},
+        )
+
+    async def startup(self):
+        """Создание клиентов при старте приложения"""
+        for name, base_url in self.services.items():
+            self._requests[name] = 0
+            self._clients[name] = self._build_client(name, base_url)
+        logger.info(f"Upstream clients started: {', '.join(self.services)}")
+
+    async def shutdown(self):
+        """Закрытие клиентов и всех открытых соединений"""
+        for client in self._clients.values():
+            await client.aclose()
+        self._clients.clear()
+        logger.info("Upstream clients closed")
+
+    def get(self, name: str) -> httpx.AsyncClient:
+        """Клиент для микросервиса по имени"""
+        try:
+            return self._clients[name]
+        except KeyError:
+            raise RuntimeError(f"Upstream client '{name}' is not started")
+
+    async def probe(self, path: str, timeout: float = UPSTREAM_READY_TIMEOUT) -> Dict[str, str]:
+        """GET path у всех микросервисов одновременно: "ok" или причина отказа по каждому"""
+        async def check(name: str) -> str:
+            try:
+                response = await self.get(name).get(path, timeout=timeout)
+            except httpx.HTTPError as e:
+                return f"{type(e).__name__}: {e}" if str(e) else type(e).__name__
+            return "ok" if response.status_code == 200 else f"HTTP {response.status_code}"
+
+        names = list(self._clients)
+        results = await asyncio.gather(*(check(name) for name in names))
+        return dict(zip(names, results))
+
+    def stats(self) -> Dict[str, dict]:
+        """Статистика пулов соединений по каждому микросервису"""
+        result = {}
+        for name, client in self._clients.items():
+            pool = _connection_pool(client)
+            connections = list(pool.connections) if pool is not None else []
+            idle = sum(1 for conn in connections if conn.is_idle())
+            result[name] = {
+                "base_url": self.services[name],
+                "http2": UPSTREAM_HTTP2,
+                "requests_total": self._requests[name],
+                "connections": len(connections),
+                "idle_connections": idle,
+                "active_connections": len(connections) - idle,
+                "max_connections": UPSTREAM_MAX_CONNECTIONS,
+                "max_keepalive_connections": UPSTREAM_MAX_KEEPALIVE_CONNECTIONS,
+            }
+        return result
+
+
+def _connection_pool(client: httpx.AsyncClient) -> Optional[object]:
+    """Пул соединений httpcore, лежащий под транспортом клиента"""
+    transport = getattr(client, "_transport", None)
+    return getattr(transport, "_pool", None)
+
+
+upstreams = UpstreamClients({
+    "users": USERS_SERVICE_URL,
+    "orders": ORDERS_SERVICE_URL,
+    **({"backend": BACKEND_SERVICE_URL} if BACKEND_SERVICE_URL else {}),
+})
@@ -0,0 +1,79 @@
+import asyncio
+import os
+import sys
+import time
+
+import httpx
+import pytest
+
+GATEWAY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# api_gateway и корень репозитория с общим пакетом bmanager_common
+sys.path[:0] = [GATEWAY, os.path.dirname(GATEWAY)]
+
+
+@pytest.fixture(scope="session")
+def gateway():
+    """Модуль app.main шлюза; ограничение частоты отключено, его проверяют отдельно"""
+    os.environ["RATE_LIMIT_ENABLED"] = "false"
+    from app import main
+
+    return main
+
+
+@pytest.fixture
+def upstream(monkeypatch, gateway):
+    """Подмена микросервисов: upstream.handlers[имя] — обработчик httpx.MockTransport.
+
+    Обработчик может быть корутиной; upstream.calls — принятые запросы.
+    Автоматы защиты и бюджеты повторов у каждого теста свои.
+    """
+    from app.resilience import resilient
+    from app.upstream import upstreams
+
+    class Upstream:
+        def __init__(self):
+            self.handlers = {}
+            self.calls = []
+
+        def client(self, name: str) -> httpx.AsyncClient:
+            async def handle(request: httpx.Request) -> httpx.Response:
+                self.calls.append((name, request))
+                result = self.handlers[name](request)
+                return await result if asyncio.iscoroutine(result) else result
+
+            return httpx.AsyncClient(base_url=f"http://{name}", transport=httpx.MockTransport(handle))
+
+    fake = Upstream()
+    monkeypatch.setattr(upstreams, "services", {"users": "http://users", "orders": "http://orders", "backend": "http://backend"})
+    monkeypatch.setattr(upstreams, "get", fake.client)
+    monkeypatch.setattr(resilient, "_breakers", {})
+    monkeypatch.setattr(resilient, "_budgets", {})
+    return fake
+
+
+@pytest.fixture
+def call(gateway):
+    """Запросы к шлюзу через ASGI в одном цикле событий: call(lambda client: ...)"""
+    def run(scenario):
+        async def main():
+            transport = httpx.ASGITransport(app=gateway.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://gateway") as client:
+                return await scenario(client)
+
+        return asyncio.run(main())
+
+    return run
+
+
+@pytest.fixture
+def auth_headers(gateway):
+    """Заголовки с JWT, который принимает шлюз: auth_headers(user_id, **другие заголовки)"""
+    from jose import jwt
+
+    from app.auth import ALGORITHM, SECRET_KEY
+
+    def make(user_id: str = "user-1", **headers) -> dict:
+        claims = {"sub": f"{user_id}@example.com", "user_id": user_id, "exp": int(time.time()) + 3600}
+        return {"Authorization": f"Bearer {jwt.encode(claims, SECRET_KEY, algorithm=ALGORITHM)}", **headers}
+
+    return make
@@ -0,0 +1,88 @@
+import asyncio
+
+import httpx
+import pytest
+
+USER = {"success": True, "data": {"id": "user-1", "email": "user-1@example.com"}}
+ORDERS = {"success": True, "data": [{"id": "order-1"}], "next_cursor": "cursor-1"}
+TASKS = [{"id": 1, "title": "Task"}]
+
+
+@pytest.fixture
+def services(upstream, gateway, monkeypatch):
+    """Все три микросервиса отвечают успешно; тесты подменяют отдельные ветви"""
+    from app import resilience
+
+    monkeypatch.setattr(resilience, "RETRY_BACKOFF_BASE", 0)
+    monkeypatch.setattr(gateway, "DASHBOARD_BRANCH_TIMEOUT", 0.2)
+    upstream.handlers.update({
+        "users": lambda request: httpx.Response(200, json=USER),
+        "orders": lambda request: httpx.Response(200, json=ORDERS),
+        "backend": lambda request: httpx.Response(200, json=TASKS),
+    })
+    return upstream
+
+
+async def hang(request: httpx.Request) -> httpx.Response:
+    await asyncio.sleep(10)
+
+
+def refuse(request: httpx.Request) -> httpx.Response:
+    raise httpx.ConnectError("connection refused", request=request)
+
+
+def calls_to(upstream, name: str) -> list:
+    return [request for service, request in upstream.calls if service == name]
+
+
+def test_dashboard_combines_all_branches(services, call, auth_headers):
+    response = call(lambda client: client.get(
+        "/v1/dashboard", params={"limit": 5}, headers=auth_headers(**{"x-backend-token": "backend-jwt"})
+    ))
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "success": True,
+        "data": {"user": USER["data"], "orders": ORDERS["data"], "orders_next_cursor": "cursor-1", "tasks": TASKS},
+        "errors": {},
+    }
+    (tasks_request,) = calls_to(services, "backend")
+    assert tasks_request.headers["authorization"] == "Bearer backend-jwt"
+    assert tasks_request.url.params["limit"] == "5"
+    (orders_request,) = calls_to(services, "orders")
+    assert orders_request.headers["x-user-identity"] == "user-1;user-1@example.com"
+
+
+def test_failed_branch_gives_null_data_and_reason(services, call, auth_headers):
+    services.handlers["orders"] = hang
+    services.handlers["backend"] = lambda request: httpx.Response(404, json={"detail": "Not Found"})
+
+    response = call(lambda client: client.get("/v1/dashboard", headers=auth_headers(**{"x-backend-token": "backend-jwt"})))
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["success"] is False
+    assert body["data"] == {"user": USER["data"], "orders": None, "orders_next_cursor": None, "tasks": None}
+    assert body["errors"] == {"orders": "timeout", "tasks": "HTTP 404"}
+
+
+def test_all_branches_failing_returns_503(services, call, auth_headers):
+    services.handlers.update({"users": refuse, "orders": hang, "backend": lambda request: httpx.Response(404)})
+
+    response = call(lambda client: client.get("/v1/dashboard", headers=auth_headers(**{"x-backend-token": "backend-jwt"})))
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    body = response.json()
+    assert body["data"] == {"user": None, "orders": None, "orders_next_cursor": None, "tasks": None}
+    assert body["errors"] == {"user": "unavailable", "orders": "timeout", "tasks": "HTTP 404"}
+
+
+def test_tasks_branch_is_skipped_without_backend_token(services, call, auth_headers):
+    response = call(lambda client: client.get("/v1/dashboard", headers=auth_headers()))
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["data"]["tasks"] is None and body["data"]["orders"] == ORDERS["data"]
+    assert body["errors"] == {"tasks": "no x-backend-token header"}
+    assert calls_to(services, "backend") == []
@@ -0,0 +1,179 @@
+import asyncio
+
+import httpx
+import pytest
+
+
+@pytest.fixture
+def ratelimit(gateway):
+    from app import ratelimit
+
+    return ratelimit
+
+
+@pytest.fixture
+def clock(ratelimit, monkeypatch):
+    """Управляемое время корзин: clock.now += секунды"""
+    class Clock:
+        now = 1000.0
+
+    monkeypatch.setattr(ratelimit.time, "monotonic", lambda: Clock.now)
+    return Clock
+
+
+def test_bucket_is_exhausted_after_burst_and_refills_over_time(ratelimit, clock):
+    buckets = ratelimit.TokenBuckets(rate=2, burst=3, max_keys=10)
+
+    assert [buckets.take("10.0.0.1") for _ in range(3)] == [(True, 2.0), (True, 1.0), (True, 0.0)]
+    assert buckets.take("10.0.0.1") == (False, 0.0)
+    # Другой ключ — своя корзина
+    assert buckets.take("10.0.0.2") == (True, 2.0)
+
+    clock.now += 0.25
+    assert buckets.take("10.0.0.1") == (False, 0.5)
+    clock.now += 0.25
+    assert buckets.take("10.0.0.1") == (True, 0.0)
+
+    # Корзина наполняется не выше burst
+    clock.now += 60
+    assert buckets.take("10.0.0.1") == (True, 2.0)
+
+
+def test_least_recently_used_keys_are_evicted(ratelimit, clock):
+    buckets = ratelimit.TokenBuckets(rate=1, burst=1, max_keys=2)
+    buckets.take("a")
+    buckets.take("b")
+    buckets.take("a")
+    buckets.take("c")
+
+    assert len(buckets) == 2
+    # Корзина «b» вытеснена и начинается заново полной
+    assert buckets.take("b") == (True, 0.0)
+    assert buckets.take("a") == (True, 0.0)
+
+
+def test_rejection_headers(ratelimit, clock):
+    buckets = ratelimit.TokenBuckets(rate=0.25, burst=4, max_keys=10)
+    for _ in range(4):
+        buckets.take("user-1")
+    clock.now += 2
+    allowed, tokens = buckets.take("user-1")
+
+    assert not allowed and tokens == 0.5
+    assert buckets.rejection(tokens).headers() == {
+        "RateLimit-Limit": "4",
+        "RateLimit-Remaining": "0",
+        # Полная корзина через (4 - 0.5) / 0.25 = 14 с, следующий маркер — через 2 с
+        "RateLimit-Reset": "14",
+        "Retry-After": "2",
+    }
+    # Retry-After не бывает меньше секунды
+    assert ratelimit.RateLimited(limit=10, remaining=0.9, reset=0.1, retry_after=0.1).headers()["Retry-After"] == "1"
+
+
+def test_gateway_returns_429_before_calling_the_upstream(ratelimit, clock, upstream, call, auth_headers, gateway, monkeypatch):
+    limiter = ratelimit.RateLimiter({"orders": {"user": (0.5, 2)}}, max_keys=10, enabled=True)
+    monkeypatch.setattr(gateway, "rate_limiter", limiter)
+    upstream.handlers["orders"] = lambda request: httpx.Response(200, stream=httpx.ByteStream(b"{}"))
+
+    async def scenario(client):
+        return [await client.get("/v1/orders", headers=auth_headers()) for _ in range(3)]
+
+    responses = call(scenario)
+
+    assert [response.status_code for response in responses] == [200, 200, 429]
+    assert len(upstream.calls) == 2
+    rejected = responses[-1]
+    assert rejected.json() == {"detail": "Too many requests"}
+    assert rejected.headers["RateLimit-Limit"] == "2"
+    assert rejected.headers["RateLimit-Remaining"] == "0"
+    assert rejected.headers["RateLimit-Reset"] == "4"
+    assert rejected.headers["Retry-After"] == "2"
+    assert limiter.stats()["orders"]["allowed"] == 2
+    assert limiter.stats()["orders"]["limited"] == 1
+
+
+def test_admission_rejects_when_queue_is_full(ratelimit):
+    async def run():
+        control = ratelimit.AdmissionControl(max_concurrency=1, max_queue=1, queue_timeout=1)
+        await control.acquire()
+        waiter = asyncio.ensure_future(control.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(ratelimit.Overloaded, match="queue_full"):
+            await control.acquire()
+        control.release()
+        await waiter
+        control.release()
+        return control.stats()
+
+    stats = asyncio.run(run())
+
+    assert stats["rejected"] == {"queue_full": 1, "queue_timeout": 0}
+    assert stats["admitted"] == 2
+    assert stats["in_flight"] == 0 and stats["queued"] == 0
+
+
+def test_admission_rejects_after_queue_timeout(ratelimit):
+    async def run():
+        control = ratelimit.AdmissionControl(max_concurrency=1, max_queue=5, queue_timeout=0.01)
+        await control.acquire()
+        with pytest.raises(ratelimit.Overloaded, match="queue_timeout"):
+            await control.acquire()
+        control.release()
+        return control.stats()
+
+    stats = asyncio.run(run())
+
+    assert stats["rejected"] == {"queue_full": 0, "queue_timeout": 1}
+    assert stats["in_flight"] == 0 and stats["queued"] == 0
+
+
+def test_cancelled_waiter_leaves_no_queued_or_in_flight_slot(ratelimit):
+    async def run():
+        control = ratelimit.AdmissionControl(max_concurrency=1, max_queue=5, queue_timeout=10)
+        await control.acquire()
+        waiters = [asyncio.ensure_future(control.acquire()) for _ in range(3)]
+        await asyncio.sleep(0)
+        assert control.stats()["queued"] == 3
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        assert (control._queued, control._in_flight) == (0, 1)
+        control.release()
+        # Отменённые ожидания не заняли слот: следующий запрос проходит без очереди
+        await asyncio.wait_for(control.acquire(), 0.1)
+        control.release()
+        return control
+
+    control = asyncio.run(run())
+
+    assert (control._queued, control._in_flight) == (0, 0)
+    assert control.stats()["admitted"] == 2
+
+
+def test_admission_middleware_sheds_with_503(ratelimit):
+    async def run():
+        control = ratelimit.AdmissionControl(max_concurrency=1, max_queue=0, queue_timeout=1)
+        started, release = asyncio.Event(), asyncio.Event()
+
+        async def app(scope, receive, send):
+            started.set()
+            await release.wait()
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": b"ok"})
+
+        transport = httpx.ASGITransport(app=ratelimit.AdmissionMiddleware(app, control=control))
+        async with httpx.AsyncClient(transport=transport, base_url="http://gateway") as client:
+            first = asyncio.ensure_future(client.get("/v1/orders"))
+            await started.wait()
+            shed = await client.get("/v1/orders")
+            release.set()
+            return await first, shed, control.stats()
+
+    first, shed, stats = asyncio.run(run())
+
+    assert first.status_code == 200
+    assert shed.status_code == 503
+    assert shed.headers["Retry-After"] == "1"
+    assert shed.json() == {"detail": "Gateway is overloaded, try again later"}
+    assert stats["in_flight"] == 0 and stats["rejected"]["queue_full"] == 1
@@ -0,0 +1,174 @@
+import asyncio
+import math
+
+import httpx
+import pytest
+
+
+@pytest.fixture
+def resilience(gateway, monkeypatch):
+    """Модуль resilience без пауз между повторами и без хеджирования"""
+    from app import resilience
+
+    monkeypatch.setattr(resilience, "RETRY_BACKOFF_BASE", 0)
+    monkeypatch.setattr(resilience, "HEDGE_DELAY", 0)
+    return resilience
+
+
+class Upstream:
+    """Микросервис на httpx.MockTransport: отвечает status или бросает ConnectError"""
+
+    def __init__(self, status: int = 200):
+        self.status = status
+        self.calls = 0
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        self.calls += 1
+        if self.status is None:
+            raise httpx.ConnectError("connection refused", request=request)
+        return httpx.Response(self.status, json={"calls": self.calls})
+
+    def client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(base_url="http://orders", transport=httpx.MockTransport(self.handle))
+
+
+def send(sender, client: httpx.AsyncClient, retryable: bool = True):
+    """Один запрос через ResilientSender: статус ответа или исключение"""
+    async def run():
+        response = await sender.send("orders", client, lambda: client.build_request("GET", "/v1/orders"), retryable)
+        await response.aclose()
+        return response.status_code
+
+    return asyncio.run(run())
+
+
+def test_breaker_opens_fails_fast_and_closes_after_a_successful_probe(resilience, monkeypatch):
+    monkeypatch.setattr(resilience, "RETRY_ATTEMPTS", 0)
+    monkeypatch.setattr(resilience, "BREAKER_FAILURE_THRESHOLD", 2)
+    monkeypatch.setattr(resilience, "BREAKER_RESET_TIMEOUT", 0.05)
+    sender = resilience.ResilientSender()
+    upstream = Upstream(status=None)
+    client = upstream.client()
+
+    for _ in range(2):
+        with pytest.raises(resilience.UpstreamUnavailable):
+            send(sender, client)
+    assert sender.breaker("orders").state == resilience.OPEN
+
+    # Открытая цепь отказывает сразу, не обращаясь к микросервису
+    with pytest.raises(resilience.UpstreamUnavailable) as error:
+        send(sender, client)
+    assert upstream.calls == 2
+    assert 0 < error.value.retry_after <= 1
+
+    # После reset_timeout пробный запрос проходит; неудача снова размыкает цепь
+    asyncio.run(asyncio.sleep(0.06))
+    with pytest.raises(resilience.UpstreamUnavailable):
+        send(sender, client)
+    assert upstream.calls == 3
+    assert sender.breaker("orders").state == resilience.OPEN
+
+    asyncio.run(asyncio.sleep(0.06))
+    upstream.status = 200
+    assert send(sender, client) == 200
+    assert sender.breaker("orders").state == resilience.CLOSED
+    assert sender.stats()["orders"]["opened_total"] == 2
+
+
+def test_half_open_admits_only_the_configured_probes(resilience):
+    breaker = resilience.CircuitBreaker("orders", failure_threshold=1, reset_timeout=0, half_open_probes=1)
+    breaker.acquire()
+    breaker.release(False)
+    assert breaker.state == resilience.OPEN
+
+    assert breaker.acquire() is True
+    assert breaker.state == resilience.HALF_OPEN
+    # Второй запрос, пока проба не завершилась, отклоняется
+    assert breaker.acquire() is False
+    # Отменённая проба ничего не говорит о сервисе и освобождает место
+    breaker.release(None)
+    assert breaker.state == resilience.HALF_OPEN
+    assert breaker.acquire() is True
+    breaker.release(True)
+    assert breaker.state == resilience.CLOSED
+
+
+def test_retry_budget_limits_retries_once_exhausted(resilience, monkeypatch):
+    monkeypatch.setattr(resilience, "RETRY_ATTEMPTS", 2)
+    monkeypatch.setattr(resilience, "RETRY_BUDGET_RATIO", 0)
+    monkeypatch.setattr(resilience, "RETRY_BUDGET_MIN", 2)
+    monkeypatch.setattr(resilience, "BREAKER_FAILURE_THRESHOLD", 100)
+    sender = resilience.ResilientSender()
+    upstream = Upstream(status=503)
+    client = upstream.client()
+
+    # Первый запрос тратит оба повтора из бюджета, второй идёт без повторов
+    assert send(sender, client) == 503
+    assert upstream.calls == 3
+    with pytest.raises(resilience.UpstreamUnavailable):
+        send(sender, client)
+    assert upstream.calls == 4
+    assert sender.stats()["orders"]["retry_budget"] == {"tokens": 0, "exhausted": 1}
+
+
+def test_non_idempotent_requests_are_not_retried(resilience, monkeypatch):
+    monkeypatch.setattr(resilience, "RETRY_ATTEMPTS", 2)
+    sender = resilience.ResilientSender()
+    upstream = Upstream(status=503)
+
+    assert send(sender, upstream.client(), retryable=False) == 503
+    assert upstream.calls == 1
+
+
+def test_hedged_request_cancels_the_slower_attempt(resilience, monkeypatch):
+    monkeypatch.setattr(resilience, "HEDGE_DELAY", 0.02)
+    sender = resilience.ResilientSender()
+    attempts = []
+    cancelled = []
+
+    async def handle(request: httpx.Request) -> httpx.Response:
+        attempt = len(attempts)
+        attempts.append(attempt)
+        if attempt == 0:
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(attempt)
+                raise
+        return httpx.Response(200, json={"attempt": attempt})
+
+    async def run():
+        client = httpx.AsyncClient(base_url="http://orders", transport=httpx.MockTransport(handle))
+        response = await sender.send("orders", client, lambda: client.build_request("GET", "/v1/orders"), True)
+        await response.aread()
+        await response.aclose()
+        # Отмена проигравшей попытки доходит до транспорта на следующих итерациях цикла
+        await asyncio.sleep(0.01)
+        return response.json()
+
+    assert asyncio.run(run()) == {"attempt": 1}
+    assert attempts == [0, 1]
+    assert cancelled == [0]
+    breaker = sender.breaker("orders")
+    # Отменённая попытка не считается неудачей
+    assert breaker.state == resilience.CLOSED and breaker.stats()["consecutive_failures"] == 0
+
+
+def test_open_breaker_returns_503_with_retry_after(upstream, call, auth_headers, monkeypatch):
+    from app import resilience
+    from app.resilience import resilient
+
+    monkeypatch.setattr(resilience, "BREAKER_RESET_TIMEOUT", 30)
+    upstream.handlers["orders"] = lambda request: httpx.Response(200, json={"success": True})
+    breaker = resilient.breaker("orders")
+    for _ in range(breaker.failure_threshold):
+        breaker.acquire()
+        breaker.release(False)
+
+    response = call(lambda client: client.get("/v1/orders", headers=auth_headers()))
+
+    assert response.status_code == 503
+    assert response.json() == {"detail": "Service unavailable"}
+    assert response.headers["Retry-After"] == str(math.ceil(breaker.retry_after()))
+    assert int(response.headers["Retry-After"]) >= 29
+    assert upstream.calls == []
@@ -0,0 +1,158 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+
+def orders_response(request: httpx.Request) -> httpx.Response:
+    """Потоковый ответ, как у настоящего микросервиса; тело зависит от личности"""
+    body = json.dumps({"identity": request.headers["x-user-identity"]}).encode()
+    headers = {"content-type": "application/json", "content-length": str(len(body))}
+    return httpx.Response(200, headers=headers, stream=httpx.ByteStream(body))
+
+
+def delayed(handler, delay: float = 0.05):
+    """Медленный микросервис: одновременные запросы успевают дождаться лидера"""
+    async def handle(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(delay)
+        return handler(request)
+
+    return handle
+
+
+def test_concurrent_identical_gets_share_one_upstream_call(upstream, call, auth_headers):
+    upstream.handlers["orders"] = delayed(orders_response)
+    headers = auth_headers("alice")
+
+    responses = call(lambda client: asyncio.gather(
+        *(client.get("/v1/orders", params={"limit": 5}, headers=headers) for _ in range(10))
+    ))
+
+    assert len(upstream.calls) == 1
+    assert [response.status_code for response in responses] == [200] * 10
+    assert {response.content for response in responses} == {responses[0].content}
+
+
+def test_requests_of_different_users_are_never_shared(upstream, call, auth_headers):
+    upstream.handlers["orders"] = delayed(orders_response)
+    users = ["alice", "bob"] * 5
+
+    responses = call(lambda client: asyncio.gather(
+        *(client.get("/v1/orders", headers=auth_headers(user)) for user in users)
+    ))
+
+    assert len(upstream.calls) == 2
+    for user, response in zip(users, responses):
+        assert response.json()["identity"] == f"{user};{user}@example.com"
+
+
+def test_upstream_failure_reaches_every_waiter(upstream, call, auth_headers, monkeypatch):
+    from app import resilience
+
+    monkeypatch.setattr(resilience, "RETRY_BACKOFF_BASE", 0)
+
+    async def refuse(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(0.02)
+        raise httpx.ConnectError("connection refused", request=request)
+
+    upstream.handlers["orders"] = refuse
+    headers = auth_headers("alice")
+
+    responses = call(lambda client: asyncio.gather(*(client.get("/v1/orders", headers=headers) for _ in range(5))))
+
+    assert [response.status_code for response in responses] == [503] * 5
+    # Повторы делает только лидер: попытки не умножаются на число ожидающих
+    assert len(upstream.calls) == 1 + resilience.RETRY_ATTEMPTS
+
+
+@pytest.fixture
+def single_flight(gateway):
+    from app.singleflight import SingleFlight
+
+    return SingleFlight(enabled=True, max_body=1024)
+
+
+def shared(body: bytes):
+    from app.singleflight import SharedResponse
+
+    return SharedResponse(200, [(b"content-length", str(len(body)).encode())], body)
+
+
+def test_leader_error_is_raised_in_every_follower(single_flight):
+    async def run():
+        release = asyncio.Event()
+
+        async def lead():
+            await release.wait()
+            raise RuntimeError("upstream failed")
+
+        async def fallback():
+            raise AssertionError("followers must not fall back on a leader error")
+
+        tasks = [asyncio.ensure_future(single_flight.do(("orders", "/v1/orders"), lead, fallback)) for _ in range(4)]
+        await asyncio.sleep(0)
+        release.set()
+        return await asyncio.gather(*tasks, return_exceptions=True)
+
+    results = asyncio.run(run())
+
+    assert all(isinstance(result, RuntimeError) and str(result) == "upstream failed" for result in results)
+    assert single_flight.stats()["in_flight"] == 0
+
+
+def test_cancelled_leader_releases_followers_to_fall_back(single_flight):
+    async def run():
+        fallbacks = []
+
+        async def lead():
+            await asyncio.sleep(10)
+
+        async def fallback():
+            fallbacks.append(1)
+            return shared(b"own").to_response()
+
+        key = ("orders", "/v1/orders")
+        leader = asyncio.ensure_future(single_flight.do(key, lead, fallback))
+        await asyncio.sleep(0)
+        followers = [asyncio.ensure_future(single_flight.do(key, lead, fallback)) for _ in range(3)]
+        await asyncio.sleep(0)
+        leader.cancel()
+        responses = await asyncio.wait_for(asyncio.gather(*followers), 1)
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return fallbacks, responses
+
+    fallbacks, responses = asyncio.run(run())
+
+    assert len(fallbacks) == 3
+    assert [response.body for response in responses] == [b"own"] * 3
+    assert single_flight.stats()["fallbacks"] == 3
+
+
+def test_cancelled_follower_does_not_cancel_the_leader(single_flight):
+    async def run():
+        release = asyncio.Event()
+
+        async def lead():
+            await release.wait()
+            value = shared(b"data")
+            return value, value.to_response()
+
+        async def fallback():
+            raise AssertionError("unexpected fallback")
+
+        key = ("orders", "/v1/orders")
+        leader = asyncio.ensure_future(single_flight.do(key, lead, fallback))
+        await asyncio.sleep(0)
+        quitter, follower = (asyncio.ensure_future(single_flight.do(key, lead, fallback)) for _ in range(2))
+        await asyncio.sleep(0)
+        quitter.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        return await leader, await follower, quitter.cancelled()
+
+    leader_response, follower_response, quitter_cancelled = asyncio.run(run())
+
+    assert quitter_cancelled
+    assert leader_response.body == follower_response.body == b"data"
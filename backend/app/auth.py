@@ -1,22 +1,67 @@
 # backend/app/auth.py
+import os
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Query, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
-from .database import get_db
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, object_session
+from bmanager_common.access_log import redact_access_tokens
+from .cache import TTLCache
+from .database import SessionLocal, get_db
 from .models import User
-from .schemas import TokenData
+from .schemas import TokenData, User as Principal
 
 # Настройки
 SECRET_KEY = "your-secret-key-change-in-production"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# Токен для URL (EventSource, ссылки на выгрузку): короткий и годится только для потоков,
+# поэтому попавший в журналы или историю браузера адрес быстро становится бесполезным
+STREAM_TOKEN_SCOPE = "stream"
+STREAM_TOKEN_EXPIRE_SECONDS = int(os.getenv("STREAM_TOKEN_EXPIRE_SECONDS", "60"))
+
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login", auto_error=False)
+
+# Кеш аутентифицированных пользователей по username (sub токена)
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", "60"))
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "1024"))
+
+principal_cache = TTLCache(maxsize=PRINCIPAL_CACHE_SIZE, ttl=PRINCIPAL_CACHE_TTL)
+
+def invalidate_principal(username: str):
+    principal_cache.pop(username)
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_changed_principal(mapper, connection, target):
+    """Изменённый, деактивированный или удалённый пользователь вытесняется из кеша.
+
+    Событие приходит при flush, до коммита: параллельный запрос ещё может
+    прочитать старую строку и снова её закешировать, поэтому username
+    запоминается в сессии и вытесняется повторно после коммита.
+    """
+    # При переименовании вытесняем и запись под старым username
+    usernames = {target.username, *inspect(target).attrs.username.history.deleted}
+    for username in usernames:
+        invalidate_principal(username)
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault("changed_principals", set()).update(usernames)
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_principals(session):
+    for username in session.info.pop("changed_principals", ()):
+        invalidate_principal(username)
+
+@event.listens_for(Session, "after_rollback")
+def _forget_changed_principals(session):
+    session.info.pop("changed_principals", None)
 
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
@@ -45,7 +90,13 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+def create_stream_token(username: str) -> str:
+    return create_access_token(
+        {"sub": username, "scope": STREAM_TOKEN_SCOPE}, timedelta(seconds=STREAM_TOKEN_EXPIRE_SECONDS)
+    )
+
+def principal_from_token(db: Session, token: str, scope: Optional[str] = None) -> Principal:
+    """Пользователь по токену; scope токена должен совпадать (у обычных токенов его нет)"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -54,18 +105,59 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
-        if username is None:
+        if username is None or payload.get("scope") != scope:
             raise credentials_exception
         token_data = TokenData(username=username)
     except JWTError:
         raise credentials_exception
     
+    # Снимок пользователя (не ORM-объект) можно безопасно переиспользовать между запросами
+    principal = principal_cache.get(token_data.username)
+    if principal is not None:
+        return principal
+    
     user = get_user(db, username=token_data.username)
     if user is None:
         raise credentials_exception
-    return user
+    principal = Principal.model_validate(user)
+    principal_cache.set(token_data.username, principal)
+    return principal
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    return principal_from_token(db, token)
+
+async def get_current_active_user(current_user: Principal = Depends(get_current_user)):
+    if not current_user.is_active:
+        raise HTTPException(status_code=400, detail="Inactive user")
+    return current_user
+
+def get_stream_user(
+    token: Optional[str] = Depends(optional_oauth2_scheme),
+    access_token: Optional[str] = Query(
+        None, description="Токен потока (POST /auth/stream-token) для EventSource и ссылок на выгрузку"
+    ),
+):
+    """Пользователь долгого потока: сессия БД закрывается до начала потока, а не по его окончании.
 
-async def get_current_active_user(current_user: User = Depends(get_current_user)):
+    В заголовке — обычный токен, в параметре access_token — только
+    короткий токен потока.
+    """
+    if not token and not access_token:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    db = SessionLocal()
+    try:
+        if token:
+            current_user = principal_from_token(db, token)
+        else:
+            current_user = principal_from_token(db, access_token, STREAM_TOKEN_SCOPE)
+    finally:
+        db.close()
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
-    return current_user
\ No newline at end of file
+    return current_user
+
+redact_access_tokens()
@@ -1,8 +1,54 @@
 # backend/app/crud.py
-from sqlalchemy.orm import Session
+import os
+from datetime import datetime
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional, Tuple
+from sqlalchemy import and_, literal, or_, tuple_
+from sqlalchemy.orm import Session, joinedload, noload, selectinload
+from bmanager_common.events import event_bus
 from .models import User, Project, Task
 from .schemas import UserCreate, ProjectCreate, TaskCreate
 from .auth import get_password_hash
+from .search import search_ids
+
+# Стратегия загрузки связей в списках: selectin — отдельный IN-запрос на связь,
+# joined — LEFT JOIN в основном запросе
+RELATION_LOADING = os.getenv("RELATION_LOADING", "selectin")
+RELATION_LOADERS = {"selectin": selectinload, "joined": joinedload}
+
+# Вложенные объекты, которые можно запросить в списках (include)
+PROJECT_RELATIONS = ("creator",)
+TASK_RELATIONS = ("project", "project.creator", "assignee", "author")
+
+# Поля сортировки задач: sort=поле по возрастанию, sort=-поле по убыванию
+TASK_SORT_FIELDS = ("created_at", "due_date")
+# Задачи без срока при сортировке по due_date идут последними в обоих направлениях
+TASK_NULLABLE_SORT_FIELDS = ("due_date",)
+# Статус закрытой задачи; остальные считаются открытыми (в т.ч. для просрочки)
+TASK_DONE_STATUS = "done"
+
+# Проекты и задачи видны всем пользователям, поэтому события о них идут в одну общую тему
+CHANGES_TOPIC = "changes"
+
+def _project_options(include: Iterable[str], strategy: str):
+    loader = RELATION_LOADERS[strategy]
+    return [loader(Project.creator) if "creator" in include else noload(Project.creator)]
+
+def _task_options(include: Iterable[str], strategy: str):
+    loader = RELATION_LOADERS[strategy]
+    options = []
+    if "project" in include:
+        project = loader(Task.project)
+        if "project.creator" in include:
+            options.append(project.options(loader(Project.creator)))
+        else:
+            options.append(project.options(noload(Project.creator)))
+    else:
+        options.append(noload(Task.project))
+    for relation in ("assignee", "author"):
+        attr = getattr(Task, relation)
+        options.append(loader(attr) if relation in include else noload(attr))
+    return options
 
 def create_user(db: Session, user: UserCreate):
     hashed_password = get_password_hash(user.password)
@@ -23,6 +69,11 @@ def create_project(db: Session, project: ProjectCreate, user_id: int):
     db.add(db_project)
     db.commit()
     db.refresh(db_project)
+    event_bus.publish(CHANGES_TOPIC, "project.created", {
+        "id": db_project.id,
+        "name": db_project.name,
+        "status": db_project.status,
+    })
     return db_project
 
 def create_task(db: Session, task: TaskCreate, user_id: int):
@@ -30,6 +81,15 @@ def create_task(db: Session, task: TaskCreate, user_id: int):
     db.add(db_task)
     db.commit()
     db.refresh(db_task)
+    event_bus.publish(CHANGES_TOPIC, "task.created", {
+        "id": db_task.id,
+        "project_id": db_task.project_id,
+        "title": db_task.title,
+        "status": db_task.status,
+        "priority": db_task.priority,
+        "assigned_to": db_task.assigned_to,
+        "due_date": db_task.due_date,
+    })
     return db_task
 
 def get_user_by_username(db: Session, username: str):
@@ -38,8 +98,166 @@ def get_user_by_username(db: Session, username: str):
 def get_user_by_email(db: Session, email: str):
     return db.query(User).filter(User.email == email).first()
 
-def get_projects(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(Project).offset(skip).limit(limit).all()
+def get_projects(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    after: Optional[Tuple[datetime, int]] = None,
+    include: Iterable[str] = PROJECT_RELATIONS,
+    strategy: str = RELATION_LOADING,
+):
+    """Проекты в порядке (created_at, id); after — позиция курсора.
+
+    Связи из include загружаются заранее, остальные не загружаются вовсе.
+    """
+    query = db.query(Project).options(*_project_options(include, strategy))
+    if after is not None:
+        query = query.filter(tuple_(Project.created_at, Project.id) > after)
+    query = query.order_by(Project.created_at, Project.id)
+    if skip:
+        query = query.offset(skip)
+    return query.limit(limit).all()
+
+def get_project(db: Session, project_id: int):
+    return db.query(Project).filter(Project.id == project_id).first()
+
+def parse_task_sort(sort: str) -> Tuple[str, bool]:
+    """(поле, по убыванию) из параметра sort; ValueError для неизвестного поля"""
+    field = sort[1:] if sort.startswith("-") else sort
+    if field not in TASK_SORT_FIELDS:
+        raise ValueError(f"Unknown sort field: {field}")
+    return field, sort.startswith("-")
+
+def _task_filters(
+    project_id: Optional[int],
+    status: Optional[str],
+    priority: Optional[str],
+    assigned_to: Optional[int],
+    due_before: Optional[datetime],
+    due_after: Optional[datetime],
+    overdue: bool,
+    created_from: Optional[datetime],
+    created_to: Optional[datetime],
+) -> list:
+    filters = []
+    if project_id is not None:
+        filters.append(Task.project_id == project_id)
+    if status is not None:
+        filters.append(Task.status == status)
+    if priority is not None:
+        filters.append(Task.priority == priority)
+    if assigned_to is not None:
+        filters.append(Task.assigned_to == assigned_to)
+    if due_before is not None:
+        filters.append(Task.due_date < due_before)
+    if due_after is not None:
+        filters.append(Task.due_date >= due_after)
+    if overdue:
+        # Литерал, а не параметр: иначе SQLite не сопоставит условие с частичным индексом
+        filters.append(Task.due_date < datetime.utcnow())
+        filters.append(Task.status != literal(TASK_DONE_STATUS, literal_execute=True))
+    if created_from is not None:
+        filters.append(Task.created_at >= created_from)
+    if created_to is not None:
+        filters.append(Task.created_at < created_to)
+    return filters
+
+def _task_after(column, descending: bool, after: Tuple[Optional[datetime], int], nulls: bool):
+    """Условие keyset-курсора для порядка (column, id) с NULL в конце"""
+    value, row_id = after
+    if value is None:
+        return and_(column.is_(None), Task.id < row_id if descending else Task.id > row_id)
+    key = tuple_(column, Task.id)
+    beyond = key < (value, row_id) if descending else key > (value, row_id)
+    return or_(beyond, column.is_(None)) if nulls else beyond
+
+def tasks_query(
+    db: Session,
+    after: Optional[Tuple[Optional[datetime], int]] = None,
+    include: Iterable[str] = TASK_RELATIONS,
+    strategy: str = RELATION_LOADING,
+    project_id: Optional[int] = None,
+    status: Optional[str] = None,
+    priority: Optional[str] = None,
+    assigned_to: Optional[int] = None,
+    due_before: Optional[datetime] = None,
+    due_after: Optional[datetime] = None,
+    overdue: bool = False,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    sort: str = "created_at",
+):
+    """Запрос задач по фильтрам в порядке (sort, id); after — позиция курсора.
+
+    overdue — срок прошёл, а задача не закрыта; created_from/created_to —
+    период создания [from, to). Связи из include загружаются заранее,
+    остальные не загружаются вовсе.
+    """
+    field, descending = parse_task_sort(sort)
+    column = getattr(Task, field)
+    query = db.query(Task).options(*_task_options(include, strategy))
+    query = query.filter(*_task_filters(
+        project_id, status, priority, assigned_to, due_before, due_after, overdue, created_from, created_to
+    ))
+    # Фильтры по сроку отсекают NULL, тогда порядок совпадает с индексом
+    nulls = field in TASK_NULLABLE_SORT_FIELDS and not (overdue or due_before or due_after)
+    if after is not None:
+        query = query.filter(_task_after(column, descending, after, nulls))
+    if descending:
+        query = query.order_by(column.desc(), Task.id.desc())
+    elif nulls:
+        query = query.order_by(column.asc().nulls_last(), Task.id)
+    else:
+        query = query.order_by(column, Task.id)
+    return query
+
+def get_tasks(db: Session, skip: int = 0, limit: int = 100, **options):
+    """Страница задач; options — параметры tasks_query"""
+    query = tasks_query(db, **options)
+    if skip:
+        query = query.offset(skip)
+    return query.limit(limit).all()
+
+def iter_tasks(db: Session, batch_size: int, **options) -> Iterator[List[Task]]:
+    """Задачи пачками по batch_size без связей; строки читаются курсором (yield_per),
+    так что в памяти одновременно только одна пачка"""
+    rows = iter(tasks_query(db, include=(), **options).yield_per(batch_size))
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return
+        yield batch
+
+def _in_order(rows: list, ids: list) -> list:
+    position = {row_id: i for i, row_id in enumerate(ids)}
+    return sorted(rows, key=lambda row: position[row.id])
+
+def search_projects(
+    db: Session,
+    q: str,
+    skip: int = 0,
+    limit: int = 20,
+    include: Iterable[str] = PROJECT_RELATIONS,
+    strategy: str = RELATION_LOADING,
+):
+    """Проекты по полнотекстовому запросу в порядке релевантности"""
+    ids = search_ids(db, "projects_fts", q, skip, limit)
+    if not ids:
+        return []
+    projects = db.query(Project).options(*_project_options(include, strategy)).filter(Project.id.in_(ids)).all()
+    return _in_order(projects, ids)
 
-def get_tasks(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(Task).offset(skip).limit(limit).all()
\ No newline at end of file
+def search_tasks(
+    db: Session,
+    q: str,
+    skip: int = 0,
+    limit: int = 20,
+    include: Iterable[str] = TASK_RELATIONS,
+    strategy: str = RELATION_LOADING,
+):
+    """Задачи по полнотекстовому запросу в порядке релевантности"""
+    ids = search_ids(db, "tasks_fts", q, skip, limit)
+    if not ids:
+        return []
+    tasks = db.query(Task).options(*_task_options(include, strategy)).filter(Task.id.in_(ids)).all()
+    return _in_order(tasks, ids)
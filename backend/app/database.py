@@ -0,0 +1,68 @@
+# backend/app/database.py
+import os
+from contextlib import ExitStack, contextmanager
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from bmanager_common.sql_metrics import instrument_engine
+
+SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./business_manager.db")
+
+engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+instrument_engine(engine)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Сколько соединений пула открывается при старте (по умолчанию — весь пул)
+DB_POOL_WARM = int(os.getenv("DB_POOL_WARM", "0")) or getattr(engine.pool, "size", lambda: 1)()
+
+def create_schema(metadata):
+    """Создание таблиц и недостающих индексов.
+
+    create_all не добавляет новые индексы к уже существующим таблицам,
+    поэтому индексы создаются отдельно с проверкой наличия.
+    """
+    metadata.create_all(bind=engine)
+    for table in metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+def schema_version() -> int:
+    """Версия схемы базы (PRAGMA user_version)"""
+    with engine.connect() as connection:
+        return connection.exec_driver_sql("PRAGMA user_version").scalar()
+
+def set_schema_version(version: int):
+    with engine.begin() as connection:
+        connection.exec_driver_sql(f"PRAGMA user_version = {int(version)}")
+
+def warm_up_pool(count: int = DB_POOL_WARM):
+    """Открытие соединений пула заранее: первые запросы не ждут подключения"""
+    with ExitStack() as stack:
+        for _ in range(count):
+            stack.enter_context(engine.connect())
+
+def check_database():
+    """SELECT 1 через пул, которым пользуются обработчики запросов"""
+    with engine.connect() as connection:
+        connection.exec_driver_sql("SELECT 1")
+
+@contextmanager
+def count_queries(bind=engine):
+    """Подсчёт SQL-запросов внутри блока, например для поиска N+1"""
+    counter = {"count": 0}
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        counter["count"] += 1
+
+    event.listen(bind, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(bind, "before_cursor_execute", before_cursor_execute)
+
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
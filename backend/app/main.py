@@ -1,20 +1,57 @@
 # backend/app/main.py
-from fastapi import FastAPI, Depends, HTTPException, status
+import asyncio
+import logging
+
+from fastapi import FastAPI, Depends, Header, HTTPException, Query, Request, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
 from sqlalchemy.orm import Session
-from datetime import timedelta
-from typing import List
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from bmanager_common.events import EVENT_STREAM_HEADERS, event_bus
+from bmanager_common.export import EXPORT_BATCH_SIZE, export_response
+from bmanager_common.metrics import metrics_response
+from bmanager_common.profiling import ProfilingMiddleware
+from bmanager_common.sql_metrics import QueryMetricsMiddleware
 
-from .database import SessionLocal, engine, get_db
-from .models import Base
+from .database import SessionLocal, check_database, get_db, warm_up_pool
 from .schemas import User, UserCreate, UserLogin, Token, Project, ProjectCreate, Task, TaskCreate
-from .auth import authenticate_user, create_access_token, get_current_active_user, get_password_hash
+from .responses import PROJECT_LIST, TASK_LIST, list_json, list_response, model_response
+from .auth import authenticate_user, create_access_token, get_current_active_user, get_password_hash, get_stream_user, principal_cache
+from .auth import STREAM_TOKEN_EXPIRE_SECONDS, create_stream_token
 from .crud import create_user, get_user_by_username, get_user_by_email, create_project, create_task, get_projects, get_tasks
+from .crud import get_project, iter_tasks, parse_task_sort
+from .crud import search_projects, search_tasks
+from .crud import CHANGES_TOPIC, PROJECT_RELATIONS, TASK_RELATIONS
+from .migrations import prepare_database
+from .pagination import decode_cursor, encode_cursor
+from .response_cache import cacheable_response, cached_response, etag_matches, not_modified, resource_etag, response_cache
 
-# Создаем таблицы
-Base.metadata.create_all(bind=engine)
+logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Business Manager API", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Проверка схемы и прогрев пула соединений до приёма трафика"""
+    await asyncio.to_thread(prepare_database)
+    await asyncio.to_thread(warm_up_pool)
+    app.state.ready = True
+    try:
+        yield
+    finally:
+        app.state.ready = False
+
+app = FastAPI(
+    title="Business Manager API",
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
+)
+
+app.add_middleware(QueryMetricsMiddleware)
+# Профиль отдельного запроса по X-Profile или выборке (PROFILE_TOKEN, PROFILE_SAMPLE_RATE)
+app.add_middleware(ProfilingMiddleware)
 
 # CORS для порта 4001
 app.add_middleware(
@@ -23,10 +60,56 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
+)
+
+# Колонки CSV-выгрузки задач
+TASK_EXPORT_COLUMNS = (
+    "id", "title", "description", "status", "priority", "due_date",
+    "project_id", "assigned_to", "created_by", "created_at",
 )
 
+# Данные, из которых собираются ответы списков (для ETag)
+PROJECT_RESOURCES = ("projects", "users")
+TASK_RESOURCES = ("tasks", "projects", "users")
+
+def paginate(items: list, limit: int, field: str = "created_at") -> tuple:
+    """Обрезка лишней записи и заголовок X-Next-Cursor со следующей страницей"""
+    headers = {}
+    if len(items) > limit:
+        items = items[:limit]
+        headers["X-Next-Cursor"] = encode_cursor(getattr(items[-1], field), items[-1].id)
+    return items, headers
+
+def parse_include(include: Optional[str], allowed: tuple) -> tuple:
+    """Набор вложенных объектов из параметра include (по умолчанию — все)"""
+    if include is None:
+        return allowed
+    requested = tuple(name.strip() for name in include.split(",") if name.strip())
+    unknown = [name for name in requested if name not in allowed]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown include: {', '.join(unknown)}. Allowed: {', '.join(allowed)}",
+        )
+    return requested
+
+def sparse_exclude(include: tuple, allowed: tuple) -> dict:
+    """Исключения для model_dump: не запрошенные вложенные объекты"""
+    exclude = {}
+    for name in allowed:
+        if name in include:
+            continue
+        parent, _, child = name.partition(".")
+        if child:
+            if parent in include:
+                exclude[parent] = {child: True}
+        else:
+            exclude[parent] = True
+    return exclude
+
 # Auth routes
-@app.post("/auth/register")
+@app.post("/auth/register", response_model=User)
 def register(user: UserCreate, db: Session = Depends(get_db)):
     db_user = get_user_by_username(db, username=user.username)
     if db_user:
@@ -34,9 +117,10 @@ def register(user: UserCreate, db: Session = Depends(get_db)):
     db_user = get_user_by_email(db, email=user.email)
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
-    return create_user(db=db, user=user)
+    # Только поля схемы User: hashed_password и служебные колонки не уходят клиенту
+    return model_response(User.model_validate(create_user(db=db, user=user)))
 
-@app.post("/auth/login")
+@app.post("/auth/login", response_model=Token)
 def login(user_data: UserLogin, db: Session = Depends(get_db)):
     user = authenticate_user(db, user_data.username, user_data.password)
     if not user:
@@ -49,81 +133,265 @@ def login(user_data: UserLogin, db: Session = Depends(get_db)):
         data={"sub": user.username}, expires_delta=access_token_expires
     )
     
-    # Добавляем имя роли в ответ
-    from .schemas import get_role_name
-    user_dict = {
-        "id": user.id,
-        "username": user.username,
-        "email": user.email,
-        "full_name": user.full_name,
-        "role": user.role,
-        "role_name": get_role_name(user.role),
-        "is_active": user.is_active,
-        "is_admin": user.is_admin,
-        "created_at": user.created_at.isoformat() if user.created_at else None
-    }
-    
-    return {"access_token": access_token, "token_type": "bearer", "user": user_dict}
+    # Имя роли добавляется схемой User
+    return model_response(Token(access_token=access_token, token_type="bearer", user=User.model_validate(user)))
+
+@app.post("/auth/stream-token")
+async def issue_stream_token(current_user: User = Depends(get_current_active_user)):
+    """Короткий токен для параметра access_token: EventSource и ссылки на выгрузку не передают заголовки"""
+    return {"stream_token": create_stream_token(current_user.username), "expires_in": STREAM_TOKEN_EXPIRE_SECONDS}
 
 # User routes
-@app.get("/users/me")
+@app.get("/users/me", response_model=User)
 async def read_users_me(current_user: User = Depends(get_current_active_user)):
-    from .schemas import get_role_name
-    user_dict = {
-        "id": current_user.id,
-        "username": current_user.username,
-        "email": current_user.email,
-        "full_name": current_user.full_name,
-        "role": current_user.role,
-        "role_name": get_role_name(current_user.role),
-        "is_active": current_user.is_active,
-        "is_admin": current_user.is_admin,
-        "created_at": current_user.created_at.isoformat() if current_user.created_at else None
-    }
-    return user_dict
+    return model_response(current_user)
 
 # Project routes
-@app.post("/projects/")
+@app.post("/projects/", response_model=Project)
 def create_new_project(
     project: ProjectCreate,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    return create_project(db=db, project=project, user_id=current_user.id)
+    return model_response(Project.model_validate(create_project(db=db, project=project, user_id=current_user.id)))
 
-@app.get("/projects/")
+@app.get("/projects/", response_model=List[Project])
 def read_projects(
-    skip: int = 0, 
-    limit: int = 100, 
+    request: Request,
+    skip: int = Query(0, ge=0, deprecated=True),
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None,
+    include: Optional[str] = Query(None, description="Вложенные объекты через запятую: creator"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    # Без изменений с прошлого опроса — 304 без обращения к ORM
+    etag = resource_etag(db, request, PROJECT_RESOURCES)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    cached = cached_response(etag)
+    if cached is not None:
+        return cached
+
+    after = decode_cursor(cursor) if cursor else None
+    fields = parse_include(include, PROJECT_RELATIONS)
+    projects = get_projects(db, skip=skip, limit=limit + 1, after=after, include=fields)
+    projects, headers = paginate(projects, limit)
+    exclude = sparse_exclude(fields, PROJECT_RELATIONS)
+    body = list_json(PROJECT_LIST, [Project.model_validate(project) for project in projects], exclude)
+    return cacheable_response(PROJECT_RESOURCES, etag, body, headers)
+
+@app.get("/projects/search", response_model=List[Project])
+def search_projects_endpoint(
+    q: str = Query(..., min_length=1, max_length=200, description="Слова для поиска по названию и описанию"),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    include: Optional[str] = Query(None, description="Вложенные объекты через запятую: creator"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    projects = get_projects(db, skip=skip, limit=limit)
-    return projects
+    """Полнотекстовый поиск проектов, самые релевантные первыми"""
+    fields = parse_include(include, PROJECT_RELATIONS)
+    projects = search_projects(db, q, skip=skip, limit=limit, include=fields)
+    exclude = sparse_exclude(fields, PROJECT_RELATIONS)
+    return list_response(PROJECT_LIST, [Project.model_validate(project) for project in projects], exclude)
 
 # Task routes
-@app.post("/tasks/")
+def task_filters(
+    status: Optional[str] = Query(None, description="todo, in_progress, done"),
+    priority: Optional[str] = Query(None, description="low, medium, high"),
+    assigned_to: Optional[int] = None,
+    due_before: Optional[datetime] = Query(None, description="Срок раньше указанного момента"),
+    due_after: Optional[datetime] = Query(None, description="Срок не раньше указанного момента"),
+    overdue: bool = Query(False, description="Срок прошёл, задача не закрыта"),
+    created_from: Optional[datetime] = Query(None, description="Создана не раньше указанного момента"),
+    created_to: Optional[datetime] = Query(None, description="Создана раньше указанного момента"),
+    sort: str = Query("created_at", description="created_at, due_date; -поле — по убыванию"),
+) -> dict:
+    """Общие параметры фильтрации и сортировки списков задач"""
+    try:
+        parse_task_sort(sort)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {
+        "status": status,
+        "priority": priority,
+        "assigned_to": assigned_to,
+        "due_before": due_before,
+        "due_after": due_after,
+        "overdue": overdue,
+        "created_from": created_from,
+        "created_to": created_to,
+        "sort": sort,
+    }
+
+def task_list_response(
+    request: Request,
+    db: Session,
+    filters: dict,
+    skip: int,
+    limit: int,
+    cursor: Optional[str],
+    include: Optional[str],
+):
+    """Страница задач по фильтрам с ETag и X-Next-Cursor"""
+    # Просрочка зависит от текущего времени, а не только от данных, — такие ответы не кешируются
+    etag = None if filters["overdue"] else resource_etag(db, request, TASK_RESOURCES)
+    if etag is not None:
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        cached = cached_response(etag)
+        if cached is not None:
+            return cached
+
+    after = decode_cursor(cursor) if cursor else None
+    fields = parse_include(include, TASK_RELATIONS)
+    tasks = get_tasks(db, skip=skip, limit=limit + 1, after=after, include=fields, **filters)
+    field, _ = parse_task_sort(filters["sort"])
+    tasks, headers = paginate(tasks, limit, field)
+    exclude = sparse_exclude(fields, TASK_RELATIONS)
+    body = list_json(TASK_LIST, [Task.model_validate(task) for task in tasks], exclude)
+    if etag is None:
+        return Response(body, media_type="application/json", headers=headers)
+    return cacheable_response(TASK_RESOURCES, etag, body, headers)
+
+@app.post("/tasks/", response_model=Task)
 def create_new_task(
     task: TaskCreate,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    return create_task(db=db, task=task, user_id=current_user.id)
+    return model_response(Task.model_validate(create_task(db=db, task=task, user_id=current_user.id)))
 
-@app.get("/tasks/")
+@app.get("/tasks/", response_model=List[Task])
 def read_tasks(
-    skip: int = 0, 
-    limit: int = 100, 
+    request: Request,
+    skip: int = Query(0, ge=0, deprecated=True),
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None,
+    project_id: Optional[int] = None,
+    include: Optional[str] = Query(None, description="Вложенные объекты через запятую: project, project.creator, assignee, author"),
+    filters: dict = Depends(task_filters),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    tasks = get_tasks(db, skip=skip, limit=limit)
-    return tasks
+    return task_list_response(request, db, {**filters, "project_id": project_id}, skip, limit, cursor, include)
+
+@app.get("/projects/{project_id}/tasks", response_model=List[Task])
+def read_project_tasks(
+    project_id: int,
+    request: Request,
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None,
+    include: Optional[str] = Query(None, description="Вложенные объекты через запятую: project, project.creator, assignee, author"),
+    filters: dict = Depends(task_filters),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Задачи проекта с теми же фильтрами и сортировкой, что у /tasks/"""
+    if get_project(db, project_id) is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+    return task_list_response(request, db, {**filters, "project_id": project_id}, 0, limit, cursor, include)
+
+@app.get("/tasks/export")
+def export_tasks(
+    request: Request,
+    fmt: str = Query("csv", alias="format", description="csv или ndjson"),
+    project_id: Optional[int] = None,
+    filters: dict = Depends(task_filters),
+    current_user: User = Depends(get_stream_user)
+):
+    """Выгрузка задач потоком (CSV или NDJSON) с фильтрами списка задач.
+
+    Строки читаются курсором пачками по EXPORT_BATCH_SIZE и сразу
+    отправляются клиенту, так что память не растёт с числом задач;
+    при Accept-Encoding: gzip поток сжимается на лету.
+    """
+    def batches():
+        # Своя сессия: поток живёт дольше обработчика и его зависимостей
+        db = SessionLocal()
+        try:
+            for tasks in iter_tasks(db, EXPORT_BATCH_SIZE, project_id=project_id, **filters):
+                yield [Task.model_validate(task) for task in tasks]
+        finally:
+            db.close()
+
+    return export_response(
+        request, fmt, TASK_EXPORT_COLUMNS, batches(), "tasks", exclude={"project", "assignee", "author"}
+    )
+
+@app.get("/tasks/search", response_model=List[Task])
+def search_tasks_endpoint(
+    q: str = Query(..., min_length=1, max_length=200, description="Слова для поиска по заголовку и описанию"),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    include: Optional[str] = Query(None, description="Вложенные объекты через запятую: project, project.creator, assignee, author"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Полнотекстовый поиск задач (дефектов), самые релевантные первыми"""
+    fields = parse_include(include, TASK_RELATIONS)
+    tasks = search_tasks(db, q, skip=skip, limit=limit, include=fields)
+    exclude = sparse_exclude(fields, TASK_RELATIONS)
+    return list_response(TASK_LIST, [Task.model_validate(task) for task in tasks], exclude)
+
+# Change events
+@app.get("/events")
+async def change_events(
+    last_event_id: Optional[str] = Header(None),
+    current_user: User = Depends(get_stream_user)
+):
+    """Поток Server-Sent Events о новых проектах и задачах вместо опроса списков.
+
+    После разрыва EventSource переподключается с Last-Event-ID и получает
+    пропущенные события; если их уже нет в буфере — событие reset.
+    """
+    return StreamingResponse(
+        event_bus.stream([CHANGES_TOPIC], last_event_id),
+        media_type="text/event-stream",
+        headers=EVENT_STREAM_HEADERS,
+    )
 
 @app.get("/")
 def read_root():
     return {"message": "Business Manager API"}
 
+@app.get("/health")
+def health_check():
+    return {"status": "healthy", "service": "backend"}
+
+@app.get("/ready")
+def readiness_check():
+    """Готовность принимать трафик: старт завершён и база отвечает"""
+    if not getattr(app.state, "ready", False):
+        return ORJSONResponse(status_code=503, content={"status": "starting", "service": "backend"})
+    try:
+        check_database()
+    except Exception as e:
+        logger.warning(f"Readiness check failed: {e}")
+        return ORJSONResponse(status_code=503, content={"status": "unavailable", "service": "backend", "database": str(e)})
+    return {"status": "ready", "service": "backend", "database": "ok"}
+
+@app.get("/stats/principal-cache")
+def principal_cache_stats():
+    """Счётчики кеша аутентифицированных пользователей"""
+    return principal_cache.stats()
+
+@app.get("/stats/response-cache")
+def response_cache_stats():
+    """Счётчики LRU сериализованных ответов"""
+    return response_cache.stats()
+
+@app.get("/stats/events")
+def event_stats():
+    """Состояние шины событий"""
+    return event_bus.stats()
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Метрики в текстовом формате Prometheus"""
+    return metrics_response()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
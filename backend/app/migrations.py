@@ -0,0 +1,39 @@
+# backend/app/migrations.py
+import logging
+import os
+
+from .database import create_schema, engine, schema_version, set_schema_version
+from .models import Base
+from .search import ensure_fts
+
+logger = logging.getLogger(__name__)
+
+# Версия схемы в PRAGMA user_version. Увеличивается при любом изменении моделей,
+# индексов или полнотекстовых индексов — иначе уже развёрнутые базы их не получат
+SCHEMA_VERSION = 1
+
+# Применять миграции при старте; при выключенном старт с устаревшей схемой
+# завершается ошибкой, а миграции выполняются отдельно: python -m app.migrations
+MIGRATE_ON_STARTUP = os.getenv("MIGRATE_ON_STARTUP", "true").lower() in ("1", "true", "yes")
+
+def migrate():
+    """Создание таблиц, индексов и полнотекстовых индексов"""
+    create_schema(Base.metadata)
+    ensure_fts(engine)
+    set_schema_version(SCHEMA_VERSION)
+    logger.info(f"Database schema is at version {SCHEMA_VERSION}")
+
+def prepare_database():
+    """Проверка схемы при старте: при актуальной версии — один PRAGMA вместо миграций"""
+    version = schema_version()
+    if version >= SCHEMA_VERSION:
+        return
+    if not MIGRATE_ON_STARTUP:
+        raise RuntimeError(
+            f"Database schema version {version} is older than {SCHEMA_VERSION}, run python -m app.migrations"
+        )
+    migrate()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    migrate()
@@ -0,0 +1,82 @@
+# backend/app/models.py
+from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, ForeignKey, Index, text
+from sqlalchemy.orm import relationship
+from sqlalchemy.ext.declarative import declarative_base
+import datetime
+
+from .schemas import get_role_name
+
+Base = declarative_base()
+
+class User(Base):
+    __tablename__ = "users"
+
+    id = Column(Integer, primary_key=True, index=True)
+    username = Column(String, unique=True, index=True, nullable=False)
+    email = Column(String, unique=True, index=True, nullable=False)
+    hashed_password = Column(String, nullable=False)
+    full_name = Column(String)
+    role = Column(Integer, default=1)  # 1 - инженер, 2 - менеджер, 3 - руководитель
+    is_active = Column(Boolean, default=True)
+    is_admin = Column(Boolean, default=False)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+    @property
+    def role_name(self):
+        return get_role_name(self.role)
+
+class Project(Base):
+    __tablename__ = "projects"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, nullable=False)
+    description = Column(Text)
+    status = Column(String, default="active")
+    created_by = Column(Integer, ForeignKey("users.id"), nullable=False)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+    creator = relationship("User", foreign_keys=[created_by])
+    tasks = relationship("Task", back_populates="project")
+
+    __table_args__ = (
+        # Курсорная пагинация по (created_at, id)
+        Index("ix_projects_created_at_id", "created_at", "id"),
+    )
+
+class Task(Base):
+    __tablename__ = "tasks"
+
+    id = Column(Integer, primary_key=True, index=True)
+    title = Column(String, nullable=False)
+    description = Column(Text)
+    status = Column(String, default="todo")  # todo, in_progress, done
+    priority = Column(String, default="medium")  # low, medium, high
+    due_date = Column(DateTime, nullable=True)
+    project_id = Column(Integer, ForeignKey("projects.id"), nullable=False)
+    assigned_to = Column(Integer, ForeignKey("users.id"), nullable=True)
+    created_by = Column(Integer, ForeignKey("users.id"), nullable=False)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+    project = relationship("Project", back_populates="tasks")
+    assignee = relationship("User", foreign_keys=[assigned_to])
+    author = relationship("User", foreign_keys=[created_by])
+
+    __table_args__ = (
+        # Курсорная пагинация по (created_at, id)
+        Index("ix_tasks_created_at_id", "created_at", "id"),
+        # Задачи проекта в порядке создания (GET /projects/{id}/tasks, загрузка Project.tasks)
+        Index("ix_tasks_project_created_at", "project_id", "created_at", "id"),
+        # Фильтр по статусу в порядке создания
+        Index("ix_tasks_status_created_at", "status", "created_at", "id"),
+        # Задачи исполнителя: по статусу и сроку
+        Index("ix_tasks_assignee_status_due", "assigned_to", "status", "due_date"),
+        # Открытые задачи по сроку (просроченные); в индекс не попадают закрытые
+        Index("ix_tasks_open_due", "due_date", "id", sqlite_where=text("status != 'done'")),
+    )
+
+class ChangeCounter(Base):
+    """Счётчик изменений ресурса (projects, tasks, users) — основа ETag для списков"""
+    __tablename__ = "change_counters"
+
+    name = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
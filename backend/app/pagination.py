@@ -0,0 +1,24 @@
+# backend/app/pagination.py
+import base64
+import binascii
+import datetime
+import json
+from typing import Any, Optional, Tuple
+
+from fastapi import HTTPException
+
+
+def encode_cursor(value: Optional[datetime.datetime], row_id: Any) -> str:
+    """Непрозрачный курсор на позицию (значение поля сортировки, id)"""
+    raw = json.dumps([value.isoformat() if value is not None else None, row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Optional[datetime.datetime], Any]:
+    """Разбор курсора, полученного от клиента"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return (datetime.datetime.fromisoformat(value) if value is not None else None), row_id
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
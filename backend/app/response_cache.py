@@ -0,0 +1,136 @@
+# backend/app/response_cache.py
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from fastapi import Request
+from fastapi.responses import Response
+from sqlalchemy import event, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from .models import ChangeCounter, Project, Task, User
+
+# Размер in-memory LRU сериализованных ответов (0 — только ETag/304)
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "512"))
+
+# Какой счётчик увеличивает запись каждой из моделей
+COUNTED_MODELS = {Project: "projects", Task: "tasks", User: "users"}
+
+class ResponseCache:
+    """Потокобезопасный LRU сериализованных тел ответов по ETag"""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[str, Tuple[Tuple[str, ...], bytes, dict]]" = OrderedDict()
+        self._by_scope: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, etag: str) -> Optional[Tuple[bytes, dict]]:
+        with self._lock:
+            entry = self._data.get(etag)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(etag)
+            self.hits += 1
+            return entry[1], entry[2]
+
+    def set(self, scopes: Iterable[str], etag: str, body: bytes, headers: dict):
+        if self.maxsize <= 0:
+            return
+        scopes = tuple(scopes)
+        with self._lock:
+            self._data[etag] = (scopes, body, headers)
+            self._data.move_to_end(etag)
+            for scope in scopes:
+                self._by_scope.setdefault(scope, set()).add(etag)
+            while len(self._data) > self.maxsize:
+                old_etag, (old_scopes, _, _) = self._data.popitem(last=False)
+                for scope in old_scopes:
+                    self._by_scope.get(scope, set()).discard(old_etag)
+
+    def invalidate(self, scope: str):
+        with self._lock:
+            for etag in self._by_scope.pop(scope, ()):
+                self._data.pop(etag, None)
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+response_cache = ResponseCache(RESPONSE_CACHE_SIZE)
+
+@event.listens_for(Session, "after_flush")
+def _bump_change_counters(session, flush_context):
+    """Любая запись проектов, задач или пользователей увеличивает их счётчик в той же транзакции"""
+    names = {
+        COUNTED_MODELS[type(instance)]
+        for instance in (*session.new, *session.dirty, *session.deleted)
+        if type(instance) in COUNTED_MODELS
+    }
+    if not names:
+        return
+    connection = session.connection()
+    for name in sorted(names):
+        statement = insert(ChangeCounter).values(name=name, version=1)
+        connection.execute(statement.on_conflict_do_update(
+            index_elements=[ChangeCounter.name],
+            set_={"version": ChangeCounter.version + 1},
+        ))
+    session.info.setdefault("changed_resources", set()).update(names)
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_cached_bodies(session):
+    for name in session.info.pop("changed_resources", ()):
+        response_cache.invalidate(name)
+
+@event.listens_for(Session, "after_rollback")
+def _forget_changed_resources(session):
+    session.info.pop("changed_resources", None)
+
+def resource_etag(db: Session, request: Request, resources: Tuple[str, ...]) -> str:
+    """Сильный ETag: ресурс с параметрами запроса + версии всех данных, из которых собран ответ"""
+    rows = db.execute(select(ChangeCounter.name, ChangeCounter.version).where(ChangeCounter.name.in_(resources)))
+    versions = dict(rows.all())
+    key = f"{request.url.path}?{request.url.query}|" + ",".join(f"{name}={versions.get(name, 0)}" for name in resources)
+    return '"' + hashlib.blake2s(key.encode(), digest_size=16).hexdigest() + '"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Проверка If-None-Match (слабое сравнение, RFC 9110)"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = (tag.strip() for tag in header.split(","))
+    return etag in (tag[2:] if tag.startswith("W/") else tag for tag in candidates)
+
+def _cache_headers(etag: str, headers: Optional[dict] = None) -> dict:
+    # Клиент может хранить ответ, но обязан перепроверять его по ETag
+    return {**(headers or {}), "ETag": etag, "Cache-Control": "private, no-cache"}
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers=_cache_headers(etag))
+
+def cached_response(etag: str) -> Optional[Response]:
+    """Готовый ответ из LRU, если тело для этого ETag уже сериализовано"""
+    entry = response_cache.get(etag)
+    if entry is None:
+        return None
+    body, headers = entry
+    return Response(body, media_type="application/json", headers=_cache_headers(etag, headers))
+
+def cacheable_response(resources: Tuple[str, ...], etag: str, body: bytes, headers: Optional[dict] = None) -> Response:
+    """JSON-ответ с ETag; сериализованное тело сохраняется в LRU"""
+    headers = headers or {}
+    response_cache.set(resources, etag, body, headers)
+    return Response(body, media_type="application/json", headers=_cache_headers(etag, headers))
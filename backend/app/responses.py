@@ -0,0 +1,28 @@
+# backend/app/responses.py
+from typing import List, Optional
+
+from fastapi.responses import Response
+from pydantic import BaseModel, TypeAdapter
+from pydantic_core import to_json
+
+from .schemas import Project, Task
+
+# Компилированные сериализаторы списков
+PROJECT_LIST = TypeAdapter(List[Project])
+TASK_LIST = TypeAdapter(List[Task])
+
+def model_json(model: BaseModel) -> bytes:
+    """Сериализация модели компилированным энкодером pydantic-core, без jsonable_encoder"""
+    return to_json(model)
+
+def list_json(adapter: TypeAdapter, items: list, exclude: Optional[dict] = None) -> bytes:
+    """Сериализация списка моделей; exclude применяется к каждому элементу"""
+    return adapter.dump_json(items, exclude={"__all__": exclude} if exclude else None)
+
+def list_response(adapter: TypeAdapter, items: list, exclude: Optional[dict] = None) -> Response:
+    """JSON-ответ со списком моделей"""
+    return Response(list_json(adapter, items, exclude), media_type="application/json")
+
+def model_response(model: BaseModel, status_code: int = 200, headers: Optional[dict] = None) -> Response:
+    """JSON-ответ из типизированной Pydantic-модели"""
+    return Response(model_json(model), status_code=status_code, media_type="application/json", headers=headers)
@@ -0,0 +1,72 @@
+# backend/app/search.py
+import re
+from typing import List, Optional, Sequence
+
+from sqlalchemy import inspect, text
+from sqlalchemy.orm import Session
+
+# Полнотекстовые индексы FTS5: таблица индекса -> (таблица с данными, колонки, веса bm25).
+# Индексы внешнего содержимого (content=...) хранят только термы, текст читается из таблицы
+FTS_INDEXES = {
+    "tasks_fts": ("tasks", ("title", "description"), (10.0, 1.0)),
+    "projects_fts": ("projects", ("name", "description"), (10.0, 1.0)),
+}
+
+# unicode61 приводит регистр и для кириллицы; prefix ускоряет запросы вида "бетон*"
+FTS_TOKENIZE = "unicode61 remove_diacritics 2"
+FTS_PREFIX = "2 3"
+
+_TERM = re.compile(r"\w+", re.UNICODE)
+
+def fts_ddl(index: str, table: str, columns: Sequence[str]) -> List[str]:
+    """Создание индекса и триггеров, поддерживающих его при INSERT/UPDATE/DELETE"""
+    cols = ", ".join(columns)
+    new = ", ".join(f"new.{c}" for c in columns)
+    old = ", ".join(f"old.{c}" for c in columns)
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {index} USING fts5({cols}, content='{table}', "
+        f"content_rowid='id', tokenize='{FTS_TOKENIZE}', prefix='{FTS_PREFIX}')",
+        f"CREATE TRIGGER IF NOT EXISTS {index}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {index}(rowid, {cols}) VALUES (new.id, {new}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {index}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {index}({index}, rowid, {cols}) VALUES ('delete', old.id, {old}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {index}_au AFTER UPDATE OF {cols} ON {table} BEGIN "
+        f"INSERT INTO {index}({index}, rowid, {cols}) VALUES ('delete', old.id, {old}); "
+        f"INSERT INTO {index}(rowid, {cols}) VALUES (new.id, {new}); END",
+    ]
+
+def ensure_fts(engine):
+    """Создание недостающих индексов FTS5; новый индекс заполняется по существующим строкам"""
+    existing = set(inspect(engine).get_table_names())
+    with engine.begin() as connection:
+        for index, (table, columns, _) in FTS_INDEXES.items():
+            for statement in fts_ddl(index, table, columns):
+                connection.exec_driver_sql(statement)
+            if index not in existing:
+                connection.exec_driver_sql(f"INSERT INTO {index}({index}) VALUES ('rebuild')")
+
+def fts_query(q: str) -> Optional[str]:
+    """Запрос FTS5 из пользовательской строки: все слова, каждое как префикс.
+
+    Слова берутся в кавычки, поэтому операторы FTS5 (AND, NEAR, *, -)
+    из ввода не интерпретируются.
+    """
+    terms = _TERM.findall(q)
+    if not terms:
+        return None
+    return " ".join(f'"{term}"*' for term in terms)
+
+def search_ids(db: Session, index: str, q: str, skip: int, limit: int) -> List[int]:
+    """id строк, подходящих под запрос, по убыванию релевантности (bm25)"""
+    match = fts_query(q)
+    if match is None:
+        return []
+    weights = ", ".join(str(weight) for weight in FTS_INDEXES[index][2])
+    rows = db.execute(
+        text(
+            f"SELECT rowid FROM {index} WHERE {index} MATCH :match "
+            f"ORDER BY bm25({index}, {weights}), rowid LIMIT :limit OFFSET :skip"
+        ),
+        {"match": match, "limit": limit, "skip": skip},
+    )
+    return [row[0] for row in rows]
@@ -0,0 +1,56 @@
+# backend/tests/conftest.py
+import os
+import sys
+
+import pytest
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# backend и корень репозитория с общим пакетом bmanager_common
+sys.path[:0] = [BACKEND, os.path.dirname(BACKEND)]
+
+@pytest.fixture(scope="session")
+def app(tmp_path_factory):
+    """Приложение на временной базе; app импортируется только после выбора DATABASE_URL"""
+    os.environ["DATABASE_URL"] = f"sqlite:///{tmp_path_factory.mktemp('db') / 'business_manager.db'}"
+    from app.main import app
+    return app
+
+@pytest.fixture(scope="session")
+def client(app):
+    from fastapi.testclient import TestClient
+
+    with TestClient(app) as client:
+        yield client
+
+@pytest.fixture(scope="session")
+def seeded(client):
+    """Пользователи, проекты разных авторов и задачи с исполнителями"""
+    from app.auth import create_access_token, get_password_hash
+    from app.database import SessionLocal
+    from app.models import Project, Task, User
+
+    db = SessionLocal()
+    try:
+        password = get_password_hash("secret1")
+        users = [
+            User(username=f"user{i}", email=f"user{i}@example.com", hashed_password=password, full_name=f"User {i}")
+            for i in range(5)
+        ]
+        db.add_all(users)
+        db.flush()
+        projects = [Project(name=f"Project {i}", created_by=users[i % len(users)].id) for i in range(4)]
+        db.add_all(projects)
+        db.flush()
+        db.add_all(
+            Task(
+                title=f"Task {i}",
+                project_id=projects[i % len(projects)].id,
+                assigned_to=users[(i + 1) % len(users)].id,
+                created_by=users[i % len(users)].id,
+            )
+            for i in range(60)
+        )
+        db.commit()
+        return {"headers": {"Authorization": f"Bearer {create_access_token({'sub': users[0].username})}"}}
+    finally:
+        db.close()
@@ -0,0 +1,18 @@
+# backend/tests/test_principal_cache.py
+
+def test_deactivated_user_is_evicted_after_commit(client, seeded):
+    from app.auth import principal_cache
+    from app.database import SessionLocal
+    from app.models import User
+
+    db = SessionLocal()
+    try:
+        user = db.query(User).filter(User.username == "user4").one()
+        user.is_active = False
+        db.flush()
+        # Запрос между flush и commit читает ещё активного пользователя и кеширует его
+        principal_cache.set("user4", "stale principal")
+        db.commit()
+        assert principal_cache.get("user4") is None
+    finally:
+        db.close()
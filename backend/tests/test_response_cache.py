@@ -0,0 +1,55 @@
+# backend/tests/test_response_cache.py
+
+def change_version(name: str) -> int:
+    from app.database import SessionLocal
+    from app.models import ChangeCounter
+
+    db = SessionLocal()
+    try:
+        return db.get(ChangeCounter, name).version
+    finally:
+        db.close()
+
+def rename_user(username: str, full_name: str):
+    from app.database import SessionLocal
+    from app.models import User
+
+    db = SessionLocal()
+    try:
+        db.query(User).filter(User.username == username).one().full_name = full_name
+        db.commit()
+    finally:
+        db.close()
+
+def test_repeated_get_returns_304(client, seeded):
+    first = client.get("/projects/", params={"limit": 2}, headers=seeded["headers"])
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+    assert first.headers["Cache-Control"] == "private, no-cache"
+
+    repeated = client.get("/projects/", params={"limit": 2}, headers={**seeded["headers"], "If-None-Match": etag})
+    assert repeated.status_code == 304
+    assert repeated.headers["ETag"] == etag
+    assert repeated.content == b""
+    # Другие параметры запроса — другой ресурс и другой ETag
+    other = client.get("/projects/", params={"limit": 3}, headers={**seeded["headers"], "If-None-Match": etag})
+    assert other.status_code == 200 and other.headers["ETag"] != etag
+
+def test_write_bumps_change_counter_and_etag(client, seeded):
+    from app.response_cache import response_cache
+
+    first = client.get("/projects/", params={"include": "creator"}, headers=seeded["headers"])
+    etag = first.headers["ETag"]
+    # Второй запрос без If-None-Match отдаётся из кеша сериализованных тел
+    hits = response_cache.hits
+    assert client.get("/projects/", params={"include": "creator"}, headers=seeded["headers"]).content == first.content
+    assert response_cache.hits == hits + 1
+
+    version = change_version("users")
+    rename_user("user1", "Renamed User")
+    assert change_version("users") == version + 1
+
+    changed = client.get("/projects/", params={"include": "creator"}, headers={**seeded["headers"], "If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert "Renamed User" in changed.text
@@ -0,0 +1,35 @@
+# backend/tests/test_task_queries.py
+import pytest
+
+ALL_RELATIONS = "project,project.creator,assignee,author"
+
+def count_task_list_queries(client, seeded, limit: int, include: str) -> tuple:
+    from app.database import count_queries
+    from app.response_cache import response_cache
+
+    # Кеш ответов вернул бы страницу без запросов к базе
+    response_cache.invalidate("tasks")
+    with count_queries() as counter:
+        response = client.get("/tasks/", params={"limit": limit, "include": include}, headers=seeded["headers"])
+    assert response.status_code == 200
+    return counter["count"], response.json()
+
+@pytest.fixture
+def warm_principal(client, seeded):
+    # Первый запрос кеширует пользователя токена, дальше он не читается из базы
+    client.get("/tasks/", params={"limit": 1}, headers=seeded["headers"])
+
+def test_task_list_query_count_does_not_grow_with_page_size(client, seeded, warm_principal):
+    small, small_tasks = count_task_list_queries(client, seeded, 5, ALL_RELATIONS)
+    large, large_tasks = count_task_list_queries(client, seeded, 50, ALL_RELATIONS)
+
+    assert len(small_tasks) == 5 and len(large_tasks) == 50
+    assert small == large == 6
+    assert all(task["project"]["creator"] and task["assignee"] and task["author"] for task in large_tasks)
+
+def test_task_list_without_include_skips_relationships(client, seeded, warm_principal):
+    full, _ = count_task_list_queries(client, seeded, 50, ALL_RELATIONS)
+    bare, tasks = count_task_list_queries(client, seeded, 50, "")
+
+    assert bare < full
+    assert tasks and not any(key in tasks[0] for key in ("project", "assignee", "author"))
@@ -0,0 +1,94 @@
+# backend/tests/test_task_query_plans.py
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+# (описание, параметры get_tasks, индексы, один из которых должен быть в плане)
+CASES = [
+    ("all tasks, default order", {}, ("ix_tasks_created_at_id",)),
+    ("project tasks", {"project_id": 3}, ("ix_tasks_project_created_at",)),
+    ("project tasks by status", {"project_id": 3, "status": "todo"}, ("ix_tasks_project_created_at",)),
+    ("status filter", {"status": "in_progress"}, ("ix_tasks_status_created_at",)),
+    ("assignee open tasks by due date",
+     {"assigned_to": 2, "status": "todo", "sort": "due_date"}, ("ix_tasks_assignee_status_due",)),
+    # В порядке создания с LIMIT планировщик может идти по индексу сортировки и остановиться раньше
+    ("overdue", {"overdue": True}, ("ix_tasks_open_due", "ix_tasks_created_at_id")),
+    ("overdue by due date", {"overdue": True, "sort": "due_date"}, ("ix_tasks_open_due",)),
+    ("overdue in project", {"overdue": True, "project_id": 3}, ("ix_tasks_project_created_at",)),
+]
+
+def seed(engine, tasks: int, projects: int, users: int):
+    """Схема и данные с распределением дашборда; ANALYZE даёт планировщику статистику"""
+    from sqlalchemy import insert
+
+    from app.models import Base, Project, Task, User
+
+    Base.metadata.create_all(bind=engine)
+    rng = random.Random(42)
+    now = datetime.utcnow()
+    with engine.begin() as connection:
+        connection.execute(insert(User), [
+            {"username": f"user{i}", "email": f"user{i}@example.com", "hashed_password": "-", "role": 1}
+            for i in range(users)
+        ])
+        connection.execute(insert(Project), [
+            {"name": f"project {i}", "created_by": 1, "created_at": now} for i in range(projects)
+        ])
+        connection.execute(insert(Task), [
+            {
+                "title": f"task {i}",
+                "status": rng.choice(("todo", "in_progress", "done", "done")),
+                "priority": rng.choice(("low", "medium", "high")),
+                "due_date": now + timedelta(days=rng.randint(-60, 60)) if rng.random() < 0.8 else None,
+                "project_id": rng.randint(1, projects),
+                "assigned_to": rng.randint(1, users) if rng.random() < 0.7 else None,
+                "created_by": 1,
+                "created_at": now - timedelta(minutes=tasks - i),
+            }
+            for i in range(tasks)
+        ])
+        connection.exec_driver_sql("ANALYZE")
+
+def query_plan(engine, params: dict) -> str:
+    """EXPLAIN QUERY PLAN основного запроса get_tasks с данными параметрами"""
+    from sqlalchemy import event
+    from sqlalchemy.orm import Session
+
+    from app.crud import get_tasks
+
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if not captured:
+            captured.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", capture)
+    db = Session(bind=engine)
+    try:
+        get_tasks(db, limit=50, include=(), **params)
+        statement, parameters = captured[0]
+        rows = db.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+        db.close()
+    return "\n".join(row[-1] for row in rows)
+
+def uses_index(plan: str, indexes) -> bool:
+    """В плане один из ожидаемых индексов и нет полного просмотра tasks"""
+    return any(index in plan for index in indexes) and "SCAN tasks" not in plan.splitlines()
+
+@pytest.fixture(scope="module")
+def plan_engine(app, tmp_path_factory):
+    # Своя база: планы зависят от объёма данных, а не от данных других тестов
+    from sqlalchemy import create_engine
+
+    engine = create_engine(f"sqlite:///{tmp_path_factory.mktemp('plans') / 'tasks.db'}")
+    seed(engine, tasks=5000, projects=50, users=30)
+    yield engine
+    engine.dispose()
+
+@pytest.mark.parametrize("params, indexes", [case[1:] for case in CASES], ids=[case[0] for case in CASES])
+def test_task_list_filters_use_indexes(plan_engine, params, indexes):
+    plan = query_plan(plan_engine, params)
+    assert uses_index(plan, indexes), plan
@@ -0,0 +1,49 @@
+"""Планы запросов списка задач на большой базе: обёртка над тестом.
+
+Те же случаи, что в backend/tests/test_task_query_plans.py (его
+запускает pytest), но с настраиваемым объёмом данных и печатью планов.
+Код возврата 1, если хоть один запрос сканирует таблицу или использует
+не тот индекс. Запуск из корня репозитория:
+
+    python benchmarks/explain_tasks.py --tasks 20000
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND = os.path.join(ROOT, "backend")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=20000)
+    parser.add_argument("--projects", type=int, default=50)
+    parser.add_argument("--users", type=int, default=30)
+    args = parser.parse_args()
+
+    sys.path[:0] = [ROOT, BACKEND, os.path.join(BACKEND, "tests")]
+    from sqlalchemy import create_engine
+
+    from test_task_query_plans import CASES, query_plan, seed, uses_index
+
+    failures = 0
+    with tempfile.TemporaryDirectory(prefix="explain-tasks-") as workdir:
+        engine = create_engine(f"sqlite:///{os.path.join(workdir, 'tasks.db')}")
+        try:
+            seed(engine, args.tasks, args.projects, args.users)
+            for title, params, indexes in CASES:
+                plan = query_plan(engine, params)
+                ok = uses_index(plan, indexes)
+                failures += not ok
+                print(f"{'ok  ' if ok else 'FAIL'} {title}: expected {' or '.join(indexes)}")
+                for line in plan.splitlines():
+                    print(f"       {line}")
+        finally:
+            engine.dispose()
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""Заглушка микросервиса с управляемыми отказами для проверки шлюза.
+
+Отвечает 200 с пустым списком на любой путь. Отказы задаются
+переменными окружения при старте или на лету через PUT /_faults:
+
+    error_rate   доля ответов с кодом error_status (0..1)
+    error_status код ошибочного ответа (по умолчанию 503)
+    delay        задержка перед ответом, секунд
+    delay_rate   доля запросов с задержкой (0..1)
+
+    uvicorn fault_stub:app --app-dir benchmarks --port 18102
+"""
+import asyncio
+import os
+import random
+
+from fastapi import FastAPI, Request
+from fastapi.responses import ORJSONResponse
+
+faults = {
+    "error_rate": float(os.getenv("FAULT_ERROR_RATE", "0")),
+    "error_status": int(os.getenv("FAULT_ERROR_STATUS", "503")),
+    "delay": float(os.getenv("FAULT_DELAY", "0")),
+    "delay_rate": float(os.getenv("FAULT_DELAY_RATE", "1")),
+}
+counters = {"requests": 0, "errors": 0, "delayed": 0}
+
+app = FastAPI(title="Fault Stub", default_response_class=ORJSONResponse)
+
+
+@app.get("/_faults")
+async def get_faults():
+    return {"faults": faults, "counters": counters}
+
+
+@app.put("/_faults")
+async def set_faults(update: dict):
+    faults.update({key: type(faults[key])(value) for key, value in update.items() if key in faults})
+    for key in counters:
+        counters[key] = 0
+    return {"faults": faults}
+
+
+@app.api_route("/{path:path}", methods=["GET", "POST", "PUT", "PATCH", "DELETE"])
+async def handle(path: str, request: Request):
+    counters["requests"] += 1
+    if faults["delay"] > 0 and random.random() < faults["delay_rate"]:
+        counters["delayed"] += 1
+        await asyncio.sleep(faults["delay"])
+    if random.random() < faults["error_rate"]:
+        counters["errors"] += 1
+        return ORJSONResponse({"detail": "Injected fault"}, status_code=faults["error_status"])
+    return {"success": True, "data": [], "next_cursor": None}
@@ -0,0 +1,102 @@
+"""Общие функции бенчмарков: запуск сервисов на локальных портах и статистика."""
+import os
+import re
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import httpx
+from jose import jwt
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SECRET_KEY = os.getenv("JWT_SECRET_KEY", "your-super-secret-jwt-key-2024")
+
+_METRIC_LINE = re.compile(r"^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{[^}]*\})? (\S+)$")
+
+
+class Service:
+    """Приложение FastAPI, запущенное через uvicorn в отдельном процессе.
+
+    Сервис считается запущенным, когда health отвечает 200; время до
+    этого момента (холодный старт) сохраняется в startup_seconds.
+    """
+
+    def __init__(self, name: str, app: str, app_dir: str, port: int, env: Optional[dict] = None,
+                 health: str = "/", cwd: Optional[str] = None):
+        self.name = name
+        self.app = app
+        self.app_dir = app_dir
+        self.port = port
+        self.env = env or {}
+        self.health = health
+        self.cwd = cwd or ROOT
+        self.process: Optional[subprocess.Popen] = None
+        self.startup_seconds = 0.0
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def start(self, timeout: float = 30) -> "Service":
+        started = time.perf_counter()
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", self.app, "--app-dir", self.app_dir,
+             "--port", str(self.port), "--log-level", "warning"],
+            cwd=self.cwd,
+            # Общий пакет bmanager_common лежит в корне репозитория
+            env={**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, (ROOT, os.getenv("PYTHONPATH")))), **self.env},
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"{self.name} exited with code {self.process.returncode}")
+            try:
+                if httpx.get(f"{self.url}{self.health}", timeout=1).status_code == 200:
+                    self.startup_seconds = time.perf_counter() - started
+                    return self
+            except httpx.TransportError:
+                pass
+            time.sleep(0.05)
+        self.stop()
+        raise RuntimeError(f"{self.name} did not start on port {self.port}")
+
+    def stop(self):
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        self.process = None
+
+
+def make_token(user_id: str = "bench", email: str = "bench@example.com", hours: int = 1) -> str:
+    """JWT, который примет шлюз (тот же секрет и алгоритм, что у сервиса пользователей)"""
+    return jwt.encode(
+        {"sub": email, "user_id": user_id, "exp": datetime.utcnow() + timedelta(hours=hours)},
+        SECRET_KEY,
+        algorithm="HS256",
+    )
+
+
+def percentile(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))] if values else 0.0
+
+
+def scrape_metrics(url: str) -> Dict[str, float]:
+    """Сумма значений каждой метрики /metrics по всем меткам"""
+    totals: Dict[str, float] = {}
+    try:
+        text = httpx.get(f"{url}/metrics", timeout=5).text
+    except httpx.HTTPError:
+        return totals
+    for line in text.splitlines():
+        match = _METRIC_LINE.match(line)
+        if match:
+            totals[match.group(1)] = totals.get(match.group(1), 0.0) + float(match.group(3))
+    return totals
@@ -0,0 +1,100 @@
+"""Микробенчмарк сериализации ответа со списком заказов.
+
+Сравнивает прежний путь (dict -> jsonable_encoder -> JSONResponse) с
+типизированными моделями и компилированными энкодерами (pydantic-core,
+orjson). Запуск из корня репозитория:
+
+    python benchmarks/json_encoding.py --orders 100 --repeat 200
+"""
+import argparse
+import os
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "service_orders"))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse, ORJSONResponse  # noqa: E402
+
+from app.responses import model_json  # noqa: E402
+from app.schemas import OrderListEnvelope, OrderResponse  # noqa: E402
+
+
+def make_orders(count: int) -> list:
+    """ORM-подобные объекты заказов с тремя позициями"""
+    now = datetime.utcnow()
+    orders = []
+    for i in range(count):
+        items = [{"name": f"item-{j}", "quantity": j + 1, "price": 9.99 * (j + 1)} for j in range(3)]
+        created_at = now - timedelta(minutes=i)
+        orders.append(SimpleNamespace(
+            id=str(uuid.uuid4()),
+            user_id=str(uuid.uuid4()),
+            items=items,
+            status="created",
+            total_amount=sum(item["quantity"] * item["price"] for item in items),
+            created_at=created_at,
+            updated_at=created_at,
+        ))
+    return orders
+
+
+def legacy_dict(order) -> dict:
+    """Ручная сборка словаря, как было до типизированных моделей"""
+    return {
+        "id": order.id,
+        "user_id": order.user_id,
+        "items": order.items,
+        "status": order.status,
+        "total_amount": order.total_amount,
+        "created_at": order.created_at.isoformat(),
+        "updated_at": order.updated_at.isoformat(),
+    }
+
+
+def encode_legacy(orders) -> bytes:
+    content = {"success": True, "data": [legacy_dict(order) for order in orders], "next_cursor": None}
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+def encode_model_orjson(orders) -> bytes:
+    envelope = OrderListEnvelope(data=[OrderResponse.model_validate(order) for order in orders])
+    return ORJSONResponse(envelope.model_dump(mode="json")).body
+
+
+def encode_model_pydantic_core(orders) -> bytes:
+    envelope = OrderListEnvelope(data=[OrderResponse.model_validate(order) for order in orders])
+    return model_json(envelope)
+
+
+ENCODERS = {
+    "dict + jsonable_encoder + JSONResponse": encode_legacy,
+    "model + model_dump + ORJSONResponse": encode_model_orjson,
+    "model + pydantic_core.to_json": encode_model_pydantic_core,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--orders", type=int, default=100, help="заказов в одном ответе")
+    parser.add_argument("--repeat", type=int, default=200, help="число сериализаций")
+    args = parser.parse_args()
+
+    orders = make_orders(args.orders)
+    baseline = None
+    print(f"{args.orders} orders per response, {args.repeat} iterations")
+    for name, encode in ENCODERS.items():
+        encode(orders)  # прогрев
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            body = encode(orders)
+        per_call = (time.perf_counter() - start) / args.repeat * 1000
+        baseline = baseline or per_call
+        print(f"  {name:<40} {per_call:8.3f} ms  x{baseline / per_call:5.2f}  {len(body)} bytes")
+
+
+if __name__ == "__main__":
+    main()
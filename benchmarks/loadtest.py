@@ -0,0 +1,375 @@
+"""Нагрузочные сценарии для шлюза, микросервисов и backend.
+
+Поднимает api_gateway, service_users, service_orders и backend на
+локальных портах с временными базами SQLite, заполняет данные и
+прогоняет сценарии: шквал входов, всплеск записи заказов, опрос списка
+с дашбордов, сводка дашборда через шлюз, глубокая пагинация (через шлюз
+и в backend). По каждому
+сценарию считаются req/s, p50/p95/p99 и число SQL-запросов (из /metrics
+сервисов). Результат можно сохранить как базовую линию и сравнивать с ней:
+
+    python benchmarks/loadtest.py --save benchmarks/baseline.json
+    python benchmarks/loadtest.py --compare benchmarks/baseline.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List
+
+import httpx
+
+from harness import ROOT, Service, percentile, scrape_metrics
+
+DB_QUERIES_METRIC = "db_query_duration_seconds_count"
+PASSWORD = "benchmark-password"
+
+
+class Recorder:
+    """Задержки и коды ответов одного сценария"""
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.statuses: Counter = Counter()
+        self.errors = 0
+
+    async def request(self, call: Awaitable[httpx.Response]) -> httpx.Response:
+        start = time.perf_counter()
+        try:
+            response = await call
+        except httpx.HTTPError as e:
+            self.latencies.append(time.perf_counter() - start)
+            self.statuses[type(e).__name__] += 1
+            self.errors += 1
+            raise
+        self.latencies.append(time.perf_counter() - start)
+        self.statuses[response.status_code] += 1
+        if response.status_code >= 400:
+            self.errors += 1
+        return response
+
+
+async def fan_out(total: int, concurrency: int, job: Callable[[int], Awaitable[None]]):
+    """total вызовов job(i), не больше concurrency одновременно"""
+    queue = iter(range(total))
+
+    async def worker():
+        for i in queue:
+            try:
+                await job(i)
+            except httpx.HTTPError:
+                pass
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+
+class Context:
+    """Адреса сервисов и подготовленные данные"""
+
+    def __init__(self, gateway: str, backend: str, scale: float):
+        self.gateway = gateway
+        self.backend = backend
+        self.scale = scale
+        self.users: List[dict] = []
+        self.heavy_user: dict = {}
+        self.backend_headers: Dict[str, str] = {}
+
+    def count(self, base: int) -> int:
+        return max(1, int(base * self.scale))
+
+
+def auth(user: dict) -> Dict[str, str]:
+    return {"Authorization": f"Bearer {user['token']}"}
+
+
+def order_payload(i: int) -> dict:
+    return {"items": [{"name": f"item-{i % 17}", "quantity": 1 + i % 3, "price": 10.5 + i % 7}]}
+
+
+async def seed(client: httpx.AsyncClient, ctx: Context, users: int, heavy_orders: int, tasks: int):
+    """Пользователи, заказы и задачи для сценариев"""
+    for i in range(users):
+        email = f"bench{i}@example.com"
+        await client.post(f"{ctx.gateway}/v1/auth/register", json={"email": email, "password": PASSWORD, "full_name": f"Bench {i}"})
+        response = await client.post(f"{ctx.gateway}/v1/auth/login", json={"email": email, "password": PASSWORD})
+        response.raise_for_status()
+        ctx.users.append({"email": email, "token": response.json()["data"]["access_token"]})
+
+    ctx.heavy_user = ctx.users[0]
+    for start in range(0, heavy_orders, 1000):
+        batch = [order_payload(i) for i in range(start, min(heavy_orders, start + 1000))]
+        response = await client.post(f"{ctx.gateway}/v1/orders:batch", json={"orders": batch}, headers=auth(ctx.heavy_user))
+        response.raise_for_status()
+
+    await client.post(f"{ctx.backend}/auth/register", json={"username": "bench", "email": "bench@example.com", "password": PASSWORD, "full_name": "Bench"})
+    response = await client.post(f"{ctx.backend}/auth/login", json={"username": "bench", "password": PASSWORD})
+    response.raise_for_status()
+    ctx.backend_headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    project = (await client.post(f"{ctx.backend}/projects/", json={"name": "Benchmark"}, headers=ctx.backend_headers)).json()
+
+    async def create_task(i: int):
+        await client.post(f"{ctx.backend}/tasks/", json={"title": f"task {i}", "project_id": project["id"]}, headers=ctx.backend_headers)
+
+    await fan_out(tasks, 10, create_task)
+
+
+async def login_storm(client: httpx.AsyncClient, ctx: Context, rec: Recorder):
+    async def job(i: int):
+        user = ctx.users[i % len(ctx.users)]
+        await rec.request(client.post(f"{ctx.gateway}/v1/auth/login", json={"email": user["email"], "password": PASSWORD}))
+
+    await fan_out(ctx.count(200), 20, job)
+
+
+async def order_write_burst(client: httpx.AsyncClient, ctx: Context, rec: Recorder):
+    async def job(i: int):
+        user = ctx.users[1 + i % (len(ctx.users) - 1)]
+        await rec.request(client.post(f"{ctx.gateway}/v1/orders", json=order_payload(i), headers=auth(user)))
+
+    await fan_out(ctx.count(500), 50, job)
+
+
+async def dashboard_polling(client: httpx.AsyncClient, ctx: Context, rec: Recorder):
+    # Несколько дашбордов одних и тех же пользователей опрашивают первую страницу
+    viewers = ctx.users[1:6]
+
+    async def job(i: int):
+        user = viewers[i % len(viewers)]
+        await rec.request(client.get(f"{ctx.gateway}/v1/orders", params={"limit": 20}, headers=auth(user)))
+
+    await fan_out(ctx.count(1000), 50, job)
+
+
+async def dashboard_aggregate(client: httpx.AsyncClient, ctx: Context, rec: Recorder):
+    # Первый экран дашборда одним запросом: профиль, заказы и задачи параллельно
+    viewers = ctx.users[1:6]
+    backend_token = ctx.backend_headers["Authorization"].removeprefix("Bearer ")
+
+    async def job(i: int):
+        user = viewers[i % len(viewers)]
+        headers = {**auth(user), "X-Backend-Token": backend_token}
+        response = await rec.request(client.get(f"{ctx.gateway}/v1/dashboard", headers=headers))
+        if response.status_code == 200 and response.json()["errors"]:
+            rec.errors += 1
+
+    await fan_out(ctx.count(500), 50, job)
+
+
+async def walk_pages(fetch: Callable[[str], Awaitable[str]]):
+    """Проход по всем страницам курсора, каждая страница — отдельный замер"""
+    cursor = None
+    while True:
+        cursor = await fetch(cursor)
+        if not cursor:
+            break
+
+
+async def deep_pagination(client: httpx.AsyncClient, ctx: Context, rec: Recorder):
+    async def fetch(cursor):
+        params = {"limit": 50, **({"cursor": cursor} if cursor else {})}
+        response = await rec.request(client.get(f"{ctx.gateway}/v1/orders", params=params, headers=auth(ctx.heavy_user)))
+        return response.json().get("next_cursor") if response.status_code == 200 else None
+
+    await asyncio.gather(*(walk_pages(fetch) for _ in range(ctx.count(5))))
+
+
+async def backend_task_polling(client: httpx.AsyncClient, ctx: Context, rec: Recorder):
+    async def job(i: int):
+        await rec.request(client.get(f"{ctx.backend}/tasks/", params={"limit": 50}, headers=ctx.backend_headers))
+
+    await fan_out(ctx.count(500), 20, job)
+
+
+async def backend_deep_pagination(client: httpx.AsyncClient, ctx: Context, rec: Recorder):
+    async def fetch(cursor):
+        params = {"limit": 50, "include": "", **({"cursor": cursor} if cursor else {})}
+        response = await rec.request(client.get(f"{ctx.backend}/tasks/", params=params, headers=ctx.backend_headers))
+        return response.headers.get("x-next-cursor") if response.status_code == 200 else None
+
+    await asyncio.gather(*(walk_pages(fetch) for _ in range(ctx.count(5))))
+
+
+SCENARIOS = {
+    "login_storm": login_storm,
+    "order_write_burst": order_write_burst,
+    "dashboard_polling": dashboard_polling,
+    "dashboard_aggregate": dashboard_aggregate,
+    "deep_pagination": deep_pagination,
+    "backend_task_polling": backend_task_polling,
+    "backend_deep_pagination": backend_deep_pagination,
+}
+
+
+def db_queries(services: List[Service]) -> float:
+    return sum(scrape_metrics(service.url).get(DB_QUERIES_METRIC, 0.0) for service in services)
+
+
+async def run_scenarios(ctx: Context, names: List[str], db_services: List[Service], args) -> Dict[str, dict]:
+    results = {}
+    limits = httpx.Limits(max_connections=200, max_keepalive_connections=200)
+    async with httpx.AsyncClient(timeout=60, limits=limits) as client:
+        await seed(client, ctx, args.users, ctx.count(args.heavy_orders), ctx.count(args.tasks))
+        for name in names:
+            rec = Recorder()
+            queries_before = db_queries(db_services)
+            started = time.perf_counter()
+            await SCENARIOS[name](client, ctx, rec)
+            elapsed = time.perf_counter() - started
+            queries = db_queries(db_services) - queries_before
+            requests = len(rec.latencies)
+            results[name] = {
+                "requests": requests,
+                "errors": rec.errors,
+                "seconds": round(elapsed, 3),
+                "rps": round(requests / elapsed, 1),
+                "p50_ms": round(percentile(rec.latencies, 0.50) * 1000, 2),
+                "p95_ms": round(percentile(rec.latencies, 0.95) * 1000, 2),
+                "p99_ms": round(percentile(rec.latencies, 0.99) * 1000, 2),
+                "db_queries": int(queries),
+                "db_queries_per_request": round(queries / requests, 2) if requests else 0.0,
+                "statuses": {str(status): count for status, count in rec.statuses.items()},
+            }
+            print_result(name, results[name])
+    return results
+
+
+def print_result(name: str, result: dict):
+    print(
+        f"{name:<24} {result['requests']:6d} req {result['rps']:8.1f} req/s"
+        f"  p50 {result['p50_ms']:8.2f}  p95 {result['p95_ms']:8.2f}  p99 {result['p99_ms']:8.2f} ms"
+        f"  db {result['db_queries_per_request']:6.2f}/req  errors {result['errors']}"
+    )
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], threshold: float) -> List[str]:
+    """Регрессии относительно базовой линии: падение req/s, рост p95 или числа SQL-запросов"""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if result["rps"] < base["rps"] * (1 - threshold):
+            regressions.append(f"{name}: req/s {base['rps']} -> {result['rps']}")
+        if result["p95_ms"] > base["p95_ms"] * (1 + threshold):
+            regressions.append(f"{name}: p95 {base['p95_ms']} ms -> {result['p95_ms']} ms")
+        # Число SQL-запросов почти детерминировано (колеблется из-за TTL кешей), N+1 даёт кратный рост
+        if result["db_queries_per_request"] > base["db_queries_per_request"] * (1 + threshold) + 0.05:
+            regressions.append(
+                f"{name}: db queries/request {base['db_queries_per_request']} -> {result['db_queries_per_request']}"
+            )
+        if result["errors"] > base["errors"]:
+            regressions.append(f"{name}: errors {base['errors']} -> {result['errors']}")
+    return regressions
+
+
+def start_services(workdir: str, args) -> Dict[str, Service]:
+    ports = {name: args.base_port + i for i, name in enumerate(("gateway", "users", "orders", "backend"))}
+    users_env = {"DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'users.db')}"}
+    if args.bcrypt_rounds:
+        users_env["BCRYPT_ROUNDS"] = str(args.bcrypt_rounds)
+    services = {
+        "users": Service(
+            "service_users", "app.main:app", os.path.join(ROOT, "service_users"), ports["users"], users_env,
+            health="/ready", cwd=workdir,
+        ),
+        "orders": Service(
+            "service_orders", "app.main:app", os.path.join(ROOT, "service_orders"), ports["orders"],
+            {"DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'orders.db')}"}, health="/ready", cwd=workdir,
+        ),
+        "backend": Service(
+            "backend", "app.main:app", os.path.join(ROOT, "backend"), ports["backend"],
+            {"DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'business_manager.db')}"}, health="/ready", cwd=workdir,
+        ),
+    }
+    services["gateway"] = Service(
+        "api_gateway", "app.main:app", os.path.join(ROOT, "api_gateway"), ports["gateway"],
+        {
+            "USERS_SERVICE_URL": f"http://127.0.0.1:{ports['users']}",
+            "ORDERS_SERVICE_URL": f"http://127.0.0.1:{ports['orders']}",
+            "BACKEND_SERVICE_URL": f"http://127.0.0.1:{ports['backend']}",
+            # Нагрузка идёт с одного адреса; лимиты проверяются отдельно
+            "RATE_LIMIT_ENABLED": "true" if args.rate_limit else "false",
+        },
+        health="/ready",
+        cwd=workdir,
+    )
+    try:
+        for service in services.values():
+            service.start()
+            # Холодный старт: от запуска процесса до первого 200 на /ready
+            print(f"{service.name}: ready in {service.startup_seconds:.2f}s")
+    except BaseException:
+        # Вызывающий не получит словарь сервисов — уже запущенные останавливаются здесь
+        for service in services.values():
+            service.stop()
+        raise
+    return services
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="сценарии через запятую")
+    parser.add_argument("--scale", type=float, default=1.0, help="множитель числа запросов и данных")
+    parser.add_argument("--users", type=int, default=10, help="пользователей сервиса пользователей")
+    parser.add_argument("--heavy-orders", type=int, default=2000, help="заказов у пользователя для пагинации")
+    parser.add_argument("--tasks", type=int, default=500, help="задач в backend")
+    parser.add_argument("--bcrypt-rounds", type=int, default=None, help="BCRYPT_ROUNDS для сервиса пользователей")
+    parser.add_argument("--rate-limit", action="store_true", help="не отключать лимиты шлюза")
+    parser.add_argument("--base-port", type=int, default=18300)
+    parser.add_argument("--save", help="сохранить результаты в JSON")
+    parser.add_argument("--compare", help="сравнить с базовой линией JSON")
+    parser.add_argument("--threshold", type=float, default=0.25, help="допустимое ухудшение req/s и p95")
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+
+    workdir = tempfile.mkdtemp(prefix="bmanager-bench-")
+    services = {}
+    try:
+        services = start_services(workdir, args)
+        ctx = Context(services["gateway"].url, services["backend"].url, args.scale)
+        db_services = [services["users"], services["orders"], services["backend"]]
+        results = asyncio.run(run_scenarios(ctx, names, db_services, args))
+    finally:
+        for service in services.values():
+            service.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "created_at": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "scale": args.scale,
+            "startup_seconds": {name: round(service.startup_seconds, 3) for name, service in services.items()},
+        },
+        "scenarios": results,
+    }
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"Saved results to {args.save}")
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["scenarios"]
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print("Regressions:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("No regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Проверка поведения шлюза при частичных отказах сервиса заказов.
+
+Поднимает заглушку с отказами (fault_stub.py) вместо сервиса заказов и
+шлюз на локальных портах, затем прогоняет сценарии: норма, редкие
+ошибки, полный отказ, восстановление, медленный хвост и зависание.
+Для каждого сценария печатаются коды ответов, p50/p99 и состояние
+автомата защиты. Запуск из корня репозитория:
+
+    python benchmarks/resilience_check.py
+"""
+import argparse
+import asyncio
+import os
+import time
+from collections import Counter
+
+import httpx
+
+from harness import ROOT, SECRET_KEY, Service, make_token, percentile
+
+# (название, отказы заглушки, число запросов, пауза перед сценарием)
+SCENARIOS = [
+    ("healthy", {"error_rate": 0, "delay": 0}, 200, 0),
+    ("flaky 20% 503", {"error_rate": 0.2, "delay": 0}, 200, 0),
+    ("outage 100% 503", {"error_rate": 1, "delay": 0}, 200, 0),
+    ("recovery", {"error_rate": 0, "delay": 0}, 200, None),
+    ("slow tail 5% x 1s", {"error_rate": 0, "delay": 1, "delay_rate": 0.05}, 200, 0),
+    ("hung upstream", {"error_rate": 0, "delay": 30, "delay_rate": 1}, 20, 0),
+]
+
+
+async def run_scenario(client, gateway, token, requests, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, statuses = [], Counter()
+
+    async def one():
+        async with semaphore:
+            start_time = time.perf_counter()
+            response = await client.get(f"{gateway}/v1/orders", headers={"Authorization": f"Bearer {token}"})
+            latencies.append(time.perf_counter() - start_time)
+            statuses[response.status_code] += 1
+
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return latencies, statuses
+
+
+async def main_async(args):
+    stub_url = f"http://127.0.0.1:{args.stub_port}"
+    gateway = f"http://127.0.0.1:{args.gateway_port}"
+    token = make_token()
+    async with httpx.AsyncClient(timeout=60) as client:
+        for name, faults, requests, pause in SCENARIOS:
+            if pause is None:
+                # Ждём, пока автомат защиты перейдёт в half-open
+                await asyncio.sleep(args.reset_timeout + 0.5)
+            await client.put(f"{stub_url}/_faults", json={"delay_rate": 1, **faults})
+            started = time.perf_counter()
+            latencies, statuses = await run_scenario(client, gateway, token, requests, args.concurrency)
+            elapsed = time.perf_counter() - started
+            stub = (await client.get(f"{stub_url}/_faults")).json()["counters"]
+            breaker = (await client.get(f"{gateway}/stats/breakers")).json().get("orders", {})
+            print(
+                f"{name:<20} {requests / elapsed:7.1f} req/s  p50 {percentile(latencies, 0.5) * 1000:7.1f} ms"
+                f"  p99 {percentile(latencies, 0.99) * 1000:7.1f} ms  statuses {dict(statuses)}"
+                f"  upstream hits {stub['requests']}  breaker {breaker.get('state')}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--stub-port", type=int, default=18102)
+    parser.add_argument("--gateway-port", type=int, default=18100)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--hedge-delay", type=float, default=0.1)
+    parser.add_argument("--response-timeout", type=float, default=0.5)
+    parser.add_argument("--reset-timeout", type=float, default=2)
+    args = parser.parse_args()
+
+    stub = Service("fault_stub", "fault_stub:app", os.path.join(ROOT, "benchmarks"), args.stub_port, health="/_faults")
+    gateway = Service(
+        "api_gateway",
+        "app.main:app",
+        os.path.join(ROOT, "api_gateway"),
+        args.gateway_port,
+        {
+            "ORDERS_SERVICE_URL": stub.url,
+            "HEDGE_DELAY": str(args.hedge_delay),
+            "UPSTREAM_RESPONSE_TIMEOUT": str(args.response_timeout),
+            "BREAKER_RESET_TIMEOUT": str(args.reset_timeout),
+            "JWT_SECRET_KEY": SECRET_KEY,
+            # Сценарии бьют с одного адреса и одного пользователя
+            "RATE_LIMIT_ENABLED": "false",
+        },
+    )
+    try:
+        stub.start()
+        gateway.start()
+        asyncio.run(main_async(args))
+    finally:
+        gateway.stop()
+        stub.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+"""Общий код сервисов: метрики, профилирование, события, выгрузки и журналы."""
@@ -0,0 +1,22 @@
+import logging
+import re
+
+_ACCESS_TOKEN_PARAM = re.compile(r"(access_token=)[^&\s]*")
+
+
+class RedactAccessToken(logging.Filter):
+    """Замена значения access_token в строке запроса журнала доступа uvicorn"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if isinstance(record.args, tuple) and any(isinstance(arg, str) and "access_token=" in arg for arg in record.args):
+            record.args = tuple(
+                _ACCESS_TOKEN_PARAM.sub(r"\1***", arg) if isinstance(arg, str) else arg for arg in record.args
+            )
+        return True
+
+
+def redact_access_tokens(logger_name: str = "uvicorn.access"):
+    """Токены потоков (EventSource) передаются в адресе — не пишем их в журнал доступа"""
+    logger = logging.getLogger(logger_name)
+    if not any(isinstance(existing, RedactAccessToken) for existing in logger.filters):
+        logger.addFilter(RedactAccessToken())
@@ -0,0 +1,165 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from typing import AsyncIterator, Deque, FrozenSet, Iterable, List, NamedTuple, Optional, Set
+
+from pydantic_core import to_json
+
+from .metrics import REGISTRY
+
+# Сколько последних событий хранится для докачки по Last-Event-ID
+EVENTS_REPLAY_SIZE = int(os.getenv("EVENTS_REPLAY_SIZE", "1000"))
+# Очередь одного подписчика; отстающий клиент отключается и докачивает из буфера
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "100"))
+# Комментарий-пульс держит соединение живым через прокси с таймаутом чтения, секунд
+EVENTS_HEARTBEAT = float(os.getenv("EVENTS_HEARTBEAT", "15"))
+# Пауза перед переподключением EventSource, мс
+EVENTS_RETRY_MS = int(os.getenv("EVENTS_RETRY_MS", "3000"))
+
+EVENT_STREAM_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+EVENTS_PUBLISHED = REGISTRY.counter("events_published_total", "Events published to the change bus", ("event",))
+EVENTS_SUBSCRIBERS = REGISTRY.gauge("events_subscribers", "Open event streams")
+EVENTS_DISCONNECTED = REGISTRY.counter(
+    "events_slow_subscribers_total", "Event streams closed because the client fell behind"
+)
+
+
+class Event(NamedTuple):
+    seq: int
+    topic: str
+    name: str
+    data: bytes
+
+
+class Subscription:
+    def __init__(self, topics: FrozenSet[str], maxsize: int):
+        self.topics = topics
+        self.queue: "asyncio.Queue[Event]" = asyncio.Queue(maxsize)
+        self.overflowed = False
+
+
+class EventBus:
+    """Шина уведомлений об изменениях внутри процесса.
+
+    События получают номер и попадают в кольцевой буфер, из которого
+    переподключившийся клиент докачивает пропущенное по Last-Event-ID.
+    ID события — "<эпоха>-<номер>": после перезапуска процесса эпоха
+    меняется, и клиенту вместо докачки приходит событие reset. Публиковать
+    можно и из цикла событий (сервис заказов), и из потоков пула
+    (синхронные обработчики backend); при нескольких воркерах у каждого
+    своя шина.
+    """
+
+    def __init__(self, replay_size: int, queue_size: int):
+        self.queue_size = queue_size
+        self.epoch = format(time.time_ns() // 1000, "x")
+        self._seq = 0
+        self._buffer: Deque[Event] = deque(maxlen=replay_size)
+        self._subscribers: Set[Subscription] = set()
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def event_id(self, seq: int) -> str:
+        return f"{self.epoch}-{seq}"
+
+    def publish(self, topic: str, name: str, data):
+        """Публикация события для подписчиков темы; data — всё, что сериализует pydantic-core"""
+        with self._lock:
+            self._seq += 1
+            event = Event(self._seq, topic, name, to_json(data))
+            self._buffer.append(event)
+        EVENTS_PUBLISHED.inc((name,))
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._deliver(event)
+        else:
+            loop.call_soon_threadsafe(self._deliver, event)
+
+    def _deliver(self, event: Event):
+        for subscription in self._subscribers:
+            if event.topic not in subscription.topics or subscription.overflowed:
+                continue
+            try:
+                subscription.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                subscription.overflowed = True
+
+    def replay(self, last_event_id: str, topics: FrozenSet[str]) -> Optional[List[Event]]:
+        """События после last_event_id; None, если часть из них уже вытеснена или ID чужой"""
+        epoch, _, seq = last_event_id.partition("-")
+        if epoch != self.epoch or not seq.isdigit():
+            return None
+        since = int(seq)
+        with self._lock:
+            if since > self._seq or (self._buffer and since < self._buffer[0].seq - 1):
+                return None
+            events = list(self._buffer)
+        return [event for event in events if event.seq > since and event.topic in topics]
+
+    def _encode(self, event: Event) -> bytes:
+        return b"id: %s\nevent: %s\ndata: %s\n\n" % (
+            self.event_id(event.seq).encode(), event.name.encode(), event.data
+        )
+
+    async def stream(
+        self,
+        topics: Iterable[str],
+        last_event_id: Optional[str] = None,
+        heartbeat: float = EVENTS_HEARTBEAT,
+    ) -> AsyncIterator[bytes]:
+        """Тело ответа text/event-stream для подписчика тем"""
+        self._loop = asyncio.get_running_loop()
+        subscription = Subscription(frozenset(topics), self.queue_size)
+        # Подписка до докачки: события, пришедшие между ними, не теряются (повторы отсекаются по номеру)
+        self._subscribers.add(subscription)
+        EVENTS_SUBSCRIBERS.inc()
+        try:
+            yield f"retry: {EVENTS_RETRY_MS}\n\n".encode()
+            last = 0
+            if last_event_id:
+                backlog = self.replay(last_event_id, subscription.topics)
+                if backlog is None:
+                    # Пропущенное не восстановить — клиент перечитывает данные целиком
+                    with self._lock:
+                        last = self._seq
+                    yield b"id: %s\nevent: reset\ndata: {}\n\n" % self.event_id(last).encode()
+                else:
+                    for event in backlog:
+                        last = event.seq
+                        yield self._encode(event)
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+                    continue
+                if event.seq > last:
+                    last = event.seq
+                    yield self._encode(event)
+                if subscription.overflowed and subscription.queue.empty():
+                    EVENTS_DISCONNECTED.inc()
+                    return
+        finally:
+            self._subscribers.discard(subscription)
+            EVENTS_SUBSCRIBERS.dec()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "last_event_id": self.event_id(self._seq),
+                "buffered": len(self._buffer),
+                "replay_size": self._buffer.maxlen,
+                "subscribers": len(self._subscribers),
+            }
+
+
+event_bus = EventBus(EVENTS_REPLAY_SIZE, EVENTS_QUEUE_SIZE)
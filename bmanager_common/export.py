@@ -0,0 +1,150 @@
+import csv
+import io
+import os
+import zlib
+from datetime import date, datetime
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, Optional, Sequence, Union
+
+from fastapi import HTTPException, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from pydantic_core import to_json
+from starlette.background import BackgroundTask
+
+# Сколько строк читается из курсора и кодируется за раз
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "500"))
+EXPORT_GZIP_LEVEL = int(os.getenv("EXPORT_GZIP_LEVEL", "6"))
+
+EXPORT_FORMATS: Dict[str, str] = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def accepts_gzip(request: Request) -> bool:
+    """Клиент принимает gzip (Accept-Encoding без q=0)"""
+    for part in request.headers.get("accept-encoding", "").split(","):
+        coding, _, params = part.strip().partition(";")
+        if coding.strip().lower() in ("gzip", "*"):
+            return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+
+def _cell(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (list, dict)):
+        return to_json(value).decode()
+    return value
+
+
+class ExportEncoder:
+    """Кодирование выгрузки пачками строк: CSV или NDJSON, при необходимости gzip.
+
+    Хранит только текущую пачку, поэтому память не зависит от размера
+    выгрузки. Строки — Pydantic-модели; в CSV попадают поля ``columns``,
+    вложенные списки и словари — JSON-строкой; из NDJSON убираются
+    поля ``exclude``.
+    """
+
+    def __init__(self, fmt: str, columns: Sequence[str], gzip: bool, exclude: Optional[set] = None):
+        if fmt not in EXPORT_FORMATS:
+            raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(EXPORT_FORMATS)}")
+        self.fmt = fmt
+        self.columns = columns
+        self.gzip = gzip
+        self.exclude = exclude
+        self._compressor = zlib.compressobj(EXPORT_GZIP_LEVEL, zlib.DEFLATED, 31) if gzip else None
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer, lineterminator="\n")
+
+    @property
+    def media_type(self) -> str:
+        return EXPORT_FORMATS[self.fmt]
+
+    def headers(self, filename: str) -> Dict[str, str]:
+        headers = {
+            "Content-Disposition": f'attachment; filename="{filename}.{self.fmt}"',
+            "Cache-Control": "no-store",
+            "Vary": "Accept-Encoding",
+        }
+        if self.gzip:
+            headers["Content-Encoding"] = "gzip"
+        return headers
+
+    def _output(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) if self._compressor is not None else data
+
+    def header(self) -> bytes:
+        if self.fmt != "csv":
+            return b""
+        self._writer.writerow(self.columns)
+        return self._output(self._take())
+
+    def rows(self, rows: Iterable[BaseModel]) -> bytes:
+        if self.fmt == "csv":
+            for row in rows:
+                self._writer.writerow([_cell(getattr(row, column)) for column in self.columns])
+            data = self._take()
+        else:
+            data = b"".join(to_json(row, exclude=self.exclude) + b"\n" for row in rows)
+        return self._output(data)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush() if self._compressor is not None else b""
+
+    def _take(self) -> bytes:
+        data = self._buffer.getvalue().encode()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return data
+
+
+def export_response(
+    request: Request,
+    fmt: str,
+    columns: Sequence[str],
+    batches: Union[Iterator[Iterable[BaseModel]], AsyncIterator[Iterable[BaseModel]]],
+    filename: str,
+    exclude: Optional[set] = None,
+) -> StreamingResponse:
+    """Потоковый ответ выгрузки из пачек строк.
+
+    batches — генератор пачек (обычный для синхронной сессии или
+    асинхронный); сессию он открывает сам, потому что поток живёт дольше
+    обработчика и его зависимостей. При обрыве соединения поток не
+    дочитывается, поэтому после ответа генератор закрывается в фоне:
+    его finally сразу возвращает соединение в пул, не дожидаясь сборщика
+    мусора.
+    """
+    encoder = ExportEncoder(fmt, columns, accepts_gzip(request), exclude)
+
+    if hasattr(batches, "__aiter__"):
+        async def body():
+            try:
+                yield encoder.header()
+                async for rows in batches:
+                    yield encoder.rows(rows)
+                yield encoder.finish()
+            finally:
+                await batches.aclose()
+
+        stream = body()
+        close = stream.aclose
+    else:
+        def body():
+            try:
+                yield encoder.header()
+                for rows in batches:
+                    yield encoder.rows(rows)
+                yield encoder.finish()
+            finally:
+                batches.close()
+
+        stream = body()
+        close = stream.close
+    return StreamingResponse(
+        stream, media_type=encoder.media_type, headers=encoder.headers(filename), background=BackgroundTask(close)
+    )
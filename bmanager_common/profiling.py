@@ -0,0 +1,175 @@
+import asyncio
+import hmac
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Optional
+
+from .metrics import REGISTRY, route_template
+
+logger = logging.getLogger(__name__)
+
+# Профиль запроса по заголовку X-Profile с этим секретом (пусто — только выборка)
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+# Доля запросов, профилируемых без заголовка (0 — отключено)
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+# Период снятия стеков, секунд
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.005"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "./profiles")
+# Сколько последних профилей хранится в PROFILE_DIR
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "100"))
+
+PROFILE_HEADER = b"x-profile"
+PROFILE_FILE_HEADER = b"x-profile-file"
+
+# Самые вложенные кадры ожидающих потоков: цикл событий в select, пулы потоков
+# и потоки соединений aiosqlite — в ожидании задачи
+IDLE_FRAMES = frozenset({
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+    ("core.py", "_connection_worker_thread"),
+})
+
+PROFILES_CAPTURED = REGISTRY.counter("profiles_captured_total", "Request profiles written", ("trigger",))
+
+_UNSAFE_FILENAME = re.compile(r"[^A-Za-z0-9_.-]+")
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    path = code.co_filename.replace("\\", "/").split("/")
+    return f"{code.co_qualname} ({'/'.join(path[-2:])})"
+
+
+def _is_idle(frame) -> bool:
+    return (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name) in IDLE_FRAMES
+
+
+class SamplingProfiler:
+    """Сэмплирующий профилировщик: отдельный поток раз в interval снимает
+    стеки всех потоков процесса, кроме ожидающих.
+
+    Результат — свёрнутые стеки (формат flamegraph.pl, speedscope):
+    "поток;кадр;...;кадр количество". Снимаются все потоки, поэтому при
+    одновременных запросах в профиль попадают и соседние; работа в пуле
+    процессов (bcrypt с PASSWORD_HASHER_EXECUTOR=process в сервисе
+    пользователей) не видна.
+    """
+
+    def __init__(self, interval: float = PROFILE_INTERVAL):
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == own or _is_idle(frame):
+                    continue
+                if ident not in names:
+                    names = {thread.ident: thread.name for thread in threading.enumerate()}
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.samples[";".join(reversed(stack))] += 1
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+class ProfilingMiddleware:
+    """ASGI-middleware: профиль отдельного запроса по заголовку или выборке.
+
+    Запрос с X-Profile: <PROFILE_TOKEN> профилируется всегда, а имя файла
+    профиля возвращается в X-Profile-File; остальные — с вероятностью
+    PROFILE_SAMPLE_RATE. Одновременно снимается не больше одного профиля.
+    """
+
+    def __init__(self, app, token: str = PROFILE_TOKEN, sample_rate: float = PROFILE_SAMPLE_RATE):
+        self.app = app
+        self.token = token.encode()
+        self.sample_rate = sample_rate
+        self._busy = threading.Lock()
+
+    def _trigger(self, scope) -> Optional[str]:
+        if self.token:
+            for name, value in scope["headers"]:
+                if name == PROFILE_HEADER and hmac.compare_digest(value, self.token):
+                    return "header"
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return "sample"
+        return None
+
+    async def __call__(self, scope, receive, send):
+        trigger = self._trigger(scope) if scope["type"] == "http" else None
+        if trigger is None or not self._busy.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        started = datetime.utcnow()
+        filename = None
+
+        async def send_wrapper(message):
+            nonlocal filename
+            if message["type"] == "http.response.start" and trigger == "header":
+                # Имя известно до конца запроса; файл появится после его завершения
+                filename = profile_filename(scope, started)
+                message["headers"] = [*message.get("headers", []), (PROFILE_FILE_HEADER, filename.encode())]
+            await send(message)
+
+        profiler = SamplingProfiler()
+        start = time.perf_counter()
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profiler.stop()
+            self._busy.release()
+            elapsed = time.perf_counter() - start
+            if filename is None:
+                filename = profile_filename(scope, started)
+            await asyncio.to_thread(save_profile, filename, profiler.folded())
+            PROFILES_CAPTURED.inc((trigger,))
+            logger.info(f"Profile of {scope['method']} {route_template(scope)} ({elapsed * 1000:.0f} ms) saved to {filename}")
+
+
+def profile_filename(scope, started: datetime) -> str:
+    route = _UNSAFE_FILENAME.sub("_", route_template(scope)).strip("_") or "root"
+    return f"{started:%Y%m%dT%H%M%S.%f}-{scope['method']}-{route}.folded"
+
+
+def save_profile(filename: str, folded: str):
+    """Запись профиля и удаление самых старых сверх PROFILE_MAX_FILES"""
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    with open(os.path.join(PROFILE_DIR, filename), "w") as f:
+        f.write(folded)
+    if PROFILE_MAX_FILES <= 0:
+        return
+    profiles = sorted(name for name in os.listdir(PROFILE_DIR) if name.endswith(".folded"))
+    for name in profiles[:-PROFILE_MAX_FILES]:
+        try:
+            os.remove(os.path.join(PROFILE_DIR, name))
+        except OSError:
+            pass
@@ -0,0 +1,123 @@
+import logging
+import os
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from .metrics import REGISTRY, MetricsMiddleware, route_template
+
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# SQL-запросы дольше порога (секунд) пишутся в журнал с маршрутом; 0 — отключено
+SLOW_QUERY_THRESHOLD = float(os.getenv("SLOW_QUERY_THRESHOLD", "0.1"))
+SLOW_QUERY_MAX_SQL = 2000
+SLOW_QUERY_MAX_PARAMS = 20
+
+slow_query_logger = logging.getLogger("slow_query")
+
+HTTP_REQUEST_DB_QUERIES = REGISTRY.histogram(
+    "http_request_db_queries", "SQL queries executed per HTTP request", ("method", "route"), QUERY_COUNT_BUCKETS
+)
+HTTP_REQUEST_DB_SECONDS = REGISTRY.counter(
+    "http_request_db_seconds_total", "Time spent in SQL queries by route template", ("method", "route")
+)
+DB_QUERY_DURATION = REGISTRY.histogram("db_query_duration_seconds", "SQL query execution time")
+DB_SLOW_QUERIES = REGISTRY.counter(
+    "db_slow_queries_total", "SQL queries slower than SLOW_QUERY_THRESHOLD by route template", ("route",)
+)
+
+# Счётчики SQL текущего запроса: [количество, суммарное время]
+_request_db_stats: ContextVar[Optional[list]] = ContextVar("request_db_stats", default=None)
+# scope текущего HTTP-запроса; маршрут в нём появляется после роутинга
+_request_scope: ContextVar[Optional[dict]] = ContextVar("request_scope", default=None)
+
+
+def current_route() -> str:
+    """Метод и шаблон маршрута обрабатываемого запроса ("-" вне HTTP-запроса)"""
+    scope = _request_scope.get()
+    if scope is None:
+        return "-"
+    return f"{scope['method']} {route_template(scope)}"
+
+
+class QueryMetricsMiddleware(MetricsMiddleware):
+    """MetricsMiddleware сервиса с базой: дополнительно число и время SQL-запросов
+    по шаблону маршрута (движок подключается через instrument_engine)"""
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        db_stats = [0, 0.0]
+        token = _request_db_stats.set(db_stats)
+        scope_token = _request_scope.set(scope)
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            _request_db_stats.reset(token)
+            _request_scope.reset(scope_token)
+            labels = (scope["method"], route_template(scope))
+            HTTP_REQUEST_DB_QUERIES.observe(labels, db_stats[0])
+            if db_stats[1]:
+                HTTP_REQUEST_DB_SECONDS.inc(labels, db_stats[1])
+
+
+def parameters_shape(parameters, executemany: bool = False) -> str:
+    """Типы параметров запроса без значений: в журнал не попадают пароли и личные данные"""
+    if executemany:
+        rows = list(parameters)
+        return f"{len(rows)} x {parameters_shape(rows[0]) if rows else '()'}"
+    if not parameters:
+        return "()"
+    if isinstance(parameters, dict):
+        items = [f"{key}: {type(value).__name__}" for key, value in list(parameters.items())[:SLOW_QUERY_MAX_PARAMS]]
+        opening, closing = "{", "}"
+    else:
+        items = [type(value).__name__ for value in list(parameters)[:SLOW_QUERY_MAX_PARAMS]]
+        opening, closing = "(", ")"
+    if len(parameters) > SLOW_QUERY_MAX_PARAMS:
+        items.append(f"... +{len(parameters) - SLOW_QUERY_MAX_PARAMS}")
+    return opening + ", ".join(items) + closing
+
+
+def log_slow_query(statement: str, parameters, executemany: bool, elapsed: float):
+    route = current_route()
+    DB_SLOW_QUERIES.inc((route,))
+    sql = " ".join(statement.split())
+    if len(sql) > SLOW_QUERY_MAX_SQL:
+        sql = sql[:SLOW_QUERY_MAX_SQL] + "..."
+    slow_query_logger.warning(
+        f"Slow query {elapsed * 1000:.1f} ms, route {route}, params {parameters_shape(parameters, executemany)}: {sql}"
+    )
+
+
+def instrument_engine(engine):
+    """Учёт количества и времени SQL-запросов движка в метриках текущего HTTP-запроса.
+
+    Запросы дольше SLOW_QUERY_THRESHOLD дополнительно пишутся в журнал
+    slow_query: текст SQL, типы параметров, время и маршрут.
+    """
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start_time"].pop()
+        DB_QUERY_DURATION.observe((), elapsed)
+        if SLOW_QUERY_THRESHOLD > 0 and elapsed >= SLOW_QUERY_THRESHOLD:
+            log_slow_query(statement, parameters, executemany, elapsed)
+        stats = _request_db_stats.get()
+        if stats is not None:
+            stats[0] += 1
+            stats[1] += elapsed
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(exception_context):
+        # after_cursor_execute при ошибке не вызывается — убираем отметку времени
+        conn = exception_context.connection
+        if conn is not None and exception_context.cursor is not None and conn.info.get("query_start_time"):
+            conn.info["query_start_time"].pop()
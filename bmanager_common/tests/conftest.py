@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Корень репозитория, где лежит пакет bmanager_common
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
@@ -0,0 +1,90 @@
+import asyncio
+import gzip
+
+import pytest
+from fastapi import HTTPException
+from pydantic import BaseModel
+from starlette.requests import Request
+
+from bmanager_common.export import export_response
+
+
+class Row(BaseModel):
+    id: int
+    tags: list
+
+
+def make_request(accept_encoding: str = "") -> Request:
+    headers = [(b"accept-encoding", accept_encoding.encode())] if accept_encoding else []
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers})
+
+
+def run(response, disconnect_after: int = 0) -> list:
+    """Ответ через ASGI; disconnect_after > 0 — клиент уходит после стольких сообщений"""
+    sent = []
+    gone = asyncio.Event()
+
+    async def send(message):
+        sent.append(message)
+        if disconnect_after and len(sent) >= disconnect_after:
+            gone.set()
+
+    async def receive():
+        await gone.wait()
+        return {"type": "http.disconnect"}
+
+    asyncio.run(response({"type": "http"}, receive, send))
+    return sent
+
+
+def body(sent: list) -> bytes:
+    return b"".join(message.get("body", b"") for message in sent if message["type"] == "http.response.body")
+
+
+def test_csv_export_encodes_batches():
+    batches = (batch for batch in [[Row(id=1, tags=["a"])], [Row(id=2, tags=[])]])
+    sent = run(export_response(make_request(), "csv", ("id", "tags"), batches, "rows"))
+
+    assert body(sent) == b'id,tags\n1,"[""a""]"\n2,[]\n'
+    assert dict(sent[0]["headers"])[b"content-disposition"] == b'attachment; filename="rows.csv"'
+
+
+def test_ndjson_export_is_gzipped_when_accepted():
+    async def batches():
+        yield [Row(id=1, tags=[])]
+
+    response = export_response(make_request("gzip"), "ndjson", ("id",), batches(), "rows", exclude={"tags"})
+    assert gzip.decompress(body(run(response))) == b'{"id":1}\n'
+
+
+def test_unknown_format_is_rejected_before_streaming():
+    with pytest.raises(HTTPException) as error:
+        export_response(make_request(), "xml", ("id",), (batch for batch in []), "rows")
+    assert error.value.status_code == 400
+
+
+@pytest.mark.parametrize("kind", ["sync", "async"])
+def test_source_is_closed_when_client_disconnects(kind):
+    closed = []
+
+    def sync_batches():
+        try:
+            for i in range(100_000):
+                yield [Row(id=i, tags=[])]
+        finally:
+            closed.append(kind)
+
+    async def async_batches():
+        try:
+            for i in range(100_000):
+                await asyncio.sleep(0)
+                yield [Row(id=i, tags=[])]
+        finally:
+            closed.append(kind)
+
+    batches = sync_batches() if kind == "sync" else async_batches()
+    sent = run(export_response(make_request(), "csv", ("id",), batches, "rows"), disconnect_after=3)
+
+    # Клиент ушёл задолго до конца, а finally источника (закрытие сессии) уже выполнен
+    assert len(sent) < 100
+    assert closed == [kind]
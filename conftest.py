@@ -0,0 +1,52 @@
+"""Запуск тестов всех сервисов одним pytest.
+
+У каждого сервиса свой пакет app, а в отдельном процессе — и свой
+экземпляр bmanager_common (реестр метрик, шина событий). Перед тестом
+сервиса его модули возвращаются в sys.modules, а модули предыдущего
+сервиса откладываются, поэтому импорты внутри тестов и фикстур видят
+тот же код, что и процесс сервиса.
+"""
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+SERVICES = ("backend", "service_users", "service_orders", "api_gateway")
+SERVICE_DIRS = frozenset(os.path.join(ROOT, service) for service in SERVICES)
+# Пакеты, которые у каждого сервиса свои
+SERVICE_PACKAGES = ("app", "bmanager_common")
+
+_stashed = {}
+_active = None
+
+
+def _service_of(path) -> str:
+    top = os.path.relpath(str(path), ROOT).split(os.sep)[0]
+    return top if top in SERVICES else None
+
+
+def _owned(name: str) -> bool:
+    return any(name == package or name.startswith(package + ".") for package in SERVICE_PACKAGES)
+
+
+def activate(service):
+    """Модули app и bmanager_common сервиса (None — вне сервисов) и его каталог в sys.path"""
+    global _active
+    if service == _active:
+        return
+    _stashed[_active] = {name: module for name, module in sys.modules.items() if _owned(name)}
+    for name in _stashed[_active]:
+        del sys.modules[name]
+    # Каталоги остальных сервисов убираются из sys.path: обычный пакет app
+    # другого сервиса иначе перекрыл бы app backend (пакет без __init__.py)
+    sys.path[:] = [path for path in sys.path if path not in SERVICE_DIRS]
+    sys.modules.update(_stashed.pop(service, {}))
+    if service is not None:
+        sys.path.insert(0, os.path.join(ROOT, service))
+    _active = service
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_runtest_setup(item):
+    activate(_service_of(item.path))
@@ -1,4 +1,10 @@
 // src/api.js
+// Фронтенд работает с backend напрямую: у backend свои пользователи и свой
+// секрет JWT, шлюз (api_gateway) его токены не проверяет, а проксирует только
+// сервисы пользователей и заказов. Поэтому и события backend (/events) идут
+// сюда же, с коротким токеном потока backend; события заказов идут через шлюз
+// (/v1/orders/events) с токеном потока шлюза. Это два независимых пути
+// авторизации, а не обход шлюза.
 const API_BASE_URL = 'http://localhost:8000';
 
 // Вспомогательная функция для запросов
@@ -95,10 +101,18 @@ export const authAPI = {
     });
   },
 
-  // Получение задач
-  async getTasks(token) {
+  // Получение задач; filters — параметры запроса (project_id, status, priority,
+  // assigned_to, due_before, due_after, overdue, sort), фильтрация на сервере
+  async getTasks(token, filters = {}) {
     const req = authRequest(token);
-    return req('/tasks/');
+    const params = new URLSearchParams();
+    Object.entries(filters).forEach(([key, value]) => {
+      if (value !== undefined && value !== null) {
+        params.append(key, value);
+      }
+    });
+    const query = params.toString();
+    return req(query ? `/tasks/?${query}` : '/tasks/');
   },
 
   // Создание задачи
@@ -109,6 +123,46 @@ export const authAPI = {
       body: taskData,
     });
   },
+
+  // Подписка на события об изменениях (Server-Sent Events) вместо опроса списков.
+  // EventSource сам переподключается и передаёт Last-Event-ID; заголовки он
+  // не поддерживает, поэтому в адресе идёт короткий токен потока, а не основной.
+  // Когда токен истёк, переподключение получает 401 и EventSource закрывается —
+  // тогда берём новый токен, открываем поток заново и перечитываем данные (reset).
+  // Возвращает функцию отписки
+  subscribeChanges(token, onEvent) {
+    let source = null;
+    let closed = false;
+
+    const open = async (reopened) => {
+      const { stream_token: streamToken } = await authRequest(token)('/auth/stream-token', { method: 'POST' });
+      if (closed) {
+        return;
+      }
+      source = new EventSource(`${API_BASE_URL}/events?access_token=${encodeURIComponent(streamToken)}`);
+      ['project.created', 'task.created', 'reset'].forEach((type) => {
+        source.addEventListener(type, (event) => onEvent(type, JSON.parse(event.data)));
+      });
+      source.onerror = () => {
+        if (source.readyState === EventSource.CLOSED && !closed) {
+          setTimeout(() => reopen(), 3000);
+        }
+      };
+      if (reopened) {
+        onEvent('reset', {});
+      }
+    };
+
+    const reopen = () => open(true).catch((error) => console.error('Event stream failed:', error));
+    open(false).catch((error) => console.error('Event stream failed:', error));
+
+    return () => {
+      closed = true;
+      if (source) {
+        source.close();
+      }
+    };
+  },
 };
 
 // Сохранение токена в localStorage
@@ -11,6 +11,14 @@ const Dashboard = ({ user, onLogout }) => {
 
   useEffect(() => {
     loadData();
+    // Списки перечитываются только когда сервер сообщил об изменении
+    const unsubscribe = authAPI.subscribeChanges(authStorage.getToken(), (type, data) => {
+      if (type === 'task.created' && user.role === 1 && data.assigned_to !== user.id) {
+        return;
+      }
+      loadData();
+    });
+    return unsubscribe;
   }, []);
 
   const loadData = async () => {
@@ -19,7 +27,8 @@ const Dashboard = ({ user, onLogout }) => {
     try {
       const [projectsData, tasksData] = await Promise.all([
         authAPI.getProjects(token),
-        authAPI.getTasks(token)
+        // Инженеру нужны только его задачи — по сроку, отбор на сервере
+        authAPI.getTasks(token, user.role === 1 ? { assigned_to: user.id, sort: 'due_date' } : {})
       ]);
       
       setProjects(projectsData);
@@ -37,7 +46,7 @@ const Dashboard = ({ user, onLogout }) => {
         return (
           <div className="engineer-dashboard">
             <h3>Мои задачи</h3>
-            {tasks.filter(task => task.assigned_to === user.id).map(task => (
+            {tasks.map(task => (
               <div key={task.id} className="task-card">
                 <h4>{task.title}</h4>
                 <p>{task.description}</p>
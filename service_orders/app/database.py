@@ -0,0 +1,259 @@
+import asyncio
+import logging
+import os
+from contextlib import AsyncExitStack, ExitStack, asynccontextmanager
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from bmanager_common.sql_metrics import instrument_engine
+
+logger = logging.getLogger(__name__)
+
+# Настройка базы данных
+SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./orders.db")
+
+# sync — синхронная сессия в event loop (как раньше), async — SQLAlchemy asyncio + aiosqlite
+DB_BACKEND = os.getenv("DB_BACKEND", "async")
+
+# Профили PRAGMA, применяемые к каждому новому соединению SQLite
+SQLITE_PRAGMA_PROFILES = {
+    "default": {},
+    "production": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": "5000",
+        "cache_size": "-20000",  # в KiB, т.е. ~20 МБ на соединение
+        "mmap_size": "268435456",
+        "temp_store": "MEMORY",
+    },
+}
+SQLITE_PRAGMA_PROFILE = os.getenv("SQLITE_PRAGMA_PROFILE", "production")
+
+# Размер пула соединений для файловой SQLite
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+# Сколько соединений пула открывается при старте, до первых запросов
+DB_POOL_WARM = int(os.getenv("DB_POOL_WARM", str(DB_POOL_SIZE)))
+
+# Период фонового checkpoint WAL и PRAGMA optimize, секунд (0 — отключено)
+SQLITE_MAINTENANCE_INTERVAL = float(os.getenv("SQLITE_MAINTENANCE_INTERVAL", "300"))
+
+
+def sqlite_pragmas(profile: str) -> dict:
+    """PRAGMA профиля; каждую можно переопределить переменной SQLITE_<NAME>"""
+    if profile not in SQLITE_PRAGMA_PROFILES:
+        raise ValueError(f"Unknown SQLite pragma profile: {profile}")
+    pragmas = dict(SQLITE_PRAGMA_PROFILES[profile])
+    for name in SQLITE_PRAGMA_PROFILES["production"]:
+        value = os.getenv(f"SQLITE_{name.upper()}")
+        if value:
+            pragmas[name] = value
+    return pragmas
+
+
+def _apply_pragmas(sync_engine, pragmas: dict):
+    @event.listens_for(sync_engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+
+def _pool_options(url: str, use_async: bool) -> dict:
+    # Для :memory: оставляем пул SQLAlchemy по умолчанию — соединение там одно
+    if ":memory:" in url or url.rstrip("/").endswith("sqlite:"):
+        return {}
+    return {
+        # aiosqlite по умолчанию работает через NullPool и открывает файл на каждый запрос
+        "poolclass": AsyncAdaptedQueuePool if use_async else QueuePool,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+    }
+
+
+def create_sqlite_engine(url: str, profile: str = SQLITE_PRAGMA_PROFILE, use_async: bool = False):
+    """Движок SQLite с PRAGMA профиля на каждом соединении, настроенным пулом и метриками запросов"""
+    pragmas = sqlite_pragmas(profile)
+    if use_async:
+        from sqlalchemy.ext.asyncio import create_async_engine
+
+        new_engine = create_async_engine(url.replace("sqlite://", "sqlite+aiosqlite://", 1), **_pool_options(url, True))
+        _apply_pragmas(new_engine.sync_engine, pragmas)
+        instrument_engine(new_engine.sync_engine)
+    else:
+        new_engine = create_engine(url, connect_args={"check_same_thread": False}, **_pool_options(url, False))
+        _apply_pragmas(new_engine, pragmas)
+        instrument_engine(new_engine)
+    return new_engine
+
+
+engine = create_sqlite_engine(SQLALCHEMY_DATABASE_URL)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+if DB_BACKEND == "async":
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+
+    async_engine = create_sqlite_engine(SQLALCHEMY_DATABASE_URL, use_async=True)
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+elif DB_BACKEND != "sync":
+    raise ValueError(f"Unknown DB_BACKEND: {DB_BACKEND}")
+
+
+def create_schema(metadata):
+    """Создание таблиц и недостающих индексов.
+
+    create_all не добавляет новые индексы к уже существующим таблицам,
+    поэтому индексы создаются отдельно с проверкой наличия.
+    """
+    metadata.create_all(bind=engine)
+    for table in metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+
+def schema_version() -> int:
+    """Версия схемы базы (PRAGMA user_version)"""
+    with engine.connect() as connection:
+        return connection.exec_driver_sql("PRAGMA user_version").scalar()
+
+
+def set_schema_version(version: int):
+    with engine.begin() as connection:
+        connection.exec_driver_sql(f"PRAGMA user_version = {int(version)}")
+
+
+class SyncSessionAdapter:
+    """Синхронная сессия с интерфейсом AsyncSession.
+
+    Позволяет эндпоинтам одинаково работать с обоими бэкендами; запросы
+    при этом по-прежнему блокируют event loop.
+    """
+
+    def __init__(self, session):
+        self.sync_session = session
+
+    def add(self, instance):
+        self.sync_session.add(instance)
+
+    def add_all(self, instances):
+        self.sync_session.add_all(instances)
+
+    async def execute(self, statement, params=None, **kwargs):
+        return self.sync_session.execute(statement, params, **kwargs)
+
+    async def scalar(self, statement, params=None, **kwargs):
+        return self.sync_session.scalar(statement, params, **kwargs)
+
+    async def scalars(self, statement, params=None, **kwargs):
+        return self.sync_session.scalars(statement, params, **kwargs)
+
+    async def stream_scalars(self, statement, params=None, **kwargs):
+        return SyncStreamResult(self.sync_session.scalars(statement, params, **kwargs))
+
+    async def get(self, entity, ident, **kwargs):
+        return self.sync_session.get(entity, ident, **kwargs)
+
+    async def flush(self, objects=None):
+        self.sync_session.flush(objects)
+
+    async def refresh(self, instance, attribute_names=None):
+        self.sync_session.refresh(instance, attribute_names)
+
+    async def commit(self):
+        self.sync_session.commit()
+
+    async def rollback(self):
+        self.sync_session.rollback()
+
+    async def close(self):
+        self.sync_session.close()
+
+
+class SyncStreamResult:
+    """Результат синхронной сессии с интерфейсом AsyncScalarResult для потоковой выдачи"""
+
+    def __init__(self, result):
+        self._result = result
+
+    async def partitions(self, size=None):
+        for partition in self._result.partitions(size):
+            yield partition
+
+
+@asynccontextmanager
+async def open_session():
+    """Сессия выбранного бэкенда; для потоковых ответов, которые живут дольше обработчика"""
+    if DB_BACKEND == "async":
+        async with AsyncSessionLocal() as db:
+            yield db
+    else:
+        db = SyncSessionAdapter(SessionLocal())
+        try:
+            yield db
+        finally:
+            await db.close()
+
+
+async def get_db():
+    async with open_session() as db:
+        yield db
+
+
+def sqlite_maintenance():
+    """Checkpoint WAL и обновление статистики планировщика"""
+    with engine.connect() as connection:
+        connection.exec_driver_sql("PRAGMA wal_checkpoint(PASSIVE)")
+        connection.exec_driver_sql("PRAGMA optimize")
+
+
+async def run_sqlite_maintenance(interval: float = SQLITE_MAINTENANCE_INTERVAL):
+    """Фоновая задача: периодическое обслуживание SQLite в отдельном потоке"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(sqlite_maintenance)
+        except Exception as e:
+            logger.warning(f"SQLite maintenance failed: {e}")
+
+
+def _open_connections(count: int):
+    with ExitStack() as stack:
+        for _ in range(count):
+            stack.enter_context(engine.connect())
+
+
+def _select_one():
+    with engine.connect() as connection:
+        connection.exec_driver_sql("SELECT 1")
+
+
+async def warm_up_pool(count: int = DB_POOL_WARM):
+    """Открытие соединений пула заранее: первые запросы не ждут подключения и PRAGMA"""
+    if DB_BACKEND == "async":
+        async with AsyncExitStack() as stack:
+            for _ in range(count):
+                await stack.enter_async_context(async_engine.connect())
+    else:
+        await asyncio.to_thread(_open_connections, count)
+
+
+async def check_database():
+    """SELECT 1 через пул, которым пользуются обработчики запросов"""
+    if DB_BACKEND == "async":
+        async with async_engine.connect() as connection:
+            await connection.exec_driver_sql("SELECT 1")
+    else:
+        await asyncio.to_thread(_select_one)
+
+
+async def dispose_engines():
+    """Закрытие всех соединений пулов"""
+    if DB_BACKEND == "async":
+        await async_engine.dispose()
+    engine.dispose()
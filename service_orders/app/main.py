@@ -1,160 +1,478 @@
-from fastapi import FastAPI, HTTPException, Depends
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from .models import Base, Order
-from pydantic import BaseModel
-from typing import List, Dict, Optional
+from fastapi import FastAPI, HTTPException, Depends, Header, Query, Request
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from sqlalchemy import func, insert, select, tuple_
+from bmanager_common.events import EVENT_STREAM_HEADERS, event_bus
+from bmanager_common.export import EXPORT_BATCH_SIZE, export_response
+from bmanager_common.metrics import metrics_response
+from bmanager_common.profiling import ProfilingMiddleware
+from bmanager_common.sql_metrics import QueryMetricsMiddleware
+from .database import SQLITE_MAINTENANCE_INTERVAL, check_database, dispose_engines, get_db, open_session, run_sqlite_maintenance, warm_up_pool
+from .migrations import prepare_database
+from .models import Order, OrderLineItem
+from .pagination import decode_cursor, encode_cursor
+from .responses import model_json, model_response
+from .search import search_order_ids
+from .schemas import (
+    OrderAggregateGroup,
+    OrderAggregates,
+    OrderAggregatesEnvelope,
+    OrderBatchCreate,
+    OrderBatchEnvelope,
+    OrderBatchResult,
+    OrderBatchSummary,
+    OrderCreate,
+    OrderEnvelope,
+    OrderListEnvelope,
+    OrderResponse,
+)
+from .response_cache import (
+    bump_version,
+    cacheable_response,
+    cached_response,
+    etag_matches,
+    get_version,
+    make_etag,
+    not_modified,
+    response_cache,
+)
+from pydantic import ValidationError
+from typing import List, Optional
+from datetime import datetime
+from contextlib import asynccontextmanager
+import asyncio
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Orders Service", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Проверка схемы и прогрев пула при старте; обслуживание SQLite — всё время работы сервиса"""
+    await asyncio.to_thread(prepare_database)
+    await warm_up_pool()
+    app.state.ready = True
+    maintenance = asyncio.create_task(run_sqlite_maintenance()) if SQLITE_MAINTENANCE_INTERVAL > 0 else None
+    try:
+        yield
+    finally:
+        app.state.ready = False
+        if maintenance is not None:
+            maintenance.cancel()
+        await dispose_engines()
 
-# Настройка базы данных
-SQLALCHEMY_DATABASE_URL = "sqlite:///./orders.db"
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+app = FastAPI(
+    title="Orders Service",
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
+)
 
-# Создание таблиц
-Base.metadata.create_all(bind=engine)
+app.add_middleware(QueryMetricsMiddleware)
+# Профиль отдельного запроса по X-Profile или выборке (PROFILE_TOKEN, PROFILE_SAMPLE_RATE)
+app.add_middleware(ProfilingMiddleware)
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-# Pydantic схемы
-class OrderItem(BaseModel):
-    name: str
-    quantity: int
-    price: float
-
-class OrderCreate(BaseModel):
-    items: List[OrderItem]
-    total_amount: float
-
-class OrderResponse(BaseModel):
-    id: str
-    user_id: str
-    items: List[Dict]
-    status: str
-    total_amount: float
-    created_at: str
-    updated_at: str
-
-# Временная заглушка для аутентификации (в реальном приложении будет JWT)
-def get_current_user():
-    """Заглушка для получения текущего пользователя"""
-    return {"user_id": "engineer-user-id", "email": "engineer@company.com"}
+# JWT проверяется на шлюзе, сюда приходит доверенный заголовок "<user_id>;<email>"
+def get_current_user(x_user_identity: Optional[str] = Header(None)):
+    """Получение текущего пользователя из заголовка шлюза"""
+    if not x_user_identity:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    user_id, _, email = x_user_identity.partition(";")
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    return {"user_id": user_id, "email": email}
+
+# Максимальное число заказов в одном пакетном запросе
+MAX_BATCH_SIZE = 1000
+
+# Допустимое расхождение суммы клиента с суммой по позициям
+TOTAL_AMOUNT_TOLERANCE = 0.005
+
+AGGREGATE_GROUPS = ("status", "item", "day")
+
+# Колонки CSV-выгрузки заказов; позиции — JSON-строкой
+ORDER_EXPORT_COLUMNS = ("id", "status", "total_amount", "created_at", "updated_at", "items")
+
+def validate_order(order_data: OrderCreate) -> Optional[str]:
+    """Проверка позиций заказа; возвращает текст ошибки или None"""
+    if not order_data.items:
+        return "Order must contain at least one item"
+    for item in order_data.items:
+        if item.quantity <= 0:
+            return "Item quantity must be positive"
+        if item.price < 0:
+            return "Item price cannot be negative"
+    return None
+
+def calculate_total(order_data: OrderCreate) -> float:
+    """Сумма заказа по позициям; сумма клиента не сохраняется, расхождение только журналируется"""
+    total = round(sum(item.quantity * item.price for item in order_data.items), 2)
+    if order_data.total_amount is not None and abs(order_data.total_amount - total) > TOTAL_AMOUNT_TOLERANCE:
+        logger.warning(f"Client total {order_data.total_amount} does not match order items, using {total}")
+    return total
+
+def build_line_items(order_data: OrderCreate) -> List[dict]:
+    return [
+        {
+            "name": item.name,
+            "quantity": item.quantity,
+            "price": item.price,
+            "line_total": item.quantity * item.price
+        }
+        for item in order_data.items
+    ]
+
+def serialize_order(order: Order) -> OrderResponse:
+    return OrderResponse.model_validate(order)
+
+def order_filters(
+    user_id: str,
+    date_from: Optional[datetime],
+    date_to: Optional[datetime],
+    status: Optional[str]
+) -> list:
+    """Условия выборки заказов пользователя за период [date_from, date_to) и по статусу"""
+    filters = [Order.user_id == user_id]
+    if date_from is not None:
+        filters.append(Order.created_at >= date_from)
+    if date_to is not None:
+        filters.append(Order.created_at < date_to)
+    if status is not None:
+        filters.append(Order.status == status)
+    return filters
 
 # API endpoints
-@app.post("/v1/orders", response_model=dict)
-async def create_order(order_data: OrderCreate, db = Depends(get_db)):
+@app.post("/v1/orders", response_model=OrderEnvelope)
+async def create_order(
+    order_data: OrderCreate,
+    db = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
     """Создание нового заказа"""
+    # Валидация items
+    error = validate_order(order_data)
+    if error:
+        raise HTTPException(status_code=400, detail=error)
+    
     try:
-        # В реальном приложении user_id будет из JWT токена
-        current_user = get_current_user()
         user_id = current_user["user_id"]
         
-        # Валидация items
-        if not order_data.items:
-            raise HTTPException(status_code=400, detail="Order must contain at least one item")
-        
-        for item in order_data.items:
-            if item.quantity <= 0:
-                raise HTTPException(status_code=400, detail="Item quantity must be positive")
-            if item.price < 0:
-                raise HTTPException(status_code=400, detail="Item price cannot be negative")
-        
         # Создание заказа
         db_order = Order(
             user_id=user_id,
-            items=[item.dict() for item in order_data.items],
-            total_amount=order_data.total_amount,
-            status="created"
+            items=[item.model_dump() for item in order_data.items],
+            total_amount=calculate_total(order_data),
+            status="created",
+            line_items=[OrderLineItem(**line) for line in build_line_items(order_data)]
         )
         
         db.add(db_order)
-        db.commit()
-        db.refresh(db_order)
+        await bump_version(db, user_id)
+        await db.commit()
+        await db.refresh(db_order)
+        response_cache.invalidate(user_id)
         
         logger.info(f"Order created: {db_order.id} for user: {user_id}")
         
-        return {
-            "success": True,
-            "data": {
-                "id": db_order.id,
-                "user_id": db_order.user_id,
-                "items": db_order.items,
-                "status": db_order.status,
-                "total_amount": db_order.total_amount,
-                "created_at": db_order.created_at.isoformat(),
-                "updated_at": db_order.updated_at.isoformat()
-            }
-        }
+        order = serialize_order(db_order)
+        event_bus.publish(user_id, "order.created", order)
+        return model_response(OrderEnvelope(data=order))
         
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         logger.error(f"Error creating order: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
-@app.get("/v1/orders", response_model=dict)
-async def get_orders(db = Depends(get_db)):
-    """Получение списка заказов текущего пользователя"""
+@app.post("/v1/orders:batch", response_model=OrderBatchEnvelope)
+async def create_orders_batch(
+    batch: OrderBatchCreate,
+    db = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """Пакетное создание заказов одной транзакцией (синхронизация офлайн-очередей)"""
+    if not batch.orders:
+        raise HTTPException(status_code=400, detail="Batch must contain at least one order")
+    if len(batch.orders) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"Batch cannot contain more than {MAX_BATCH_SIZE} orders")
+    
+    user_id = current_user["user_id"]
+    results: List[Optional[OrderBatchResult]] = [None] * len(batch.orders)
+    rows = []
+    row_indexes = []
+    line_items = []
+    
+    for index, raw_order in enumerate(batch.orders):
+        try:
+            order_data = OrderCreate.model_validate(raw_order)
+        except ValidationError as e:
+            results[index] = OrderBatchResult(index=index, success=False, error=str(e.errors()[0]["msg"]))
+            continue
+        error = validate_order(order_data)
+        if error:
+            results[index] = OrderBatchResult(index=index, success=False, error=error)
+            continue
+        rows.append({
+            "user_id": user_id,
+            "items": [item.model_dump() for item in order_data.items],
+            "total_amount": calculate_total(order_data),
+            "status": "created"
+        })
+        row_indexes.append(index)
+        line_items.append(build_line_items(order_data))
+    
+    if rows:
+        try:
+            # Один INSERT ... RETURNING на весь пакет; порядок строк совпадает с порядком параметров
+            result = await db.scalars(
+                insert(Order).returning(Order, sort_by_parameter_order=True),
+                rows
+            )
+            created_orders = result.all()
+            await db.execute(
+                insert(OrderLineItem),
+                [
+                    {"order_id": order.id, **line}
+                    for order, lines in zip(created_orders, line_items)
+                    for line in lines
+                ]
+            )
+            await bump_version(db, user_id)
+            await db.commit()
+            response_cache.invalidate(user_id)
+        except Exception as e:
+            await db.rollback()
+            logger.error(f"Error creating order batch: {e}")
+            raise HTTPException(status_code=500, detail="Internal server error")
+        
+        for index, order in zip(row_indexes, created_orders):
+            results[index] = OrderBatchResult(index=index, success=True, data=serialize_order(order))
+        
+        # Одно событие на пакет, чтобы большой пакет не переполнял очереди подписчиков
+        event_bus.publish(user_id, "order.batch_created", {"orders": [results[index].data for index in row_indexes]})
+        logger.info(f"Order batch created: {len(created_orders)} orders for user: {user_id}")
+    
+    return model_response(OrderBatchEnvelope(data=OrderBatchSummary(
+        created=len(rows),
+        failed=len(batch.orders) - len(rows),
+        results=results
+    )), exclude_none=True)
+
+@app.get("/v1/orders", response_model=OrderListEnvelope)
+async def get_orders(
+    request: Request,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    db = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """Получение страницы заказов текущего пользователя (от новых к старым)"""
     try:
-        # В реальном приложении user_id будет из JWT токена
-        current_user = get_current_user()
         user_id = current_user["user_id"]
         
-        orders = db.query(Order).filter(Order.user_id == user_id).order_by(Order.created_at.desc()).all()
-        
-        return {
-            "success": True,
-            "data": [
-                {
-                    "id": order.id,
-                    "user_id": order.user_id,
-                    "items": order.items,
-                    "status": order.status,
-                    "total_amount": order.total_amount,
-                    "created_at": order.created_at.isoformat(),
-                    "updated_at": order.updated_at.isoformat()
-                }
-                for order in orders
-            ]
-        }
+        # Без изменений с прошлого опроса — 304 без обращения к заказам
+        etag = make_etag(request, user_id, await get_version(db, user_id))
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        cached = cached_response(etag)
+        if cached is not None:
+            return cached
+        
+        # Keyset-пагинация: стоимость страницы не зависит от её глубины
+        query = select(Order).where(Order.user_id == user_id)
+        if cursor:
+            created_at, order_id = decode_cursor(cursor)
+            query = query.where(tuple_(Order.created_at, Order.id) < (created_at, order_id))
+        query = query.order_by(Order.created_at.desc(), Order.id.desc()).limit(limit + 1)
         
+        result = await db.scalars(query)
+        orders = result.all()
+        
+        next_cursor = None
+        if len(orders) > limit:
+            orders = orders[:limit]
+            next_cursor = encode_cursor(orders[-1].created_at, orders[-1].id)
+        
+        body = model_json(OrderListEnvelope(
+            data=[serialize_order(order) for order in orders],
+            next_cursor=next_cursor
+        ))
+        return cacheable_response(user_id, etag, body)
+        
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching orders: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
-@app.get("/v1/orders/{order_id}", response_model=dict)
-async def get_order(order_id: str, db = Depends(get_db)):
+@app.get("/v1/orders/aggregates", response_model=OrderAggregatesEnvelope)
+async def get_order_aggregates(
+    group_by: str = Query("status", description="status, item или day"),
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    status: Optional[str] = None,
+    db = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """Итоги по заказам текущего пользователя (GROUP BY на стороне SQL)"""
+    if group_by not in AGGREGATE_GROUPS:
+        raise HTTPException(status_code=400, detail=f"group_by must be one of: {', '.join(AGGREGATE_GROUPS)}")
+    
+    filters = order_filters(current_user["user_id"], date_from, date_to, status)
+    
+    try:
+        if group_by == "item":
+            query = (
+                select(
+                    OrderLineItem.name.label("key"),
+                    func.count(func.distinct(OrderLineItem.order_id)).label("orders"),
+                    func.sum(OrderLineItem.quantity).label("quantity"),
+                    func.sum(OrderLineItem.line_total).label("total_amount")
+                )
+                .join(Order, Order.id == OrderLineItem.order_id)
+                .where(*filters)
+                .group_by(OrderLineItem.name)
+                .order_by(func.sum(OrderLineItem.line_total).desc())
+            )
+        else:
+            key = Order.status if group_by == "status" else func.date(Order.created_at)
+            query = (
+                select(
+                    key.label("key"),
+                    func.count(Order.id).label("orders"),
+                    func.sum(Order.total_amount).label("total_amount")
+                )
+                .where(*filters)
+                .group_by(key)
+                .order_by(key)
+            )
+        
+        result = await db.execute(query)
+        groups = [
+            OrderAggregateGroup(**{**row, "total_amount": round(row["total_amount"] or 0.0, 2)})
+            for row in result.mappings()
+        ]
+        
+        return model_response(
+            OrderAggregatesEnvelope(data=OrderAggregates(group_by=group_by, groups=groups)),
+            exclude_none=True
+        )
+        
+    except Exception as e:
+        logger.error(f"Error aggregating orders: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@app.get("/v1/orders/export")
+async def export_orders(
+    request: Request,
+    fmt: str = Query("csv", alias="format", description="csv или ndjson"),
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    status: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Выгрузка заказов текущего пользователя потоком (CSV или NDJSON).
+
+    Строки читаются курсором пачками по EXPORT_BATCH_SIZE и сразу
+    отправляются клиенту, так что память не растёт с числом заказов;
+    при Accept-Encoding: gzip поток сжимается на лету.
+    """
+    query = (
+        select(Order)
+        .where(*order_filters(current_user["user_id"], date_from, date_to, status))
+        .order_by(Order.created_at, Order.id)
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
+    )
+    
+    async def batches():
+        # Своя сессия: поток живёт дольше обработчика и его зависимостей
+        async with open_session() as db:
+            try:
+                result = await db.stream_scalars(query)
+                async for orders in result.partitions():
+                    yield [serialize_order(order) for order in orders]
+            except Exception as e:
+                # Заголовки уже отправлены — клиент получит оборванный файл
+                logger.error(f"Error exporting orders: {e}")
+                raise
+    
+    return export_response(request, fmt, ORDER_EXPORT_COLUMNS, batches(), "orders")
+
+@app.get("/v1/orders/events")
+async def order_events(
+    last_event_id: Optional[str] = Header(None),
+    current_user: dict = Depends(get_current_user)
+):
+    """Поток Server-Sent Events об изменениях заказов текущего пользователя.
+
+    После разрыва EventSource переподключается с Last-Event-ID и получает
+    пропущенные события; если их уже нет в буфере — событие reset.
+    """
+    return StreamingResponse(
+        event_bus.stream([current_user["user_id"]], last_event_id),
+        media_type="text/event-stream",
+        headers=EVENT_STREAM_HEADERS
+    )
+
+@app.get("/v1/orders/search", response_model=OrderListEnvelope)
+async def search_orders(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=200),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    db = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """Поиск заказов текущего пользователя по названиям позиций (FTS5, по релевантности)"""
+    try:
+        user_id = current_user["user_id"]
+        
+        etag = make_etag(request, user_id, await get_version(db, user_id))
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        cached = cached_response(etag)
+        if cached is not None:
+            return cached
+        
+        order_ids = await search_order_ids(db, user_id, q, skip, limit)
+        orders = {}
+        if order_ids:
+            result = await db.scalars(select(Order).where(Order.id.in_(order_ids)))
+            orders = {order.id: order for order in result.all()}
+        
+        body = model_json(OrderListEnvelope(
+            data=[serialize_order(orders[order_id]) for order_id in order_ids if order_id in orders]
+        ))
+        return cacheable_response(user_id, etag, body)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error searching orders: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@app.get("/v1/orders/{order_id}", response_model=OrderEnvelope)
+async def get_order(
+    order_id: str,
+    request: Request,
+    db = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
     """Получение заказа по ID"""
     try:
-        current_user = get_current_user()
         user_id = current_user["user_id"]
         
-        order = db.query(Order).filter(Order.id == order_id, Order.user_id == user_id).first()
+        etag = make_etag(request, user_id, await get_version(db, user_id))
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        cached = cached_response(etag)
+        if cached is not None:
+            return cached
+        
+        order = await db.scalar(select(Order).where(Order.id == order_id, Order.user_id == user_id))
         
         if not order:
             raise HTTPException(status_code=404, detail="Order not found")
         
-        return {
-            "success": True,
-            "data": {
-                "id": order.id,
-                "user_id": order.user_id,
-                "items": order.items,
-                "status": order.status,
-                "total_amount": order.total_amount,
-                "created_at": order.created_at.isoformat(),
-                "updated_at": order.updated_at.isoformat()
-            }
-        }
+        return cacheable_response(user_id, etag, model_json(OrderEnvelope(data=serialize_order(order))))
         
     except HTTPException:
         raise
@@ -170,6 +488,33 @@ async def root():
 async def health_check():
     return {"status": "healthy", "service": "orders"}
 
+@app.get("/ready")
+async def readiness_check():
+    """Готовность принимать трафик: старт завершён и база отвечает"""
+    if not getattr(app.state, "ready", False):
+        return ORJSONResponse(status_code=503, content={"status": "starting", "service": "orders"})
+    try:
+        await check_database()
+    except Exception as e:
+        logger.warning(f"Readiness check failed: {e}")
+        return ORJSONResponse(status_code=503, content={"status": "unavailable", "service": "orders", "database": str(e)})
+    return {"status": "ready", "service": "orders", "database": "ok"}
+
+@app.get("/stats/response-cache")
+async def response_cache_stats():
+    """Счётчики LRU сериализованных ответов"""
+    return response_cache.stats()
+
+@app.get("/stats/events")
+async def event_stats():
+    """Состояние шины событий"""
+    return event_bus.stats()
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Метрики в текстовом формате Prometheus"""
+    return metrics_response()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8002)
\ No newline at end of file
@@ -0,0 +1,71 @@
+import logging
+import os
+
+from sqlalchemy import text
+
+from .database import create_schema, engine, schema_version, set_schema_version
+from .models import Base
+from .search import ensure_fts
+
+logger = logging.getLogger(__name__)
+
+# Версия схемы в PRAGMA user_version. Увеличивается при любом изменении моделей,
+# индексов или переносов данных — иначе уже развёрнутые базы их не получат
+SCHEMA_VERSION = 1
+
+# Применять миграции при старте сервиса. В образе выключено: их выполняет
+# отдельный шаг перед запуском воркеров (python -m app.migrations)
+MIGRATE_ON_STARTUP = os.getenv("MIGRATE_ON_STARTUP", "true").lower() in ("1", "true", "yes")
+
+# Перенос позиций из JSON-колонки orders.items в таблицу order_items
+# для заказов, у которых позиций ещё нет (идемпотентно)
+BACKFILL_ORDER_ITEMS_SQL = text("""
+    INSERT INTO order_items (order_id, name, quantity, price, line_total)
+    SELECT
+        o.id,
+        json_extract(item.value, '$.name'),
+        json_extract(item.value, '$.quantity'),
+        json_extract(item.value, '$.price'),
+        json_extract(item.value, '$.quantity') * json_extract(item.value, '$.price')
+    FROM orders AS o, json_each(o.items) AS item
+    WHERE NOT EXISTS (SELECT 1 FROM order_items AS oi WHERE oi.order_id = o.id)
+""")
+
+
+def backfill_order_items() -> int:
+    """Заполнение order_items по JSON-колонке; возвращает число добавленных строк"""
+    with engine.begin() as connection:
+        result = connection.execute(BACKFILL_ORDER_ITEMS_SQL)
+    if result.rowcount:
+        logger.info(f"Backfilled {result.rowcount} order items from orders.items")
+    return result.rowcount
+
+
+def migrate():
+    """Создание схемы, перенос данных и полнотекстовый индекс позиций"""
+    create_schema(Base.metadata)
+    backfill_order_items()
+    ensure_fts()
+    set_schema_version(SCHEMA_VERSION)
+    logger.info(f"Database schema is at version {SCHEMA_VERSION}")
+
+
+def prepare_database():
+    """Проверка схемы при старте сервиса.
+
+    Если версия базы актуальна, миграции не запускаются: вместо create_all,
+    проверки каждого индекса и поиска заказов без позиций — один PRAGMA.
+    """
+    version = schema_version()
+    if version >= SCHEMA_VERSION:
+        return
+    if not MIGRATE_ON_STARTUP:
+        raise RuntimeError(
+            f"Database schema version {version} is older than {SCHEMA_VERSION}, run python -m app.migrations"
+        )
+    migrate()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    migrate()
@@ -1,5 +1,6 @@
-from sqlalchemy import Column, String, DateTime, Float, JSON
+from sqlalchemy import Column, String, Integer, DateTime, Float, JSON, ForeignKey, Index
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import relationship
 import datetime
 import uuid
 
@@ -13,11 +14,43 @@ class Order(Base):
     
     id = Column(String, primary_key=True, default=generate_uuid)
     user_id = Column(String, nullable=False, index=True)  # UUID пользователя
-    items = Column(JSON, nullable=False)  # Список товаров: [{"name": "", "quantity": 1, "price": 0.0}]
+    # Список товаров: [{"name": "", "quantity": 1, "price": 0.0}]; копия order_items для быстрой выдачи заказа
+    items = Column(JSON, nullable=False)
     status = Column(String, default="created")  # created, in_progress, completed, cancelled
-    total_amount = Column(Float, default=0.0)
+    total_amount = Column(Float, default=0.0)  # вычисляется сервером по позициям
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
     
+    __table_args__ = (
+        # Курсорная пагинация заказов пользователя по (created_at, id) от новых к старым
+        Index("ix_orders_user_created", user_id, created_at.desc(), id.desc()),
+        # Агрегаты по статусам
+        Index("ix_orders_user_status", user_id, status),
+    )
+    
+    line_items = relationship("OrderLineItem", cascade="all, delete-orphan")
+    
     def __repr__(self):
-        return f"<Order(id={self.id}, user_id={self.user_id}, status={self.status}, total={self.total_amount})>"
\ No newline at end of file
+        return f"<Order(id={self.id}, user_id={self.user_id}, status={self.status}, total={self.total_amount})>"
+
+class OrderLineItem(Base):
+    """Позиция заказа в нормализованном виде — для отчётов и агрегатов в SQL"""
+    __tablename__ = "order_items"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    order_id = Column(String, ForeignKey("orders.id", ondelete="CASCADE"), nullable=False, index=True)
+    name = Column(String, nullable=False, index=True)
+    quantity = Column(Integer, nullable=False)
+    price = Column(Float, nullable=False)
+    line_total = Column(Float, nullable=False)  # quantity * price
+    
+    def __repr__(self):
+        return f"<OrderLineItem(order_id={self.order_id}, name={self.name}, quantity={self.quantity})>"
+
+
+class OrderVersion(Base):
+    """Счётчик изменений заказов пользователя — основа ETag для выдачи заказов"""
+    __tablename__ = "order_versions"
+    
+    user_id = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
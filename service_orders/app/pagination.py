@@ -0,0 +1,23 @@
+import base64
+import binascii
+import datetime
+import json
+from typing import Any, Tuple
+
+from fastapi import HTTPException
+
+
+def encode_cursor(created_at: datetime.datetime, row_id: Any) -> str:
+    """Непрозрачный курсор на позицию (created_at, id)"""
+    raw = json.dumps([created_at.isoformat(), row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime.datetime, Any]:
+    """Разбор курсора, полученного от клиента"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.datetime.fromisoformat(created_at), row_id
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
@@ -0,0 +1,122 @@
+import hashlib
+import os
+from collections import OrderedDict
+from typing import Dict, Optional, Set, Tuple
+
+from fastapi import Request
+from fastapi.responses import Response
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert
+
+from .models import OrderVersion
+
+# Размер in-memory LRU сериализованных ответов (0 — только ETag/304)
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "1024"))
+
+
+async def get_version(db, user_id: str) -> int:
+    """Текущая версия заказов пользователя (один поиск по первичному ключу)"""
+    version = await db.scalar(select(OrderVersion.version).where(OrderVersion.user_id == user_id))
+    return version or 0
+
+
+async def bump_version(db, user_id: str):
+    """Увеличение версии в той же транзакции, что и изменение заказов"""
+    statement = insert(OrderVersion).values(user_id=user_id, version=1)
+    statement = statement.on_conflict_do_update(
+        index_elements=[OrderVersion.user_id],
+        set_={"version": OrderVersion.version + 1},
+    )
+    await db.execute(statement)
+
+
+def make_etag(request: Request, scope: str, version: int) -> str:
+    """Сильный ETag: ресурс с параметрами запроса + владелец + версия данных"""
+    key = f"{request.url.path}?{request.url.query}|{scope}|{version}"
+    return '"' + hashlib.blake2s(key.encode(), digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Проверка If-None-Match (слабое сравнение, RFC 9110)"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = (tag.strip() for tag in header.split(","))
+    return etag in (tag[2:] if tag.startswith("W/") else tag for tag in candidates)
+
+
+def _cache_headers(etag: str) -> dict:
+    # Клиент может хранить ответ, но обязан перепроверять его по ETag
+    return {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers=_cache_headers(etag))
+
+
+class ResponseCache:
+    """LRU сериализованных тел ответов по ETag с инвалидацией по владельцу"""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[str, Tuple[str, bytes]]" = OrderedDict()
+        self._by_scope: Dict[str, Set[str]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, etag: str) -> Optional[bytes]:
+        entry = self._data.get(etag)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._data.move_to_end(etag)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, scope: str, etag: str, body: bytes):
+        if self.maxsize <= 0:
+            return
+        self._data[etag] = (scope, body)
+        self._data.move_to_end(etag)
+        self._by_scope.setdefault(scope, set()).add(etag)
+        while len(self._data) > self.maxsize:
+            old_etag, (old_scope, _) = self._data.popitem(last=False)
+            self._discard(old_scope, old_etag)
+
+    def invalidate(self, scope: str):
+        for etag in self._by_scope.pop(scope, ()):
+            self._data.pop(etag, None)
+
+    def _discard(self, scope: str, etag: str):
+        etags = self._by_scope.get(scope)
+        if etags is not None:
+            etags.discard(etag)
+            if not etags:
+                del self._by_scope[scope]
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+response_cache = ResponseCache(RESPONSE_CACHE_SIZE)
+
+
+def cached_response(etag: str) -> Optional[Response]:
+    """Готовый ответ из LRU, если тело для этого ETag уже сериализовано"""
+    body = response_cache.get(etag)
+    if body is None:
+        return None
+    return Response(body, media_type="application/json", headers=_cache_headers(etag))
+
+
+def cacheable_response(scope: str, etag: str, body: bytes) -> Response:
+    """JSON-ответ с ETag; сериализованное тело сохраняется в LRU"""
+    response_cache.set(scope, etag, body)
+    return Response(body, media_type="application/json", headers=_cache_headers(etag))
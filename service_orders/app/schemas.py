@@ -0,0 +1,70 @@
+from pydantic import BaseModel, ConfigDict
+from typing import Any, List, Optional
+from datetime import datetime
+
+# Pydantic схемы
+class OrderItem(BaseModel):
+    name: str
+    quantity: int
+    price: float
+
+class OrderCreate(BaseModel):
+    items: List[OrderItem]
+    # Сумма считается сервером; значение клиента не сохраняется и не отклоняет заказ,
+    # расхождение больше TOTAL_AMOUNT_TOLERANCE только попадает в журнал
+    total_amount: Optional[float] = None
+
+class OrderBatchCreate(BaseModel):
+    # Заказы проверяются по одному, чтобы ошибка в одном (даже не объект) не отклоняла весь пакет
+    orders: List[Any]
+
+class OrderResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: str
+    user_id: str
+    items: List[OrderItem]
+    status: str
+    total_amount: float
+    created_at: datetime
+    updated_at: datetime
+
+class OrderEnvelope(BaseModel):
+    success: bool = True
+    data: OrderResponse
+
+class OrderListEnvelope(BaseModel):
+    success: bool = True
+    data: List[OrderResponse]
+    next_cursor: Optional[str] = None
+
+class OrderBatchResult(BaseModel):
+    index: int
+    success: bool
+    data: Optional[OrderResponse] = None
+    error: Optional[str] = None
+
+class OrderBatchSummary(BaseModel):
+    created: int
+    failed: int
+    results: List[OrderBatchResult]
+
+class OrderBatchEnvelope(BaseModel):
+    success: bool = True
+    data: OrderBatchSummary
+
+class OrderAggregateGroup(BaseModel):
+    # Статус, название позиции или дата (YYYY-MM-DD) — в зависимости от group_by
+    key: str
+    orders: int
+    # Только при group_by=item
+    quantity: Optional[int] = None
+    total_amount: float
+
+class OrderAggregates(BaseModel):
+    group_by: str
+    groups: List[OrderAggregateGroup]
+
+class OrderAggregatesEnvelope(BaseModel):
+    success: bool = True
+    data: OrderAggregates
@@ -0,0 +1,69 @@
+import re
+from typing import List, Optional
+
+from sqlalchemy import inspect, text
+
+from .database import engine
+
+# Полнотекстовый индекс FTS5 по названиям позиций заказов. Индекс внешнего
+# содержимого (content=order_items) хранит только термы, текст читается из таблицы
+FTS_INDEX = "order_items_fts"
+FTS_TOKENIZE = "unicode61 remove_diacritics 2"
+FTS_PREFIX = "2 3"
+
+FTS_DDL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_INDEX} USING fts5(name, content='order_items', "
+    f"content_rowid='id', tokenize='{FTS_TOKENIZE}', prefix='{FTS_PREFIX}')",
+    # Триггеры поддерживают индекс при любой записи в order_items, включая пакетные INSERT
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_INDEX}_ai AFTER INSERT ON order_items BEGIN "
+    f"INSERT INTO {FTS_INDEX}(rowid, name) VALUES (new.id, new.name); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_INDEX}_ad AFTER DELETE ON order_items BEGIN "
+    f"INSERT INTO {FTS_INDEX}({FTS_INDEX}, rowid, name) VALUES ('delete', old.id, old.name); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_INDEX}_au AFTER UPDATE OF name ON order_items BEGIN "
+    f"INSERT INTO {FTS_INDEX}({FTS_INDEX}, rowid, name) VALUES ('delete', old.id, old.name); "
+    f"INSERT INTO {FTS_INDEX}(rowid, name) VALUES (new.id, new.name); END",
+]
+
+# Заказы пользователя, в позициях которых встречаются все слова запроса;
+# релевантность заказа — лучшая (минимальная) оценка bm25 среди его позиций
+SEARCH_ORDERS_SQL = text(f"""
+    SELECT oi.order_id, min({FTS_INDEX}.rank) AS rank
+    FROM {FTS_INDEX}
+    JOIN order_items AS oi ON oi.id = {FTS_INDEX}.rowid
+    JOIN orders AS o ON o.id = oi.order_id
+    WHERE {FTS_INDEX} MATCH :match AND o.user_id = :user_id
+    GROUP BY oi.order_id
+    ORDER BY rank, oi.order_id
+    LIMIT :limit OFFSET :skip
+""")
+
+_TERM = re.compile(r"\w+", re.UNICODE)
+
+
+def ensure_fts():
+    """Создание индекса и триггеров; новый индекс заполняется по существующим позициям"""
+    exists = inspect(engine).has_table(FTS_INDEX)
+    with engine.begin() as connection:
+        for statement in FTS_DDL:
+            connection.exec_driver_sql(statement)
+        if not exists:
+            connection.exec_driver_sql(f"INSERT INTO {FTS_INDEX}({FTS_INDEX}) VALUES ('rebuild')")
+
+
+def fts_query(q: str) -> Optional[str]:
+    """Запрос FTS5: все слова как префиксы, в кавычках, чтобы ввод не разбирался как операторы"""
+    terms = _TERM.findall(q)
+    if not terms:
+        return None
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+async def search_order_ids(db, user_id: str, q: str, skip: int, limit: int) -> List[str]:
+    """id заказов пользователя по убыванию релевантности"""
+    match = fts_query(q)
+    if match is None:
+        return []
+    result = await db.execute(
+        SEARCH_ORDERS_SQL, {"match": match, "user_id": user_id, "skip": skip, "limit": limit}
+    )
+    return [row[0] for row in result]
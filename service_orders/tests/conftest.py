@@ -0,0 +1,34 @@
+import os
+import sys
+
+import pytest
+
+ORDERS = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# service_orders и корень репозитория с общим пакетом bmanager_common
+sys.path[:0] = [ORDERS, os.path.dirname(ORDERS)]
+
+
+@pytest.fixture(scope="session")
+def app(tmp_path_factory):
+    """Приложение на временной базе; app импортируется только после выбора DATABASE_URL"""
+    os.environ["DATABASE_URL"] = f"sqlite:///{tmp_path_factory.mktemp('db') / 'orders.db'}"
+    from app.main import app
+
+    return app
+
+
+@pytest.fixture(scope="session")
+def client(app):
+    from fastapi.testclient import TestClient
+
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def identity():
+    """Заголовок личности, который передаёт шлюз: identity(user_id)"""
+    def make(user_id: str) -> dict:
+        return {"X-User-Identity": f"{user_id};{user_id}@example.com"}
+
+    return make
@@ -0,0 +1,59 @@
+ORDER = {"items": [{"name": "Brick", "quantity": 10, "price": 0.5}, {"name": "Mortar", "quantity": 1, "price": 7}]}
+
+
+def test_batch_reports_per_item_errors_and_ids(client, identity):
+    headers = identity("batch-user")
+    orders = [
+        ORDER,
+        {"items": []},
+        42,
+        {"items": [{"name": "Brick", "quantity": -1, "price": 0.5}]},
+        None,
+        {"items": [{"name": "Sand", "quantity": 2, "price": 3}]},
+    ]
+
+    response = client.post("/v1/orders:batch", json={"orders": orders}, headers=headers)
+
+    assert response.status_code == 200
+    summary = response.json()["data"]
+    assert (summary["created"], summary["failed"]) == (2, 4)
+    results = summary["results"]
+    assert [result["index"] for result in results] == list(range(6))
+    assert [result["success"] for result in results] == [True, False, False, False, False, True]
+    assert results[1]["error"] == "Order must contain at least one item"
+    assert results[3]["error"] == "Item quantity must be positive"
+    # Не объект — ошибка этого элемента, а не 422 на весь пакет
+    assert "valid dictionary" in results[2]["error"] and "valid dictionary" in results[4]["error"]
+    assert [results[0]["data"]["total_amount"], results[5]["data"]["total_amount"]] == [12.0, 6.0]
+
+    # Идентификаторы из RETURNING соответствуют своим элементам пакета
+    for index in (0, 5):
+        order = client.get(f"/v1/orders/{results[index]['data']['id']}", headers=headers).json()["data"]
+        assert order["items"] == [dict(item, price=float(item["price"])) for item in orders[index]["items"]]
+
+
+def test_batch_line_items_follow_their_orders(client, identity):
+    from sqlalchemy import select
+
+    from app.database import SessionLocal
+    from app.models import OrderLineItem
+
+    headers = identity("batch-lines")
+    orders = [{"items": [{"name": f"Item {i}", "quantity": i + 1, "price": 1}]} for i in range(20)]
+    results = client.post("/v1/orders:batch", json={"orders": orders}, headers=headers).json()["data"]["results"]
+
+    with SessionLocal() as db:
+        lines = {line.order_id: (line.name, line.quantity) for line in db.scalars(select(OrderLineItem))}
+    for i, result in enumerate(results):
+        assert lines[result["data"]["id"]] == (f"Item {i}", i + 1)
+
+
+def test_batch_size_limits(client, identity, monkeypatch):
+    from app import main
+
+    headers = identity("batch-limits")
+    assert client.post("/v1/orders:batch", json={"orders": []}, headers=headers).status_code == 400
+    monkeypatch.setattr(main, "MAX_BATCH_SIZE", 2)
+    assert client.post("/v1/orders:batch", json={"orders": [ORDER] * 3}, headers=headers).status_code == 413
+    # Тело без списка orders — ошибка запроса целиком
+    assert client.post("/v1/orders:batch", json={"orders": {"items": []}}, headers=headers).status_code == 422
@@ -0,0 +1,72 @@
+import logging
+
+ORDER = {"items": [{"name": "Rebar", "quantity": 4, "price": 2.5}, {"name": "Cement", "quantity": 1, "price": 10}]}
+
+
+def test_server_total_replaces_client_total(client, identity, caplog):
+    headers = identity("totals-user")
+
+    with caplog.at_level(logging.WARNING, logger="app.main"):
+        response = client.post("/v1/orders", json={**ORDER, "total_amount": 999}, headers=headers)
+
+    assert response.status_code == 200
+    assert response.json()["data"]["total_amount"] == 20.0
+    assert "does not match order items" in caplog.text
+    # Совпадающая в пределах допуска сумма проходит без предупреждения
+    caplog.clear()
+    with caplog.at_level(logging.WARNING, logger="app.main"):
+        assert client.post("/v1/orders", json={**ORDER, "total_amount": 20.001}, headers=headers).status_code == 200
+    assert caplog.text == ""
+
+
+def test_aggregates_are_typed_per_group(client, identity):
+    headers = identity("aggregates-user")
+    client.post("/v1/orders:batch", json={"orders": [ORDER, ORDER, {"items": [{"name": "Rebar", "quantity": 1, "price": 2.5}]}]}, headers=headers)
+
+    by_item = client.get("/v1/orders/aggregates", params={"group_by": "item"}, headers=headers).json()["data"]
+    assert by_item == {
+        "group_by": "item",
+        "groups": [
+            {"key": "Rebar", "orders": 3, "quantity": 9, "total_amount": 22.5},
+            {"key": "Cement", "orders": 2, "quantity": 2, "total_amount": 20.0},
+        ],
+    }
+
+    by_status = client.get("/v1/orders/aggregates", headers=headers).json()["data"]
+    # quantity есть только у группировки по позициям
+    assert by_status["groups"] == [{"key": "created", "orders": 3, "total_amount": 42.5}]
+
+    by_day = client.get("/v1/orders/aggregates", params={"group_by": "day"}, headers=headers).json()["data"]
+    assert [group["orders"] for group in by_day["groups"]] == [3]
+
+    assert client.get("/v1/orders/aggregates", params={"group_by": "week"}, headers=headers).status_code == 400
+
+
+def test_backfill_migration_is_idempotent(client):
+    from sqlalchemy import func, select
+
+    from app.database import SessionLocal
+    from app.migrations import backfill_order_items, migrate
+    from app.models import Order, OrderLineItem
+
+    # Заказы, созданные до появления order_items: позиции есть только в JSON
+    with SessionLocal() as db:
+        legacy = [Order(user_id="legacy-user", items=ORDER["items"], total_amount=20.0) for _ in range(3)]
+        db.add_all(legacy)
+        db.commit()
+        legacy_ids = [order.id for order in legacy]
+
+    assert backfill_order_items() == 6
+    with SessionLocal() as db:
+        count = db.scalar(select(func.count()).select_from(OrderLineItem))
+        lines = db.scalars(select(OrderLineItem).where(OrderLineItem.order_id == legacy_ids[0]).order_by(OrderLineItem.id)).all()
+        assert [(line.name, line.quantity, line.price, line.line_total) for line in lines] == [
+            ("Rebar", 4, 2.5, 10.0),
+            ("Cement", 1, 10.0, 10.0),
+        ]
+
+    # Повторный запуск ничего не дублирует
+    assert backfill_order_items() == 0
+    migrate()
+    with SessionLocal() as db:
+        assert db.scalar(select(func.count()).select_from(OrderLineItem)) == count
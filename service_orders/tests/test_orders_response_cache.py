@@ -0,0 +1,51 @@
+ORDER = {"items": [{"name": "Widget", "quantity": 2, "price": 5.0}]}
+
+
+def order_version(user_id: str) -> int:
+    from app.database import SessionLocal
+    from app.models import OrderVersion
+
+    with SessionLocal() as db:
+        return db.get(OrderVersion, user_id).version
+
+
+def test_repeated_get_returns_304(client, identity):
+    headers = identity("etag-owner")
+    assert client.post("/v1/orders", json=ORDER, headers=headers).status_code == 200
+
+    first = client.get("/v1/orders", headers=headers)
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+    assert first.headers["Cache-Control"] == "private, no-cache"
+
+    repeated = client.get("/v1/orders", headers={**headers, "If-None-Match": etag})
+    assert repeated.status_code == 304
+    assert repeated.headers["ETag"] == etag
+    assert repeated.content == b""
+
+
+def test_write_bumps_order_version_and_etag(client, identity):
+    headers = identity("etag-writer")
+    client.post("/v1/orders", json=ORDER, headers=headers)
+    etag = client.get("/v1/orders", headers=headers).headers["ETag"]
+    version = order_version("etag-writer")
+
+    assert client.post("/v1/orders:batch", json={"orders": [ORDER, ORDER]}, headers=headers).status_code == 200
+    assert order_version("etag-writer") == version + 1
+
+    changed = client.get("/v1/orders", headers={**headers, "If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert len(changed.json()["data"]) == 3
+
+
+def test_other_users_write_keeps_etag(client, identity):
+    headers = identity("etag-reader")
+    client.post("/v1/orders", json=ORDER, headers=headers)
+    etag = client.get("/v1/orders", headers=headers).headers["ETag"]
+
+    assert client.post("/v1/orders", json=ORDER, headers=identity("etag-neighbour")).status_code == 200
+
+    assert client.get("/v1/orders", headers={**headers, "If-None-Match": etag}).status_code == 304
+    # Разные пользователи с одинаковыми параметрами не делят ETag
+    assert client.get("/v1/orders", headers=identity("etag-neighbour")).headers["ETag"] != etag
@@ -0,0 +1,45 @@
+import pytest
+
+ORDER = {"items": [{"name": "Cement", "quantity": 3, "price": 12.5}]}
+
+
+@pytest.fixture(params=["sync", "async"])
+def backend(request, app, monkeypatch):
+    """DB_BACKEND выбирается при каждом запросе; сессии другого бэкенда недоступны"""
+    from app import database
+
+    def unavailable(*args, **kwargs):
+        raise AssertionError(f"{request.param} backend must not open other sessions")
+
+    monkeypatch.setattr(database, "DB_BACKEND", request.param)
+    monkeypatch.setattr(database, "AsyncSessionLocal" if request.param == "sync" else "SessionLocal", unavailable)
+    return request.param
+
+
+def test_create_list_and_get_orders_on_both_backends(backend, client, identity):
+    headers = identity(f"{backend}-session")
+
+    created = client.post("/v1/orders", json=ORDER, headers=headers)
+    assert created.status_code == 200
+    order = created.json()["data"]
+    assert order["total_amount"] == 37.5
+
+    listed = client.get("/v1/orders", headers=headers)
+    assert listed.status_code == 200
+    assert [item["id"] for item in listed.json()["data"]] == [order["id"]]
+
+    fetched = client.get(f"/v1/orders/{order['id']}", headers=headers)
+    assert fetched.status_code == 200 and fetched.json()["data"] == order
+    # Чужой заказ не виден
+    assert client.get(f"/v1/orders/{order['id']}", headers=identity("someone-else")).status_code == 404
+
+
+def test_export_streams_on_both_backends(backend, client, identity):
+    headers = identity(f"{backend}-export")
+    for _ in range(3):
+        client.post("/v1/orders", json=ORDER, headers=headers)
+
+    response = client.get("/v1/orders/export", params={"format": "ndjson"}, headers=headers)
+
+    assert response.status_code == 200
+    assert len(response.text.splitlines()) == 3
@@ -2,18 +2,27 @@ from passlib.context import CryptContext
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
 from fastapi import HTTPException
+from typing import Optional, Tuple
+import os
 
-# Настройки JWT
-SECRET_KEY = "your-super-secret-jwt-key-2024"  # В продакшене хранить в env
+# Настройки JWT — тот же секрет (JWT_SECRET_KEY) читает шлюз
+SECRET_KEY = os.getenv("JWT_SECRET_KEY", "your-super-secret-jwt-key-2024")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Стоимость bcrypt; хеши с другим числом раундов перехешируются при входе
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Проверка пароля"""
     return pwd_context.verify(plain_password, hashed_password)
 
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Проверка пароля и новый хеш, если текущий устарел"""
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
 def get_password_hash(password: str) -> str:
     """Хеширование пароля"""
     return pwd_context.hash(password)
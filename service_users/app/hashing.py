@@ -0,0 +1,138 @@
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Optional, Tuple
+
+from fastapi import HTTPException
+
+from bmanager_common.metrics import REGISTRY
+
+from .auth import get_password_hash, verify_and_update_password
+
+logger = logging.getLogger(__name__)
+
+# Настройки пула для bcrypt
+PASSWORD_HASHER_EXECUTOR = os.getenv("PASSWORD_HASHER_EXECUTOR", "thread")  # thread, process
+PASSWORD_HASHER_WORKERS = int(os.getenv("PASSWORD_HASHER_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASHER_MAX_QUEUE = int(os.getenv("PASSWORD_HASHER_MAX_QUEUE", "64"))
+
+PASSWORD_HASH_DURATION = REGISTRY.histogram(
+    "password_hash_duration_seconds", "bcrypt hash/verify time in the worker pool", ("operation",)
+)
+PASSWORD_HASH_WAIT = REGISTRY.histogram(
+    "password_hash_queue_wait_seconds", "Time spent waiting for a free bcrypt worker", ("operation",)
+)
+
+
+def _warm_up_worker():
+    """Пустая задача; в процессе пула заодно импортируются модули хеширования"""
+
+
+class PasswordHasher:
+    """Хеширование паролей в отдельном ограниченном пуле, вне event loop.
+
+    Одновременно выполняется не больше ``workers`` операций, остальные
+    ждут в очереди длиной не больше ``max_queue``; при переполнении
+    запрос сразу получает 503.
+    """
+
+    def __init__(self, executor_kind: str, workers: int, max_queue: int):
+        if executor_kind not in ("thread", "process"):
+            raise ValueError(f"Unknown password hasher executor: {executor_kind}")
+        self.executor_kind = executor_kind
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor: Optional[Executor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._waiting = 0
+        self._running = 0
+        self._max_waiting = 0
+        self._completed = 0
+        self._rejected = 0
+        self._rehashed = 0
+
+    def start(self):
+        """Создание пула при старте приложения"""
+        if self.executor_kind == "process":
+            # multiprocessing загружается, только если пул процессов действительно нужен
+            from concurrent.futures import ProcessPoolExecutor
+
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        self._semaphore = asyncio.Semaphore(self.workers)
+        logger.info(f"Password hasher started: {self.executor_kind} pool, {self.workers} workers")
+
+    async def warm_up(self):
+        """Запуск всех воркеров заранее: процессы пула иначе создаются на первых входах"""
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self._executor, _warm_up_worker) for _ in range(self.workers)))
+
+    def shutdown(self):
+        """Остановка пула"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    async def _run(self, operation: str, func, *args):
+        if self._executor is None:
+            raise RuntimeError("Password hasher is not started")
+        if self._waiting >= self.max_queue:
+            self._rejected += 1
+            raise HTTPException(
+                status_code=503,
+                detail="Too many authentication requests, try again later",
+                headers={"Retry-After": "1"},
+            )
+        self._waiting += 1
+        self._max_waiting = max(self._max_waiting, self._waiting)
+        queued_at = time.perf_counter()
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self._waiting -= 1
+        started_at = time.perf_counter()
+        PASSWORD_HASH_WAIT.observe((operation,), started_at - queued_at)
+        self._running += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, func, *args)
+        finally:
+            PASSWORD_HASH_DURATION.observe((operation,), time.perf_counter() - started_at)
+            self._running -= 1
+            self._completed += 1
+            self._semaphore.release()
+
+    async def hash(self, password: str) -> str:
+        """Хеширование пароля"""
+        return await self._run("hash", get_password_hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """Проверка пароля; вторым элементом — новый хеш, если нужно перехешировать"""
+        valid, new_hash = await self._run("verify", verify_and_update_password, plain_password, hashed_password)
+        if new_hash is not None:
+            self._rehashed += 1
+        return valid, new_hash
+
+    def stats(self) -> dict:
+        """Метрики загрузки пула"""
+        return {
+            "executor": self.executor_kind,
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "running": self._running,
+            "queue_depth": self._waiting,
+            "max_queue_depth": self._max_waiting,
+            "completed": self._completed,
+            "rejected": self._rejected,
+            "rehashed": self._rehashed,
+        }
+
+
+password_hasher = PasswordHasher(
+    PASSWORD_HASHER_EXECUTOR,
+    PASSWORD_HASHER_WORKERS,
+    PASSWORD_HASHER_MAX_QUEUE,
+)
@@ -1,62 +1,71 @@
-from fastapi import FastAPI, HTTPException, Depends
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from .models import Base, User
-from .auth import get_password_hash, verify_password, create_access_token
-from pydantic import BaseModel, EmailStr
+from fastapi import FastAPI, HTTPException, Depends, Header
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import select
+from bmanager_common.metrics import metrics_response
+from bmanager_common.profiling import ProfilingMiddleware
+from bmanager_common.sql_metrics import QueryMetricsMiddleware
+from .database import SQLITE_MAINTENANCE_INTERVAL, check_database, dispose_engines, get_db, run_sqlite_maintenance, warm_up_pool
+from .migrations import prepare_database
+from .models import User
+from .auth import create_access_token
+from .hashing import password_hasher
+from .responses import model_response
+from .schemas import TokenEnvelope, TokenResponse, UserEnvelope, UserLogin, UserRegister, UserResponse
+from contextlib import asynccontextmanager
 from typing import Optional
+import asyncio
+import logging
 
-app = FastAPI(title="Users Service", version="1.0.0")
+logger = logging.getLogger(__name__)
 
-# Настройка базы данных
-SQLALCHEMY_DATABASE_URL = "sqlite:///./users.db"
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-
-# Создание таблиц
-Base.metadata.create_all(bind=engine)
-
-def get_db():
-    db = SessionLocal()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Проверка схемы, прогрев пулов БД и bcrypt; обслуживание SQLite — всё время работы сервиса"""
+    await asyncio.to_thread(prepare_database)
+    password_hasher.start()
+    await asyncio.gather(warm_up_pool(), password_hasher.warm_up())
+    app.state.ready = True
+    maintenance = asyncio.create_task(run_sqlite_maintenance()) if SQLITE_MAINTENANCE_INTERVAL > 0 else None
     try:
-        yield db
+        yield
     finally:
-        db.close()
-
-# Pydantic схемы
-class UserRegister(BaseModel):
-    email: EmailStr
-    password: str
-    full_name: str
-    role: str = "engineer"
+        app.state.ready = False
+        if maintenance is not None:
+            maintenance.cancel()
+        password_hasher.shutdown()
+        await dispose_engines()
 
-class UserLogin(BaseModel):
-    email: EmailStr
-    password: str
+app = FastAPI(
+    title="Users Service",
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
+)
 
-class UserResponse(BaseModel):
-    id: str
-    email: str
-    full_name: str
-    role: str
-    is_active: bool
+app.add_middleware(QueryMetricsMiddleware)
+# Профиль отдельного запроса по X-Profile или выборке (PROFILE_TOKEN, PROFILE_SAMPLE_RATE)
+app.add_middleware(ProfilingMiddleware)
 
-class TokenResponse(BaseModel):
-    access_token: str
-    token_type: str = "bearer"
-    user: UserResponse
+def get_current_user(x_user_identity: Optional[str] = Header(None)):
+    """Получение текущего пользователя из заголовка шлюза"""
+    if not x_user_identity:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    user_id, _, email = x_user_identity.partition(";")
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    return {"user_id": user_id, "email": email}
 
 # API endpoints
-@app.post("/v1/auth/register", response_model=dict)
+@app.post("/v1/auth/register", response_model=UserEnvelope)
 async def register(user_data: UserRegister, db = Depends(get_db)):
     """Регистрация нового пользователя"""
     # Проверка существования пользователя
-    existing_user = db.query(User).filter(User.email == user_data.email).first()
+    existing_user = await db.scalar(select(User).where(User.email == user_data.email))
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     
     # Создание пользователя
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await password_hasher.hash(user_data.password)
     db_user = User(
         email=user_data.email,
         hashed_password=hashed_password,
@@ -65,47 +74,46 @@ async def register(user_data: UserRegister, db = Depends(get_db)):
     )
     
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     
-    return {
-        "success": True,
-        "data": {
-            "id": db_user.id,
-            "email": db_user.email,
-            "full_name": db_user.full_name,
-            "role": db_user.role,
-            "is_active": db_user.is_active
-        }
-    }
+    return model_response(UserEnvelope(data=UserResponse.model_validate(db_user)))
 
-@app.post("/v1/auth/login", response_model=dict)
+@app.post("/v1/auth/login", response_model=TokenEnvelope)
 async def login(user_data: UserLogin, db = Depends(get_db)):
     """Аутентификация пользователя"""
-    user = db.query(User).filter(User.email == user_data.email).first()
-    if not user or not verify_password(user_data.password, user.hashed_password):
+    user = await db.scalar(select(User).where(User.email == user_data.email))
+    if not user:
         raise HTTPException(status_code=401, detail="Invalid email or password")
     
+    valid, new_hash = await password_hasher.verify(user_data.password, user.hashed_password)
+    if not valid:
+        raise HTTPException(status_code=401, detail="Invalid email or password")
+    
+    # Хеш с устаревшими параметрами bcrypt заменяем прозрачно для пользователя
+    if new_hash is not None:
+        user.hashed_password = new_hash
+        await db.commit()
+        await db.refresh(user)
+    
     if not user.is_active:
         raise HTTPException(status_code=400, detail="User account is disabled")
     
     # Создание JWT токена
     access_token = create_access_token(data={"sub": user.email, "user_id": user.id})
     
-    return {
-        "success": True,
-        "data": {
-            "access_token": access_token,
-            "token_type": "bearer",
-            "user": {
-                "id": user.id,
-                "email": user.email,
-                "full_name": user.full_name,
-                "role": user.role,
-                "is_active": user.is_active
-            }
-        }
-    }
+    return model_response(TokenEnvelope(data=TokenResponse(
+        access_token=access_token,
+        user=UserResponse.model_validate(user)
+    )))
+
+@app.get("/v1/users/me", response_model=UserEnvelope)
+async def read_current_user(db = Depends(get_db), current_user: dict = Depends(get_current_user)):
+    """Профиль текущего пользователя"""
+    user = await db.get(User, current_user["user_id"])
+    if user is None or not user.is_active:
+        raise HTTPException(status_code=404, detail="User not found")
+    return model_response(UserEnvelope(data=UserResponse.model_validate(user)))
 
 @app.get("/")
 async def root():
@@ -115,6 +123,28 @@ async def root():
 async def health_check():
     return {"status": "healthy", "service": "users"}
 
+@app.get("/ready")
+async def readiness_check():
+    """Готовность принимать трафик: старт завершён и база отвечает"""
+    if not getattr(app.state, "ready", False):
+        return ORJSONResponse(status_code=503, content={"status": "starting", "service": "users"})
+    try:
+        await check_database()
+    except Exception as e:
+        logger.warning(f"Readiness check failed: {e}")
+        return ORJSONResponse(status_code=503, content={"status": "unavailable", "service": "users", "database": str(e)})
+    return {"status": "ready", "service": "users", "database": "ok"}
+
+@app.get("/stats/hashing")
+async def hashing_stats():
+    """Метрики пула хеширования паролей"""
+    return password_hasher.stats()
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Метрики в текстовом формате Prometheus"""
+    return metrics_response()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8001)
\ No newline at end of file
@@ -0,0 +1,43 @@
+import logging
+import os
+
+from .database import create_schema, schema_version, set_schema_version
+from .models import Base
+
+logger = logging.getLogger(__name__)
+
+# Версия схемы в PRAGMA user_version. Увеличивается при любом изменении моделей,
+# индексов или переносов данных — иначе уже развёрнутые базы их не получат
+SCHEMA_VERSION = 1
+
+# Применять миграции при старте сервиса. В образе выключено: их выполняет
+# отдельный шаг перед запуском воркеров (python -m app.migrations)
+MIGRATE_ON_STARTUP = os.getenv("MIGRATE_ON_STARTUP", "true").lower() in ("1", "true", "yes")
+
+
+def migrate():
+    """Создание схемы"""
+    create_schema(Base.metadata)
+    set_schema_version(SCHEMA_VERSION)
+    logger.info(f"Database schema is at version {SCHEMA_VERSION}")
+
+
+def prepare_database():
+    """Проверка схемы при старте сервиса.
+
+    Если версия базы актуальна, миграции не запускаются: вместо create_all
+    и проверки каждого индекса — один PRAGMA.
+    """
+    version = schema_version()
+    if version >= SCHEMA_VERSION:
+        return
+    if not MIGRATE_ON_STARTUP:
+        raise RuntimeError(
+            f"Database schema version {version} is older than {SCHEMA_VERSION}, run python -m app.migrations"
+        )
+    migrate()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    migrate()
@@ -0,0 +1,25 @@
+from typing import Optional
+
+from fastapi.responses import Response
+from pydantic import BaseModel
+from pydantic_core import to_json
+
+
+def model_json(model: BaseModel, exclude_none: bool = False) -> bytes:
+    """Сериализация модели компилированным энкодером pydantic-core, без jsonable_encoder"""
+    return to_json(model, exclude_none=exclude_none)
+
+
+def model_response(
+    model: BaseModel,
+    status_code: int = 200,
+    headers: Optional[dict] = None,
+    exclude_none: bool = False,
+) -> Response:
+    """JSON-ответ из типизированной Pydantic-модели"""
+    return Response(
+        model_json(model, exclude_none=exclude_none),
+        status_code=status_code,
+        media_type="application/json",
+        headers=headers,
+    )
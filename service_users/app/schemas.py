@@ -0,0 +1,34 @@
+from pydantic import BaseModel, ConfigDict, EmailStr
+
+# Pydantic схемы
+class UserRegister(BaseModel):
+    email: EmailStr
+    password: str
+    full_name: str
+    role: str = "engineer"
+
+class UserLogin(BaseModel):
+    email: EmailStr
+    password: str
+
+class UserResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: str
+    email: str
+    full_name: str
+    role: str
+    is_active: bool
+
+class TokenResponse(BaseModel):
+    access_token: str
+    token_type: str = "bearer"
+    user: UserResponse
+
+class UserEnvelope(BaseModel):
+    success: bool = True
+    data: UserResponse
+
+class TokenEnvelope(BaseModel):
+    success: bool = True
+    data: TokenResponse
@@ -0,0 +1,40 @@
+import os
+import sys
+
+import pytest
+
+USERS = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# service_users и корень репозитория с общим пакетом bmanager_common
+sys.path[:0] = [USERS, os.path.dirname(USERS)]
+
+
+@pytest.fixture(scope="session")
+def app(tmp_path_factory):
+    """Приложение на временной базе; app импортируется только после выбора DATABASE_URL.
+
+    Минимальная стоимость bcrypt — тесты проверяют пул, а не стойкость хеша.
+    """
+    os.environ["DATABASE_URL"] = f"sqlite:///{tmp_path_factory.mktemp('db') / 'users.db'}"
+    os.environ["BCRYPT_ROUNDS"] = "4"
+    from app.main import app
+
+    return app
+
+
+@pytest.fixture(scope="session")
+def client(app):
+    from fastapi.testclient import TestClient
+
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def register(client):
+    """Регистрация пользователя через API: register(email, password)"""
+    def make(email: str, password: str = "secret12") -> dict:
+        response = client.post("/v1/auth/register", json={"email": email, "password": password, "full_name": "Test User"})
+        assert response.status_code == 200, response.text
+        return response.json()["data"]
+
+    return make
@@ -0,0 +1,106 @@
+import asyncio
+import threading
+
+import pytest
+
+
+@pytest.fixture
+def hashing(app):
+    from app import hashing
+
+    return hashing
+
+
+def run_hasher(hasher, scenario):
+    """Сценарий с запущенным пулом в одном цикле событий; пул останавливается в конце"""
+    async def main():
+        hasher.start()
+        try:
+            return await scenario()
+        finally:
+            hasher.shutdown()
+
+    return asyncio.run(main())
+
+
+def test_hashing_runs_in_the_pool_not_on_the_event_loop(hashing):
+    hasher = hashing.PasswordHasher("thread", workers=2, max_queue=4)
+
+    async def scenario():
+        ticks = 0
+        release = threading.Event()
+
+        async def ticker():
+            nonlocal ticks
+            while not release.is_set():
+                ticks += 1
+                await asyncio.sleep(0.001)
+
+        def slow_hash():
+            # Пока «хеширование» занимает поток пула, цикл событий продолжает работать
+            release.wait(1)
+            return threading.current_thread().name
+
+        ticking = asyncio.ensure_future(ticker())
+        pending = asyncio.ensure_future(hasher._run("hash", slow_hash))
+        await asyncio.sleep(0.05)
+        release.set()
+        thread_name = await pending
+        await ticking
+        return ticks, thread_name, await hasher.hash("secret12")
+
+    ticks, thread_name, hashed = run_hasher(hasher, scenario)
+
+    assert ticks > 5
+    assert thread_name.startswith("bcrypt")
+    assert hashed.startswith("$2b$04$")
+
+
+def test_concurrency_is_limited_and_overflow_is_rejected(hashing):
+    from fastapi import HTTPException
+
+    hasher = hashing.PasswordHasher("thread", workers=1, max_queue=1)
+
+    async def scenario():
+        release = threading.Event()
+        running = asyncio.ensure_future(hasher._run("hash", release.wait, 1))
+        await asyncio.sleep(0.01)
+        queued = asyncio.ensure_future(hasher._run("hash", release.wait, 1))
+        await asyncio.sleep(0.01)
+        busy = hasher.stats()
+        with pytest.raises(HTTPException) as error:
+            await hasher._run("hash", release.wait, 1)
+        release.set()
+        await asyncio.gather(running, queued)
+        return busy, error.value, hasher.stats()
+
+    busy, error, stats = run_hasher(hasher, scenario)
+
+    assert (busy["running"], busy["queue_depth"]) == (1, 1)
+    assert error.status_code == 503 and error.headers == {"Retry-After": "1"}
+    assert stats["running"] == 0 and stats["queue_depth"] == 0
+    assert stats["completed"] == 2 and stats["rejected"] == 1 and stats["max_queue_depth"] == 1
+
+
+def test_login_rehashes_password_when_rounds_change(client, register, monkeypatch):
+    from passlib.context import CryptContext
+
+    from app import auth
+    from app.database import SessionLocal
+    from app.hashing import password_hasher
+    from app.models import User
+
+    user = register("rehash@example.com")
+    monkeypatch.setattr(auth, "pwd_context", CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=5))
+    rehashed = password_hasher.stats()["rehashed"]
+
+    response = client.post("/v1/auth/login", json={"email": "rehash@example.com", "password": "secret12"})
+
+    assert response.status_code == 200
+    with SessionLocal() as db:
+        assert db.get(User, user["id"]).hashed_password.startswith("$2b$05$")
+    assert password_hasher.stats()["rehashed"] == rehashed + 1
+    # Новый хеш принимается при следующем входе и больше не перехешируется
+    assert client.post("/v1/auth/login", json={"email": "rehash@example.com", "password": "secret12"}).status_code == 200
+    assert password_hasher.stats()["rehashed"] == rehashed + 1
+    assert client.post("/v1/auth/login", json={"email": "rehash@example.com", "password": "wrong"}).status_code == 401
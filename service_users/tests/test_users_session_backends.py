@@ -0,0 +1,29 @@
+import pytest
+
+
+@pytest.fixture(params=["sync", "async"])
+def backend(request, app, monkeypatch):
+    """DB_BACKEND выбирается при каждом запросе; сессии другого бэкенда недоступны"""
+    from app import database
+
+    def unavailable(*args, **kwargs):
+        raise AssertionError(f"{request.param} backend must not open other sessions")
+
+    monkeypatch.setattr(database, "DB_BACKEND", request.param)
+    monkeypatch.setattr(database, "AsyncSessionLocal" if request.param == "sync" else "SessionLocal", unavailable)
+    return request.param
+
+
+def test_register_login_and_profile_on_both_backends(backend, client, register):
+    email = f"{backend}-session@example.com"
+    user = register(email)
+
+    login = client.post("/v1/auth/login", json={"email": email, "password": "secret12"})
+    assert login.status_code == 200
+    assert login.json()["data"]["user"]["id"] == user["id"]
+
+    profile = client.get("/v1/users/me", headers={"X-User-Identity": f"{user['id']};{email}"})
+    assert profile.status_code == 200 and profile.json()["data"]["email"] == email
+
+    duplicate = client.post("/v1/auth/register", json={"email": email, "password": "secret12", "full_name": "Again"})
+    assert duplicate.status_code == 400